@@ -0,0 +1,163 @@
+# batch_recommendations.py
+
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from recommendation_service import load_data, create_item_features, quiz_profile_text, user_profile_text
+from sparse_scoring import ItemScorer
+
+DEFAULT_TOP_N = 20
+DEFAULT_MEMORY_BUDGET_MB = 1024
+# Worst case for one user in a chunk: every item scores, stored as a float64 plus an int32 column
+BYTES_PER_ITEM_SCORE = 12
+
+# Set once per worker process by _init_worker
+_scorer = None
+_vectorizer = None
+
+
+def _init_worker(scorer, tfidf_vectorizer):
+    global _scorer, _vectorizer
+    _scorer = scorer
+    _vectorizer = tfidf_vectorizer
+
+
+def _score_chunk(chunk, top_n):
+    """Scores one chunk of (user_id, profile_text, exclude_ids) with a single sparse product."""
+    user_matrix = _vectorizer.transform([text for _, text, _ in chunk])
+    recommendations = _scorer.top_n_batch(user_matrix, [exclude_ids for _, _, exclude_ids in chunk], top_n)
+    return [(user_id, recs) for (user_id, _, _), recs in zip(chunk, recommendations)]
+
+
+def iter_user_documents(user_profiles, interactions, features_by_id):
+    """Yields (user_id, profile_text, interacted item ids) for users with a quiz profile or likes.
+
+    Users whose profile text comes out empty are yielded with an empty text so
+    the caller can count them.
+    """
+    def document(user_id, answers):
+        # Same text create_user_profile_vector builds; repeated likes count once, as isin() did
+        liked = dict.fromkeys(interactions.items(user_id, "like"))
+        liked_texts = [features_by_id[item_id] for item_id in liked if item_id in features_by_id]
+        text = user_profile_text(quiz_profile_text(answers), liked_texts)
+        return user_id, text, list(interactions.interacted_items(user_id))
+
+    profiles = user_profiles.iter_items() if hasattr(user_profiles, "iter_items") else user_profiles.items()
+    for user_id, answers in profiles:
+        yield document(user_id, answers)
+    # Users with likes but no quiz profile
+    for user_id in interactions.users():
+        if user_id not in user_profiles and interactions.has(user_id, "like"):
+            yield document(user_id, {})
+
+
+def chunk_size_for(n_items, workers, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """Users per chunk so that two chunks per worker fit the memory budget even if every item scores."""
+    per_user = n_items * BYTES_PER_ITEM_SCORE
+    return max(1, int(memory_budget_mb * 2 ** 20 // (per_user * workers * 2)))
+
+
+def run_batch(output_path, styles_df, item_features_matrix, tfidf_vectorizer, user_profiles, interactions,
+              top_n=DEFAULT_TOP_N, workers=None, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, chunk_size=None,
+              limit=None):
+    """Writes top_n recommendations for every user to output_path as NDJSON; returns run stats.
+
+    Users are scored in chunks across a process pool. At most two chunks per
+    worker are in flight and results are written as soon as each chunk (in
+    order) is done, so memory stays bounded however many users there are.
+    """
+    workers = workers or os.cpu_count() or 1
+    scorer = ItemScorer(item_features_matrix, styles_df["id"])
+    features_by_id = dict(zip(styles_df["id"], styles_df["combined_features"]))
+    chunk_size = chunk_size or chunk_size_for(len(styles_df), workers, memory_budget_mb)
+    stats = {"users": 0, "skipped": 0, "chunks": 0, "chunk_size": chunk_size, "workers": workers}
+
+    def documents():
+        for user_id, text, exclude_ids in islice(iter_user_documents(user_profiles, interactions, features_by_id), limit):
+            if not text:
+                stats["skipped"] += 1
+                continue
+            yield user_id, text, exclude_ids
+
+    def chunks():
+        documents_iter = documents()
+        while True:
+            chunk = list(islice(documents_iter, chunk_size))
+            if not chunk:
+                return
+            stats["chunks"] += 1
+            yield chunk
+
+    started = time.perf_counter()
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        def write(results):
+            for user_id, recs in results:
+                out.write(json.dumps({"user_id": user_id, "recommendations": recs}) + "\n")
+            stats["users"] += len(results)
+
+        if workers == 1:
+            _init_worker(scorer, tfidf_vectorizer)
+            for chunk in chunks():
+                write(_score_chunk(chunk, top_n))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(scorer, tfidf_vectorizer)) as pool:
+                pending = deque()
+                for chunk in chunks():
+                    pending.append(pool.submit(_score_chunk, chunk, top_n))
+                    while len(pending) > workers * 2:
+                        write(pending.popleft().result())
+                while pending:
+                    write(pending.popleft().result())
+    os.replace(tmp_path, output_path)
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+
+    parser = argparse.ArgumentParser(description="Write top-N recommendations for every user as NDJSON")
+    parser.add_argument("output", help="NDJSON file to write")
+    parser.add_argument("--top-n", type=int, default=DEFAULT_TOP_N)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--memory-mb", type=int, default=DEFAULT_MEMORY_BUDGET_MB,
+                        help="Budget for in-flight score matrices, used to size chunks")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Users per chunk (overrides --memory-mb)")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many users")
+    parser.add_argument("--synthetic-users", type=int, default=0,
+                        help="Benchmark with this many generated users instead of the stored profiles")
+    args = parser.parse_args()
+
+    styles_df, user_profiles, interactions = load_data()
+    item_features_matrix, tfidf_vectorizer = create_item_features(styles_df)
+    if item_features_matrix is None:
+        raise SystemExit("Failed to create item features")
+
+    if args.synthetic_users:
+        from interaction_index import InteractionIndex
+        rng = random.Random(0)
+        item_ids = styles_df["id"].tolist()
+        colours = styles_df["baseColour"].unique().tolist()
+        usages = styles_df["usage"].unique().tolist()
+        user_profiles = {}
+        interactions = InteractionIndex()
+        for n in range(args.synthetic_users):
+            user_id = f"synthetic{n}"
+            if n % 2 == 0:
+                user_profiles[user_id] = {"colour_preference": rng.sample(colours, min(2, len(colours))),
+                                          "usage_preference": rng.sample(usages, 1)}
+            for item_id in rng.sample(item_ids, rng.randint(1, 10)):
+                interactions.add({"user_id": user_id, "item_id": item_id, "type": rng.choice(["like", "view"])})
+
+    stats = run_batch(args.output, styles_df, item_features_matrix, tfidf_vectorizer, user_profiles, interactions,
+                      top_n=args.top_n, workers=args.workers, memory_budget_mb=args.memory_mb,
+                      chunk_size=args.chunk_size, limit=args.limit)
+    print(f"Wrote {stats['users']} users ({stats['skipped']} without a usable profile skipped) "
+          f"in {stats['chunks']} chunks of {stats['chunk_size']} with {stats['workers']} workers "
+          f"in {stats['seconds']:.1f}s ({stats['users'] / max(stats['seconds'], 1e-9):.0f} users/s)")
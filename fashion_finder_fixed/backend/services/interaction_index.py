@@ -0,0 +1,65 @@
+# interaction_index.py
+
+
+class InteractionIndex:
+    """Interactions grouped by user, then by type.
+
+    Built once from the interaction log and kept current by record_interaction,
+    so a recommendation request only looks at the requesting user's history
+    instead of scanning every interaction on the site.
+    """
+
+    def __init__(self, records=()):
+        # user_id -> {type: [item_id, ...]} in the order they were recorded
+        self._by_user = {}
+        # user_id -> set of every item the user interacted with, any type
+        self._items_by_user = {}
+        self._count = 0
+        # Callables notified with each record added after construction
+        self._subscribers = []
+        for record in records:
+            self.add(record)
+
+    @classmethod
+    def of(cls, interactions):
+        """Returns interactions as an index, building one from a plain list if needed."""
+        if isinstance(interactions, cls):
+            return interactions
+        return cls(interactions or ())
+
+    def add(self, record):
+        """Adds one {"user_id", "item_id", "type"} record."""
+        user_id = record.get("user_id")
+        item_id = str(record.get("item_id"))
+        self._by_user.setdefault(user_id, {}).setdefault(record.get("type"), []).append(item_id)
+        self._items_by_user.setdefault(user_id, set()).add(item_id)
+        self._count += 1
+        for callback in self._subscribers:
+            callback(record)
+
+    def subscribe(self, callback):
+        """Calls callback(record) for every record added from now on."""
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def items(self, user_id, interaction_type):
+        """Item ids a user interacted with in one way, oldest first."""
+        return self._by_user.get(user_id, {}).get(interaction_type, [])
+
+    def has(self, user_id, interaction_type):
+        return bool(self.items(user_id, interaction_type))
+
+    def interacted_items(self, user_id):
+        """Every item id the user interacted with, of any type."""
+        return self._items_by_user.get(user_id, set())
+
+    def users(self):
+        """Every user id with at least one interaction."""
+        return self._by_user.keys()
+
+    def __len__(self):
+        return self._count
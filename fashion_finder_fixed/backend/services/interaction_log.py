@@ -0,0 +1,265 @@
+# interaction_log.py
+
+import atexit
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (Windows): compact only while no other process is appending
+    fcntl = None
+
+# fsync after this many appended records or this many seconds, whichever comes first;
+# a timer covers the seconds bound when no further append arrives
+FSYNC_EVERY_RECORDS = 64
+FSYNC_EVERY_SECONDS = 1.0
+# Start a background compaction after this many appends
+COMPACT_EVERY_RECORDS = 100000
+
+
+def iter_records(path):
+    """Streams records from an NDJSON interaction log, one dict at a time."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a torn last line; everything before it is intact
+                print(f"Warning: skipping unreadable line {line_number} in {path}")
+
+
+def _record_key(record):
+    return (record.get("user_id"), record.get("item_id"), record.get("type"))
+
+
+def lock_path(path, purpose="append"):
+    return f"{path}.{purpose}.lock"
+
+
+@contextmanager
+def file_lock(path, exclusive, purpose="append"):
+    """Advisory lock shared by every process using the log at `path`."""
+    if fcntl is None:
+        yield
+        return
+    with open(lock_path(path, purpose), "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def compact_log(path):
+    """Rewrites the log keeping the first occurrence of each (user, item, type) record.
+
+    The existing records are deduplicated without blocking writers. Only the
+    final step takes the exclusive append lock: records appended in the meantime are
+    copied over as they are and the new file replaces the old one. Writers
+    hold the shared lock while appending and reopen the log once it has been
+    replaced, so no append is lost, in this process or any other.
+    """
+    # One compaction at a time: they share the temporary file
+    with file_lock(path, exclusive=True, purpose="compact"):
+        return _compact(path)
+
+
+def _compact(path):
+    if not os.path.exists(path):
+        return 0
+    # Appends happen under the shared lock, so the size read here ends on a record boundary
+    with file_lock(path, exclusive=True):
+        snapshot = os.path.getsize(path)
+
+    seen = set()
+    kept = 0
+    tmp_path = path + ".compact"
+    with open(path, "rb") as src, open(tmp_path, "wb") as out:
+        offset = 0
+        for line_number, line in enumerate(iter(src.readline, b""), 1):
+            offset += len(line)
+            if offset > snapshot:
+                break
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Warning: dropping unreadable line {line_number} in {path}")
+                continue
+            key = _record_key(record)
+            if key in seen:
+                continue
+            seen.add(key)
+            out.write((json.dumps(record) + "\n").encode("utf-8"))
+            kept += 1
+
+        with file_lock(path, exclusive=True):
+            src.seek(snapshot)
+            shutil.copyfileobj(src, out)
+            out.flush()
+            os.fsync(out.fileno())
+            os.replace(tmp_path, path)
+    return kept
+
+
+class InteractionLog:
+    """Append-only NDJSON log of interactions.
+
+    Each record is one line, so an append costs the same however long the
+    history is, and a crash can at worst lose the records of the last
+    fsync_every_seconds (plus a torn final line, which the reader skips).
+    Compaction never runs on the write path: it is started in a background
+    thread every compact_every_records appends, or run from the command line.
+    """
+
+    def __init__(self, path, fsync_every_records=FSYNC_EVERY_RECORDS,
+                 fsync_every_seconds=FSYNC_EVERY_SECONDS, compact_every_records=COMPACT_EVERY_RECORDS):
+        self.path = path
+        self.fsync_every_records = fsync_every_records
+        self.fsync_every_seconds = fsync_every_seconds
+        self.compact_every_records = compact_every_records
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._flush_timer = None
+        self._since_compaction = 0
+        self._compaction = None
+        self._lock_file = open(lock_path(path), "a") if fcntl else None
+        atexit.register(self.close)
+
+    def append(self, record):
+        """Appends one record; returns True once it is written to the OS."""
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            if self._lock_file:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_SH)
+            try:
+                self._reopen_if_replaced()
+                self._file.write(line)
+                self._file.flush()
+            finally:
+                if self._lock_file:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+            self._unsynced += 1
+            self._since_compaction += 1
+            if (self._unsynced >= self.fsync_every_records or
+                    time.monotonic() - self._last_sync >= self.fsync_every_seconds):
+                self._sync_locked()
+            elif self._flush_timer is None and self.fsync_every_seconds:
+                # Sync these records even if this was the last append for a while
+                self._flush_timer = threading.Timer(self.fsync_every_seconds, self._flush_due)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+            if self.compact_every_records and self._since_compaction >= self.compact_every_records:
+                self._since_compaction = 0
+                self._start_compaction()
+        return True
+
+    def _reopen_if_replaced(self):
+        # A compaction (here or in another process) swapped in a new file; its
+        # copy of our earlier records is already fsynced
+        if os.fstat(self._file.fileno()).st_ino != os.stat(self.path).st_ino:
+            self._file.close()
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._unsynced = 0
+
+    def _sync_locked(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _flush_due(self):
+        with self._lock:
+            self._flush_timer = None
+            if self._unsynced and not self._file.closed:
+                self._sync_locked()
+
+    def _start_compaction(self):
+        if self._compaction is not None and self._compaction.is_alive():
+            return
+        self._compaction = threading.Thread(target=self._run_compaction, daemon=True)
+        self._compaction.start()
+
+    def _run_compaction(self):
+        try:
+            kept = compact_log(self.path)
+            print(f"Compacted {self.path} to {kept} records")
+        except OSError as e:
+            print(f"Error compacting {self.path}: {e}")
+
+    def sync(self):
+        """Forces pending records to disk."""
+        with self._lock:
+            if self._unsynced:
+                self._sync_locked()
+
+    def compact(self):
+        """Drops duplicate records now; appends from other threads carry on meanwhile."""
+        self.sync()
+        return compact_log(self.path)
+
+    def close(self):
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._file.closed:
+                self._sync_locked()
+                self._file.close()
+            if self._lock_file and not self._lock_file.closed:
+                self._lock_file.close()
+
+
+def migrate_json_interactions(json_path, log_path):
+    """One-shot conversion of the legacy interactions.json array into the NDJSON log."""
+    if os.path.exists(log_path) or not os.path.exists(json_path) or os.path.getsize(json_path) == 0:
+        return 0
+    with open(json_path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    tmp_path = log_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        for record in records:
+            out.write(json.dumps(record) + "\n")
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, log_path)
+    print(f"Migrated {len(records)} interactions from {json_path} to {log_path}")
+    return len(records)
+
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Compact or benchmark an interaction log")
+    parser.add_argument("command", choices=["compact", "benchmark"])
+    parser.add_argument("path", nargs="?", help="Log file to compact")
+    parser.add_argument("--records", type=int, default=200000, help="Benchmark history size")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        print(f"Kept {compact_log(args.path)} records")
+    else:
+        # Append cost should not depend on how much history is already there
+        with tempfile.TemporaryDirectory() as tmp:
+            log = InteractionLog(os.path.join(tmp, "interactions.ndjson"), compact_every_records=0)
+            checkpoints = {1000, args.records // 10, args.records}
+            started = time.perf_counter()
+            for n in range(1, args.records + 1):
+                log.append({"user_id": f"user{n % 5000}", "item_id": str(n % 44000), "type": "like"})
+                if n in checkpoints:
+                    elapsed = time.perf_counter() - started
+                    print(f"{n:>9} records: {elapsed / n * 1e6:.1f} us per append")
+            log.close()
@@ -0,0 +1,126 @@
+# profile_store.py
+
+import json
+import os
+import sqlite3
+import threading
+
+
+def default_store_path(profiles_json_path):
+    """The store lives next to the legacy user_profiles.json it replaces."""
+    return os.path.join(os.path.dirname(profiles_json_path), "user_profiles.db")
+
+
+class ProfileStore:
+    """User quiz profiles keyed by user_id in a SQLite table.
+
+    Lookups and saves touch one row through the primary key, instead of
+    scanning the profile list or rewriting user_profiles.json on every save.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS user_profiles ("
+            "user_id TEXT PRIMARY KEY, preferences TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, user_id, default=None):
+        """Returns the stored quiz answers for a user, or default."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT preferences FROM user_profiles WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def upsert(self, user_id, preferences):
+        """Creates or replaces a user's quiz answers."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO user_profiles (user_id, preferences) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET preferences = excluded.preferences",
+                (user_id, json.dumps(preferences))
+            )
+            self._conn.commit()
+
+    def upsert_many(self, profiles):
+        """Upserts an iterable of {"user_id", "preferences"} dicts in one transaction."""
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO user_profiles (user_id, preferences) VALUES (?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET preferences = excluded.preferences",
+                    ((p["user_id"], json.dumps(p.get("preferences") or {})) for p in profiles if p.get("user_id"))
+                )
+
+    def __contains__(self, user_id):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM user_profiles WHERE user_id = ?", (user_id,)
+            ).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM user_profiles").fetchone()[0]
+
+    def iter_items(self, batch_size=10000):
+        """Yields (user_id, preferences) in user_id order, a page at a time."""
+        last_user_id = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT user_id, preferences FROM user_profiles WHERE user_id > ? ORDER BY user_id LIMIT ?",
+                    (last_user_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for user_id, preferences in rows:
+                yield user_id, json.loads(preferences)
+            last_user_id = rows[-1][0]
+
+    def to_list(self):
+        """All profiles in the legacy user_profiles.json shape."""
+        with self._lock:
+            rows = self._conn.execute("SELECT user_id, preferences FROM user_profiles").fetchall()
+        return [{"user_id": user_id, "preferences": json.loads(preferences)} for user_id, preferences in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_json_profiles(json_path, store):
+    """One-shot import of user_profiles.json into an empty store."""
+    if len(store) or not os.path.exists(json_path) or os.path.getsize(json_path) == 0:
+        return 0
+    try:
+        with open(json_path, "r") as f:
+            profiles = json.load(f)
+    except json.JSONDecodeError as e:
+        print(f"Error reading {json_path} for migration: {e}")
+        return 0
+    # Later entries win, matching the old remove-then-append save behaviour
+    store.upsert_many(profiles)
+    print(f"Migrated {len(profiles)} profiles from {json_path} to {store.path}")
+    return len(profiles)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_profile_store(profiles_json_path):
+    """Opens the store for a user_profiles.json path, migrating the JSON on first use."""
+    path = os.path.abspath(default_store_path(profiles_json_path))
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = ProfileStore(path)
+            migrate_json_profiles(profiles_json_path, store)
+            _stores[path] = store
+    return store
@@ -0,0 +1,109 @@
+# profile_vectors.py
+
+from collections import OrderedDict
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+# Users whose running sums are kept in memory; the least recently used are rebuilt on demand
+MAX_CACHED_USERS = 100000
+
+
+class _UserState:
+    __slots__ = ("like_counts", "counted_items", "quiz_text", "quiz_counts")
+
+    def __init__(self, like_counts, counted_items):
+        self.like_counts = like_counts
+        self.counted_items = counted_items
+        self.quiz_text = None
+        self.quiz_counts = None
+
+
+class UserProfileVectors:
+    """Running per-user term counts for building profile vectors.
+
+    TF-IDF of the joined quiz and liked-item text is the l2-normalised,
+    idf-weighted sum of each part's term counts. Keeping that sum per user
+    and adding one item's counts when a like is recorded gives the same
+    vector the full text transform did, at O(1) cost per new like.
+    """
+
+    def __init__(self, tfidf_vectorizer, features_by_id, max_users=MAX_CACHED_USERS):
+        self.tfidf_vectorizer = tfidf_vectorizer
+        self.features_by_id = features_by_id
+        self.max_users = max_users
+        self.vocabulary_size = len(tfidf_vectorizer.vocabulary_)
+        self._states = OrderedDict()
+        self._index = None
+
+    def _counts(self, texts):
+        # Raw term counts with the fitted vocabulary and analyzer, before idf weighting
+        return CountVectorizer.transform(self.tfidf_vectorizer, texts).astype(np.float64)
+
+    def _empty(self):
+        return sparse.csr_matrix((1, self.vocabulary_size), dtype=np.float64)
+
+    def _track(self, interactions):
+        """Follows a new interaction index, dropping sums built from the previous one."""
+        if interactions is self._index:
+            return
+        if self._index is not None:
+            self._index.unsubscribe(self.on_interaction)
+        self._states.clear()
+        self._index = interactions
+        interactions.subscribe(self.on_interaction)
+
+    def _state(self, user_id):
+        state = self._states.get(user_id)
+        if state is not None:
+            self._states.move_to_end(user_id)
+            return state
+
+        # First request for this user: one pass over their likes; repeated likes count once
+        liked = [item_id for item_id in dict.fromkeys(self._index.items(user_id, "like"))
+                 if item_id in self.features_by_id]
+        like_counts = self._empty()
+        if liked:
+            like_counts = sparse.csr_matrix(self._counts([self.features_by_id[i] for i in liked]).sum(axis=0))
+        state = _UserState(like_counts, set(liked))
+        self._states[user_id] = state
+        if len(self._states) > self.max_users:
+            self._states.popitem(last=False)
+        return state
+
+    def on_interaction(self, record):
+        """Adds a newly recorded like to the user's running sum, if it is cached."""
+        if record.get("type") != "like":
+            return
+        state = self._states.get(record.get("user_id"))
+        item_id = str(record.get("item_id"))
+        if state is None or item_id in state.counted_items or item_id not in self.features_by_id:
+            return
+        state.like_counts = state.like_counts + self._counts([self.features_by_id[item_id]])
+        state.counted_items.add(item_id)
+
+    def vector(self, user_id, quiz_text, interactions):
+        """The user's TF-IDF profile vector (1 x vocabulary), or None if they have no signal."""
+        self._track(interactions)
+        state = self._state(user_id)
+        if quiz_text != state.quiz_text:
+            state.quiz_counts = self._counts([quiz_text]) if quiz_text else self._empty()
+            state.quiz_text = quiz_text
+
+        counts = state.like_counts + state.quiz_counts
+        if counts.nnz == 0:
+            return None
+        return normalize(sparse.csr_matrix(counts.multiply(self.tfidf_vectorizer.idf_)), norm=self.tfidf_vectorizer.norm)
+
+
+_profile_vectors = None
+
+
+def get_profile_vectors(tfidf_vectorizer, styles_df):
+    """The profile vector cache for this vectorizer, built on first use."""
+    global _profile_vectors
+    if _profile_vectors is None or _profile_vectors.tfidf_vectorizer is not tfidf_vectorizer:
+        features_by_id = dict(zip(styles_df["id"], styles_df["combined_features"]))
+        _profile_vectors = UserProfileVectors(tfidf_vectorizer, features_by_id)
+    return _profile_vectors
@@ -1,8 +1,10 @@
 # quiz_generator.py
 
+import copy
 import pandas as pd
 import json
 import os
+from profile_store import get_profile_store
 
 STYLES_CSV_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "styles.csv")
 # Corrected path if styles.csv is in attached_assets/data/
@@ -26,17 +28,40 @@ def load_styles_data():
         print(f"Error loading styles.csv: {e}")
         return None
 
+def get_category_hierarchy(df):
+    """Builds masterCategory -> subCategory -> articleType with product counts in one groupby."""
+    counts = df.groupby(["masterCategory", "subCategory", "articleType"], sort=False).size()
+    hierarchy = {}
+    # Groups come out in first-appearance order, matching unique()
+    for (master, sub, article), count in counts.items():
+        master_node = hierarchy.setdefault(master, {"count": 0, "subCategories": {}})
+        sub_node = master_node["subCategories"].setdefault(sub, {"count": 0, "articleTypes": {}})
+        sub_node["articleTypes"][article] = int(count)
+        sub_node["count"] += int(count)
+        master_node["count"] += int(count)
+    return hierarchy
+
+# (DataFrame, options) for the last catalog snapshot passed to get_quiz_options
+_options_cache = None
+
 def get_quiz_options(df):
     """Extracts unique options for quiz questions from the DataFrame."""
+    global _options_cache
     if df is None:
         return {}
+    if _options_cache is not None and _options_cache[0] is df:
+        return copy.deepcopy(_options_cache[1])
     
     options = {}
     options["gender"] = ["Men", "Women", "Unisex"]
-    options["masterCategory"] = df["masterCategory"].unique().tolist()
-    options["subCategory"] = {cat: df[df["masterCategory"] == cat]["subCategory"].unique().tolist() for cat in options["masterCategory"]}
-    options["articleType"] = {sub_cat: df[df["subCategory"] == sub_cat]["articleType"].unique().tolist() 
-                              for cat_val in options["subCategory"].values() for sub_cat in cat_val if df[df["subCategory"] == sub_cat]["articleType"].nunique() > 0}
+    hierarchy = get_category_hierarchy(df)
+    options["masterCategory"] = list(hierarchy)
+    options["subCategory"] = {cat: list(node["subCategories"]) for cat, node in hierarchy.items()}
+    # Keyed by subCategory alone, so a subCategory under several masterCategories gets all their articleTypes
+    options["articleType"] = {sub_cat: [] for sub_cats in options["subCategory"].values() for sub_cat in sub_cats}
+    for sub_cat, article_type in df.groupby(["subCategory", "articleType"], sort=False).size().index:
+        options["articleType"][sub_cat].append(article_type)
+    options["categoryHierarchy"] = hierarchy
     options["baseColour"] = df["baseColour"].unique().tolist()
     # Consolidate seasons, e.g. Fall, Summer, Winter, Spring, All Seasons
     unique_seasons = df["season"].unique().tolist()
@@ -57,7 +82,8 @@ def get_quiz_options(df):
         options["season"] = ["Spring", "Summer", "Fall", "Winter"]
     options["usage"] = df["usage"].unique().tolist()
     
-    return options
+    _options_cache = (df, options)
+    return copy.deepcopy(options)
 
 def generate_quiz_questions(options):
     """Generates a list of quiz questions based on available options."""
@@ -112,27 +138,10 @@ def generate_quiz_questions(options):
     return questions
 
 def save_user_profile(user_id, quiz_answers):
-    """Saves the user's quiz answers as a profile vector in user_profiles.json."""
-    profile_vector = {
-        "user_id": user_id,
-        "preferences": quiz_answers # Directly store the answers for now
-    }
-    
-    profiles = []
-    if os.path.exists(USER_PROFILES_PATH) and os.path.getsize(USER_PROFILES_PATH) > 0:
-        try:
-            with open(USER_PROFILES_PATH, "r") as f:
-                profiles = json.load(f)
-        except json.JSONDecodeError:
-            profiles = [] # Start fresh if file is corrupted
-            
-    # Remove existing profile for the user, if any, to update it
-    profiles = [p for p in profiles if p.get("user_id") != user_id]
-    profiles.append(profile_vector)
-    
+    """Saves the user's quiz answers as their profile in the profile store."""
     try:
-        with open(USER_PROFILES_PATH, "w") as f:
-            json.dump(profiles, f, indent=4)
+        # Upserts one row instead of rewriting every profile
+        get_profile_store(USER_PROFILES_PATH).upsert(user_id, quiz_answers)
         return True
     except Exception as e:
         print(f"Error saving user profile: {e}")
@@ -166,9 +175,7 @@ if __name__ == "__main__":
         if save_user_profile(sample_user_id, sample_answers):
             print(f"\nSuccessfully saved profile for {sample_user_id}")
             # Verify by loading
-            if os.path.exists(USER_PROFILES_PATH):
-                with open(USER_PROFILES_PATH, "r") as f:
-                    print("Current user_profiles.json:", json.dumps(json.load(f), indent=2))
+            print("Stored profile:", json.dumps(get_profile_store(USER_PROFILES_PATH).get(sample_user_id), indent=2))
         else:
             print(f"\nFailed to save profile for {sample_user_id}")
     else:
@@ -1,21 +1,38 @@
 # recommendation_service.py
 
 import pandas as pd
-import json
 import os
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+from interaction_log import InteractionLog, iter_records, migrate_json_interactions
+from profile_store import get_profile_store
+from interaction_index import InteractionIndex
+from tfidf_artifact import artifact_key, load_artifact, save_artifact
+from sparse_scoring import get_item_scorer
+from profile_vectors import get_profile_vectors
 
 STYLES_CSV_PATH_ALT = "/home/ubuntu/fashion_finder/FashionFinder-1/attached_assets/data/styles.csv"
 USER_PROFILES_PATH = "/home/ubuntu/fashion_finder/FashionFinder-1/backend/data/user_profiles.json"
 INTERACTIONS_PATH = "/home/ubuntu/fashion_finder/FashionFinder-1/backend/data/interactions.json"
+# Append-only log that replaces interactions.json; the JSON file is migrated into it once
+INTERACTIONS_LOG_PATH = os.path.join(os.path.dirname(INTERACTIONS_PATH), "interactions.ndjson")
+# Fitted TF-IDF vocabulary, idf and item matrix, keyed to the styles file hash
+TFIDF_ARTIFACT_DIR = os.path.join(os.path.dirname(INTERACTIONS_PATH), "tfidf")
+
+_interaction_log = None
+
+def get_interaction_log():
+    """Opens the interaction log on first use."""
+    global _interaction_log
+    if _interaction_log is None:
+        _interaction_log = InteractionLog(INTERACTIONS_LOG_PATH)
+    return _interaction_log
 
 def load_data():
     """Loads styles, user profiles, and interactions data."""
     styles_df = None
-    user_profiles = []
-    interactions = []
+    user_profiles = {}
+    interactions = InteractionIndex()
     try:
         styles_df = pd.read_csv(STYLES_CSV_PATH_ALT)
         for col in ["gender", "masterCategory", "subCategory", "articleType", "baseColour", "season", "usage", "productDisplayName"]:
@@ -30,31 +47,28 @@ def load_data():
         # Allow to proceed if other files load
 
     try:
-        if os.path.exists(USER_PROFILES_PATH) and os.path.getsize(USER_PROFILES_PATH) > 0:
-            with open(USER_PROFILES_PATH, "r") as f:
-                user_profiles = json.load(f)
-        else:
-            print(f"Info: {USER_PROFILES_PATH} not found or empty. Starting with no user profiles.")
-            user_profiles = []
+        # Keyed store; user_profiles.json is imported into it on first use
+        user_profiles = get_profile_store(USER_PROFILES_PATH)
     except Exception as e:
-        print(f"Error loading user_profiles.json: {e}")
-        user_profiles = []
+        print(f"Error opening the user profile store: {e}")
+        user_profiles = {}
 
     try:
-        if os.path.exists(INTERACTIONS_PATH) and os.path.getsize(INTERACTIONS_PATH) > 0:
-            with open(INTERACTIONS_PATH, "r") as f:
-                interactions = json.load(f)
+        migrate_json_interactions(INTERACTIONS_PATH, INTERACTIONS_LOG_PATH)
+        if os.path.exists(INTERACTIONS_LOG_PATH):
+            # Grouped by user once here so requests never scan the full history
+            interactions = InteractionIndex(iter_records(INTERACTIONS_LOG_PATH))
         else:
-            print(f"Info: {INTERACTIONS_PATH} not found or empty. Starting with no interactions.")
-            interactions = []
+            print(f"Info: {INTERACTIONS_LOG_PATH} not found. Starting with no interactions.")
+            interactions = InteractionIndex()
     except Exception as e:
-        print(f"Error loading interactions.json: {e}")
-        interactions = []
+        print(f"Error loading {INTERACTIONS_LOG_PATH}: {e}")
+        interactions = InteractionIndex()
         
     return styles_df, user_profiles, interactions
 
-def create_item_features(styles_df):
-    """Creates TF-IDF features for items based on their attributes."""
+def create_item_features(styles_df, styles_path=None):
+    """Creates TF-IDF features for items, reusing the saved artifact when the styles file is unchanged."""
     if styles_df is None or styles_df.empty:
         print("Error: styles_df is None or empty in create_item_features.")
         return None, None
@@ -67,7 +81,28 @@ def create_item_features(styles_df):
                                    styles_df["season"] + " " + \
                                    styles_df["usage"] + " " + \
                                    styles_df["productDisplayName"]
-    
+
+    styles_path = styles_path or STYLES_CSV_PATH_ALT
+    key = None
+    try:
+        key = artifact_key(styles_path)
+        artifact = load_artifact(TFIDF_ARTIFACT_DIR, key)
+        # Rows must line up with styles_df, which load_data builds deterministically from the file
+        if artifact is not None and artifact[2] == styles_df["id"].tolist():
+            return artifact[0], artifact[1]
+    except Exception as e:
+        print(f"Could not load TF-IDF artifact, refitting: {e}")
+
+    item_features_matrix, tfidf_vectorizer = fit_item_features(styles_df)
+    if item_features_matrix is not None and key is not None:
+        try:
+            save_artifact(TFIDF_ARTIFACT_DIR, key, item_features_matrix, tfidf_vectorizer, styles_df["id"].tolist())
+        except Exception as e:
+            print(f"Could not save TF-IDF artifact: {e}")
+    return item_features_matrix, tfidf_vectorizer
+
+def fit_item_features(styles_df):
+    """Fits the TF-IDF vectorizer on styles_df["combined_features"]."""
     tfidf_vectorizer = TfidfVectorizer(stop_words="english", min_df=2)
     try:
         item_features_matrix = tfidf_vectorizer.fit_transform(styles_df["combined_features"])
@@ -83,78 +118,78 @@ def create_item_features(styles_df):
             
     return item_features_matrix, tfidf_vectorizer
 
-def record_interaction(user_id, item_id, interaction_type, interactions_list):
+def record_interaction(user_id, item_id, interaction_type, interactions):
     """Records a new user interaction and saves it."""
     new_interaction = {"user_id": user_id, "item_id": str(item_id), "type": interaction_type}
     
     # Avoid duplicate interactions if desired, or allow multiple (e.g. re-liking)
     # For simplicity, we append. A more robust system might update existing or check timestamps.
-    interactions_list.append(new_interaction)
     try:
-        with open(INTERACTIONS_PATH, "w") as f:
-            json.dump(interactions_list, f, indent=4)
-        print(f"Interaction recorded: User {user_id} {interaction_type} item {item_id}")
-        return True
+        # One appended line instead of rewriting the whole history
+        get_interaction_log().append(new_interaction)
     except Exception as e:
-        print(f"Error saving interactions.json: {e}")
-        # Optionally remove the interaction from list if save fails
-        interactions_list.pop()
+        print(f"Error saving interaction to {INTERACTIONS_LOG_PATH}: {e}")
         return False
+    # Only index what was saved, so memory never runs ahead of the log
+    if isinstance(interactions, InteractionIndex):
+        interactions.add(new_interaction)
+    else:
+        # A plain list; InteractionIndex.of builds an index from it when recommending
+        interactions.append(new_interaction)
+    print(f"Interaction recorded: User {user_id} {interaction_type} item {item_id}")
+    return True
+
+def quiz_profile_text(user_quiz_answers):
+    """Builds the profile text for a user's quiz answers."""
+    if not user_quiz_answers:
+        return ""
+    preferred_gender = user_quiz_answers.get("gender_preference", "")
+    preferred_master_categories = user_quiz_answers.get("master_category_preference", [])
+    # ... (include all quiz fields as before)
+    preferred_sub_categories_apparel = user_quiz_answers.get("subCategory_Apparel", [])
+    preferred_sub_categories_footwear = user_quiz_answers.get("subCategory_Footwear", [])
+    preferred_article_types_topwear = user_quiz_answers.get("articleType_Topwear", [])
+    preferred_article_types_shoes = user_quiz_answers.get("articleType_Shoes", [])
+    preferred_colours = user_quiz_answers.get("colour_preference", [])
+    preferred_seasons = user_quiz_answers.get("season_preference", [])
+    preferred_usages = user_quiz_answers.get("usage_preference", [])
+
+    quiz_profile_text = f"{preferred_gender} " \
+                        f"{' '.join(preferred_master_categories)} " \
+                        f"{' '.join(preferred_sub_categories_apparel)} " \
+                        f"{' '.join(preferred_sub_categories_footwear)} " \
+                        f"{' '.join(preferred_article_types_topwear)} " \
+                        f"{' '.join(preferred_article_types_shoes)} " \
+                        f"{' '.join(preferred_colours)} " \
+                        f"{' '.join(preferred_seasons)} " \
+                        f"{' '.join(preferred_usages)}"
+    return quiz_profile_text.replace("  ", " ").strip()
+
+def user_profile_text(quiz_text, liked_item_texts):
+    """Joins quiz text and liked items' combined_features into one profile document."""
+    profile_texts = []
+    if quiz_text:
+        profile_texts.append(quiz_text)
+    # Use a sample or all liked items. Using all for now.
+    liked_item_features_text = " ".join(liked_item_texts)
+    if liked_item_features_text:
+        profile_texts.append(liked_item_features_text)
+    return " ".join(profile_texts).strip()
 
 def create_user_profile_vector(user_quiz_answers, user_id, interactions, styles_df, tfidf_vectorizer):
     """Creates a TF-IDF vector for a user based on quiz answers and liked items."""
     if not hasattr(tfidf_vectorizer, "transform") or styles_df is None:
         return None
 
-    profile_texts = []
     # 1. From Quiz Answers
-    if user_quiz_answers:
-        preferred_gender = user_quiz_answers.get("gender_preference", "")
-        preferred_master_categories = user_quiz_answers.get("master_category_preference", [])
-        # ... (include all quiz fields as before)
-        preferred_sub_categories_apparel = user_quiz_answers.get("subCategory_Apparel", [])
-        preferred_sub_categories_footwear = user_quiz_answers.get("subCategory_Footwear", [])
-        preferred_article_types_topwear = user_quiz_answers.get("articleType_Topwear", [])
-        preferred_article_types_shoes = user_quiz_answers.get("articleType_Shoes", [])
-        preferred_colours = user_quiz_answers.get("colour_preference", [])
-        preferred_seasons = user_quiz_answers.get("season_preference", [])
-        preferred_usages = user_quiz_answers.get("usage_preference", [])
-
-        quiz_profile_text = f"{preferred_gender} " \
-                            f"{' '.join(preferred_master_categories)} " \
-                            f"{' '.join(preferred_sub_categories_apparel)} " \
-                            f"{' '.join(preferred_sub_categories_footwear)} " \
-                            f"{' '.join(preferred_article_types_topwear)} " \
-                            f"{' '.join(preferred_article_types_shoes)} " \
-                            f"{' '.join(preferred_colours)} " \
-                            f"{' '.join(preferred_seasons)} " \
-                            f"{' '.join(preferred_usages)}"
-        quiz_profile_text = quiz_profile_text.replace("  ", " ").strip()
-        if quiz_profile_text:
-            profile_texts.append(quiz_profile_text)
-
-    # 2. From Liked Items
-    liked_item_features_text = ""
-    if interactions:
-        user_liked_items = [inter["item_id"] for inter in interactions if inter["user_id"] == user_id and inter["type"] == "like"]
-        if user_liked_items:
-            liked_items_df = styles_df[styles_df["id"].isin(user_liked_items)]
-            if not liked_items_df.empty:
-                # Use a sample or all liked items. Using all for now.
-                liked_item_features_text = " ".join(liked_items_df["combined_features"].tolist())
-    
-    if liked_item_features_text:
-        profile_texts.append(liked_item_features_text)
+    quiz_text = quiz_profile_text(user_quiz_answers)
 
-    if not profile_texts:
+    # 2. From Liked Items, kept as a running sum that record_interaction updates
+    profile_vectors = get_profile_vectors(tfidf_vectorizer, styles_df)
+    user_vector = profile_vectors.vector(user_id, quiz_text, InteractionIndex.of(interactions))
+    if user_vector is None:
         # Return a zero vector if no preferences from quiz or likes
         return np.zeros((1, tfidf_vectorizer.idf_.shape[0]))
-    
-    combined_profile_text = " ".join(profile_texts).strip()
-    if not combined_profile_text:
-        return np.zeros((1, tfidf_vectorizer.idf_.shape[0]))
-        
-    user_vector = tfidf_vectorizer.transform([combined_profile_text])
     return user_vector
 
 def get_content_based_recommendations(user_id, styles_df, item_features_matrix, user_profiles, interactions, tfidf_vectorizer, top_n=10):
@@ -163,11 +198,12 @@ def get_content_based_recommendations(user_id, styles_df, item_features_matrix,
         print("Missing data for recommendations")
         return []
 
-    user_profile_data = next((p for p in user_profiles if p.get("user_id") == user_id), None)
-    user_quiz_answers = user_profile_data.get("preferences") if user_profile_data else {}
+    # user_profiles maps user_id to quiz answers (a ProfileStore or a plain dict)
+    user_quiz_answers = user_profiles.get(user_id) or {}
+    interactions = InteractionIndex.of(interactions)
 
     # If no quiz profile, rely solely on liked items (or popular if no likes either)
-    if not user_quiz_answers and not any(inter["user_id"] == user_id and inter["type"] == "like" for inter in interactions):
+    if not user_quiz_answers and not interactions.has(user_id, "like"):
         print(f"No profile or likes for user {user_id}. Recommending popular/random items.")
         return styles_df.sample(min(top_n, len(styles_df)))["id"].tolist() if not styles_df.empty else []
 
@@ -177,27 +213,18 @@ def get_content_based_recommendations(user_id, styles_df, item_features_matrix,
         print(f"Could not create a valid profile vector for user {user_id}. Recommending popular/random items.")
         return styles_df.sample(min(top_n, len(styles_df)))["id"].tolist() if not styles_df.empty else []
 
-    cosine_similarities = cosine_similarity(user_vector, item_features_matrix)
-    similarity_scores = cosine_similarities[0]
-    
     # Filter out items already interacted with by the user
-    user_interacted_items = {inter["item_id"] for inter in interactions if inter["user_id"] == user_id}
-    
-    # Create a DataFrame for easy filtering and sorting
-    recs_df = pd.DataFrame({
-        "item_id": styles_df["id"],
-        "score": similarity_scores
-    })
-    recs_df = recs_df[~recs_df["item_id"].isin(user_interacted_items)] # Exclude interacted items
-    recs_df = recs_df.sort_values(by="score", ascending=False)
-    
-    recommended_item_ids = recs_df.head(top_n)["item_id"].tolist()
+    user_interacted_items = interactions.interacted_items(user_id)
+
+    # Sparse user x item product with interacted items masked and an argpartition top-n
+    scorer = get_item_scorer(item_features_matrix, styles_df["id"])
+    recommended_item_ids = scorer.top_n(user_vector, user_interacted_items, top_n)
     
     return recommended_item_ids
 
 
 if __name__ == "__main__":
-    styles_df, user_profiles, interactions_list = load_data()
+    styles_df, user_profiles, interactions = load_data()
     
     if styles_df is not None:
         item_features, tfidf_vec = create_item_features(styles_df)
@@ -207,11 +234,11 @@ if __name__ == "__main__":
             # print(f"TF-IDF vocabulary: {tfidf_vec.get_feature_names_out()[:50]}") # Print some vocab terms
 
             sample_user_id = "user123" # Assumes this user has a profile from quiz_generator.py
-            if not any(p.get("user_id") == sample_user_id for p in user_profiles):
+            if sample_user_id not in user_profiles:
                 print(f"Profile for {sample_user_id} not found. Run quiz_generator.py or add manually.")
             else:
                 print(f"\n--- Initial Recommendations for {sample_user_id} (before new interaction) ---")
-                initial_recs = get_content_based_recommendations(sample_user_id, styles_df, item_features, user_profiles, interactions_list, tfidf_vec, top_n=5)
+                initial_recs = get_content_based_recommendations(sample_user_id, styles_df, item_features, user_profiles, interactions, tfidf_vec, top_n=5)
                 print(f"Recommendations: {initial_recs}")
                 if initial_recs:
                     print(styles_df[styles_df["id"].isin(initial_recs)][["id", "productDisplayName", "baseColour"]])
@@ -221,7 +248,7 @@ if __name__ == "__main__":
                 all_item_ids = styles_df["id"].tolist()
                 liked_item_id = None
                 for item_id_candidate in all_item_ids:
-                    if item_id_candidate not in initial_recs and item_id_candidate not in [inter["item_id"] for inter in interactions_list if inter["user_id"] == sample_user_id]:
+                    if item_id_candidate not in initial_recs and item_id_candidate not in interactions.interacted_items(sample_user_id):
                         liked_item_id = item_id_candidate
                         break
                 
@@ -231,11 +258,11 @@ if __name__ == "__main__":
                     print(f"Liked item: {liked_item_details['productDisplayName']}")
                     # print(f"Liked item features: {liked_item_details['combined_features']}")
                     
-                    record_interaction(sample_user_id, liked_item_id, "like", interactions_list)
+                    record_interaction(sample_user_id, liked_item_id, "like", interactions)
                     
                     # Get recommendations again AFTER the interaction
                     print(f"\n--- Recommendations for {sample_user_id} (after liking item {liked_item_id}) ---")
-                    updated_recs = get_content_based_recommendations(sample_user_id, styles_df, item_features, user_profiles, interactions_list, tfidf_vec, top_n=5)
+                    updated_recs = get_content_based_recommendations(sample_user_id, styles_df, item_features, user_profiles, interactions, tfidf_vec, top_n=5)
                     print(f"Updated Recommendations: {updated_recs}")
                     if updated_recs:
                         print(styles_df[styles_df["id"].isin(updated_recs)][["id", "productDisplayName", "baseColour"]])
@@ -247,16 +274,16 @@ if __name__ == "__main__":
 
             # Test user with no quiz profile, but with likes
             test_user_likes_only = "user_likes_only"
-            # Ensure this user is not in user_profiles.json from quiz
-            user_profiles_temp = [p for p in user_profiles if p.get("user_id") != test_user_likes_only]
+            # Ensure this user has no quiz profile
+            user_profiles_temp = {}
             # Add some interactions for this user
             if styles_df is not None and not styles_df.empty:
                 items_to_like_for_test = styles_df.sample(2)["id"].tolist()
                 for item_to_like in items_to_like_for_test:
-                     record_interaction(test_user_likes_only, item_to_like, "like", interactions_list)
+                     record_interaction(test_user_likes_only, item_to_like, "like", interactions)
             
             print(f"\n--- Recommendations for {test_user_likes_only} (likes only, no quiz profile) ---")       
-            recs_likes_only = get_content_based_recommendations(test_user_likes_only, styles_df, item_features, user_profiles_temp, interactions_list, tfidf_vec, top_n=3)
+            recs_likes_only = get_content_based_recommendations(test_user_likes_only, styles_df, item_features, user_profiles_temp, interactions, tfidf_vec, top_n=3)
             print(f"Recommendations for {test_user_likes_only}: {recs_likes_only}")
             if recs_likes_only:
                 print(styles_df[styles_df["id"].isin(recs_likes_only)][["id", "productDisplayName"]])
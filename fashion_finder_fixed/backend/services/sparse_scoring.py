@@ -0,0 +1,112 @@
+# sparse_scoring.py
+
+import numpy as np
+from scipy import sparse
+
+
+class ItemScorer:
+    """Top-n content-based scoring straight from the sparse TF-IDF item matrix.
+
+    The matrix is kept transposed (terms x items) in CSR form, so a user vector
+    times it only reads the rows of the terms the user actually has. Item rows
+    are L2-normalised by TfidfVectorizer, so the dot product ranks items
+    exactly like cosine similarity without normalising the user vector.
+    """
+
+    def __init__(self, item_features_matrix, item_ids):
+        self.term_items = sparse.csr_matrix(item_features_matrix).T.tocsr()
+        self.item_ids = np.asarray(item_ids, dtype=object)
+        self.row_of = {item_id: row for row, item_id in enumerate(self.item_ids)}
+
+    def rows(self, item_ids):
+        """Matrix rows of the given item ids; unknown ids are skipped."""
+        row_of = self.row_of
+        return np.fromiter((row_of[i] for i in item_ids if i in row_of), dtype=np.int64)
+
+    def scores(self, user_vector):
+        """(rows, scores) of every item with a nonzero score for the user."""
+        product = sparse.csr_matrix(user_vector) @ self.term_items
+        return product.indices, product.data
+
+    def top_n(self, user_vector, exclude_ids=(), top_n=10):
+        """Item ids of the top_n highest scoring items, skipping exclude_ids."""
+        rows, scores = self.scores(user_vector)
+        return self._rank(rows, scores, self.rows(exclude_ids), top_n)
+
+    def top_n_batch(self, user_matrix, exclude_ids_per_user, top_n=10):
+        """top_n for every row of a users x terms matrix, with one sparse product for all of them."""
+        product = sparse.csr_matrix(user_matrix) @ self.term_items
+        results = []
+        for i, exclude_ids in enumerate(exclude_ids_per_user):
+            start, end = product.indptr[i], product.indptr[i + 1]
+            results.append(self._rank(product.indices[start:end], product.data[start:end],
+                                      self.rows(exclude_ids), top_n))
+        return results
+
+    def _rank(self, rows, scores, exclude_rows, top_n):
+        if len(exclude_rows):
+            keep = ~np.isin(rows, exclude_rows)
+            rows, scores = rows[keep], scores[keep]
+
+        if len(rows) > top_n:
+            best = np.argpartition(scores, len(scores) - top_n)[-top_n:]
+            rows, scores = rows[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        ranked = rows[order].tolist()
+
+        # Too few matching items: pad with unmatched ones in catalog order, as the full sort did
+        if len(ranked) < top_n:
+            taken = set(ranked)
+            taken.update(exclude_rows.tolist())
+            for row in range(len(self.item_ids)):
+                if len(ranked) >= top_n:
+                    break
+                if row not in taken:
+                    ranked.append(row)
+        return self.item_ids[ranked].tolist()
+
+
+_scorer = None
+
+
+def get_item_scorer(item_features_matrix, item_ids):
+    """The scorer for this item matrix, built on first use and reused while the matrix is unchanged."""
+    global _scorer
+    if _scorer is None or _scorer[0] is not item_features_matrix:
+        _scorer = (item_features_matrix, ItemScorer(item_features_matrix, item_ids))
+    return _scorer[1]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from sklearn.preprocessing import normalize
+
+    parser = argparse.ArgumentParser(description="Benchmark per-user top-n scoring")
+    parser.add_argument("--items", type=int, default=500000)
+    parser.add_argument("--terms", type=int, default=3000, help="Vocabulary size")
+    parser.add_argument("--users", type=int, default=200)
+    args = parser.parse_args()
+
+    # Synthetic catalog with ~14 terms per item and skewed term popularity
+    rng = np.random.default_rng(0)
+    per_item = 14
+    columns = (rng.zipf(1.3, args.items * per_item) - 1) % args.terms
+    item_rows = np.repeat(np.arange(args.items), per_item)
+    matrix = normalize(sparse.csr_matrix(
+        (rng.random(len(columns)), (item_rows, columns)), shape=(args.items, args.terms)))
+    started = time.perf_counter()
+    scorer = ItemScorer(matrix, [str(i) for i in range(args.items)])
+    print(f"Built scorer for {args.items} items in {time.perf_counter() - started:.2f}s")
+
+    timings = []
+    for _ in range(args.users):
+        terms = rng.choice(args.terms, 40, replace=False)
+        user_vector = sparse.csr_matrix((rng.random(40), (np.zeros(40, dtype=int), terms)), shape=(1, args.terms))
+        excluded = [str(i) for i in rng.integers(0, args.items, 50)]
+        started = time.perf_counter()
+        scorer.top_n(user_vector, excluded, top_n=10)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(f"top_n per user: p50 {timings[len(timings) // 2] * 1000:.2f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms")
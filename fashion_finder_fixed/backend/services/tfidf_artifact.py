@@ -0,0 +1,76 @@
+# tfidf_artifact.py
+
+import hashlib
+import os
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+# Bump when the combined_features recipe or vectorizer settings change, so old artifacts are ignored
+ARTIFACT_VERSION = 1
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def artifact_key(styles_path):
+    """Identifies the artifact for the current styles file and feature recipe."""
+    return f"v{ARTIFACT_VERSION}-{file_digest(styles_path)[:16]}"
+
+
+def artifact_path(artifact_dir, key):
+    return os.path.join(artifact_dir, f"tfidf-{key}.npz")
+
+
+def save_artifact(artifact_dir, key, item_features_matrix, tfidf_vectorizer, item_ids):
+    """Writes the item matrix, vocabulary, idf and item ids to one npz file."""
+    os.makedirs(artifact_dir, exist_ok=True)
+    matrix = sparse.csr_matrix(item_features_matrix)
+    vocabulary = tfidf_vectorizer.vocabulary_
+    terms = np.empty(len(vocabulary), dtype=object)
+    for term, column in vocabulary.items():
+        terms[column] = term
+
+    path = artifact_path(artifact_dir, key)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            data=matrix.data, indices=matrix.indices, indptr=matrix.indptr, shape=np.array(matrix.shape),
+            terms=terms.astype(str), idf=tfidf_vectorizer.idf_, item_ids=np.asarray(item_ids, dtype=str),
+            stop_words=np.array(tfidf_vectorizer.stop_words or "")
+        )
+    os.replace(tmp_path, path)
+
+    # Only the artifact for the current catalog is worth keeping
+    for name in os.listdir(artifact_dir):
+        if name.startswith("tfidf-") and name.endswith(".npz") and name != os.path.basename(path):
+            os.remove(os.path.join(artifact_dir, name))
+    return path
+
+
+def load_artifact(artifact_dir, key):
+    """Returns (item_features_matrix, tfidf_vectorizer, item_ids), or None if there is no artifact for key."""
+    path = artifact_path(artifact_dir, key)
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as npz:
+        matrix = sparse.csr_matrix(
+            (npz["data"], npz["indices"], npz["indptr"]), shape=tuple(npz["shape"])
+        )
+        terms = npz["terms"].tolist()
+        idf = npz["idf"]
+        item_ids = npz["item_ids"].tolist()
+        stop_words = str(npz["stop_words"]) or None
+
+    # A fitted vectorizer is just its vocabulary and idf weights
+    tfidf_vectorizer = TfidfVectorizer(stop_words=stop_words)
+    tfidf_vectorizer.vocabulary_ = {term: column for column, term in enumerate(terms)}
+    tfidf_vectorizer.idf_ = idf
+    return matrix, tfidf_vectorizer, item_ids
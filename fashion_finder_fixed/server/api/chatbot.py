@@ -2,8 +2,11 @@
 API endpoint for chatbot functionality
 """
 
-from flask import Blueprint, jsonify, request
+import time
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from services.chatbot_service import FashionChatbot
+from services.chat_sessions import get_chat_session_store
+from services.chat_stream import chat_latency, stream_reply
 
 # Create blueprint
 chatbot_bp = Blueprint('chatbot', __name__)
@@ -14,6 +17,7 @@ chatbot = FashionChatbot()
 @chatbot_bp.route('/api/chat', methods=['POST'])
 def chat():
     """Process a chat message and return a response"""
+    started = time.perf_counter()
     try:
         # Get message from request body
         data = request.get_json()
@@ -25,13 +29,31 @@ def chat():
                 'message': 'No message provided'
             }), 400
         
-        # Get response from chatbot
-        response = chatbot.get_response(message)
+        # Conversation state for follow-ups; clients send back the sessionId of the previous reply
+        store = get_chat_session_store()
+        session_id = data.get('sessionId') or request.headers.get('X-Chat-Session') or store.new_session_id()
+        
+        # Stream the reply as Server-Sent Events when asked to
+        if request.args.get('stream') == '1' or 'text/event-stream' in request.headers.get('Accept', ''):
+            return Response(
+                stream_with_context(stream_reply(chatbot, message, started, session_id)),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', 'X-Chat-Session': session_id}
+            )
+        
+        # Get response from chatbot, with any catalog products it refers to
+        session = store.get(session_id)
+        reply = chatbot.get_reply(message, session)
+        if session.has_results:
+            store.put(session_id, session)
+        chat_latency.record('json_total', time.perf_counter() - started)
         
         # Return response
         return jsonify({
             'success': True,
-            'response': response
+            'sessionId': session_id,
+            'response': reply['response'],
+            'products': reply['products']
         })
     except Exception as e:
         print(f"Error processing chat message: {e}")
@@ -39,3 +61,19 @@ def chat():
             'success': False,
             'message': f'Failed to process message: {str(e)}'
         }), 500
+
+@chatbot_bp.route('/stats', methods=['GET'])
+def get_chat_stats():
+    """Get latency percentiles for streamed and JSON chat replies"""
+    try:
+        return jsonify(chat_latency.get_stats()), 200
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+@chatbot_bp.route('/sessions/stats', methods=['GET'])
+def get_chat_session_stats():
+    """Get chat session store size and counters"""
+    try:
+        return jsonify(get_chat_session_store().get_stats()), 200
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
@@ -9,7 +9,7 @@ import time
 import threading
 import csv
 from ..services.embedding_recommendation_service import EmbeddingRecommendationService
-from ..models.interaction import Interaction
+from ..models.user_signals import UserSignals
 
 # Initialize blueprint
 embeddings_bp = Blueprint('embeddings_api', __name__)
@@ -127,12 +127,9 @@ def get_embedding_recommendations():
         user_id = session.get('user_id', 'demo-user-123')
         
         # Get user interactions
-        liked_interactions = Interaction.get_user_interactions_by_type(user_id, 'like')
-        disliked_interactions = Interaction.get_user_interactions_by_type(user_id, 'dislike')
-        
-        # Extract product IDs
-        liked_product_ids = [interaction.product_id for interaction in liked_interactions]
-        disliked_product_ids = [interaction.product_id for interaction in disliked_interactions]
+        signals = UserSignals.load(user_id)
+        liked_product_ids = list(signals.liked)
+        disliked_product_ids = list(signals.disliked)
         
         print(f"User {user_id} has liked {len(liked_product_ids)} products and disliked {len(disliked_product_ids)} products")
         
@@ -187,8 +184,7 @@ def get_similar_products(product_id):
         user_id = session.get('user_id', 'demo-user-123')
         
         # Get disliked products to exclude them
-        disliked_interactions = Interaction.get_user_interactions_by_type(user_id, 'dislike')
-        disliked_product_ids = [interaction.product_id for interaction in disliked_interactions]
+        disliked_product_ids = list(UserSignals.load(user_id).disliked)
         
         # Get recommendations
         similar_products = recommendation_service.get_recommendations_for_product(
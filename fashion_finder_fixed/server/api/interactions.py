@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.interaction import Interaction
+from utils.cache_invalidation import invalidate_user
+from services.view_write_queue import get_view_queue
+from services.user_state_cache import get_user_state_cache
 
 interactions_bp = Blueprint('interactions', __name__)
 
@@ -24,11 +27,12 @@ def toggle_like():
         if interaction_type not in ['like', 'dislike']:
             return jsonify({'message': 'Interaction type must be "like" or "dislike"'}), 400
         
-        # Delete any existing like/dislike for this product
-        Interaction.delete_like_dislike(user_id, product_id)
+        # Replace any existing like/dislike for this product in one transaction
+        interaction = Interaction.toggle_reaction(user_id, product_id, interaction_type)
         
-        # Create new interaction
-        interaction = Interaction.create(user_id, product_id, interaction_type)
+        # Keep the cached like/dislike sets in step; recommendations are now stale
+        get_user_state_cache().apply_reaction(user_id, product_id, interaction_type)
+        invalidate_user(user_id)
         
         return jsonify({
             'message': f'Product {interaction_type}d successfully',
@@ -53,13 +57,23 @@ def record_view():
         if not product_id:
             return jsonify({'message': 'Product ID is required'}), 400
         
-        # Create view interaction
-        interaction = Interaction.create(user_id, product_id, 'view')
+        # Views are written in batches by a background thread
+        if not get_view_queue().record(user_id, product_id):
+            return jsonify({'message': 'Too many views right now, view not recorded'}), 503
         
         return jsonify({
-            'message': 'Product view recorded successfully',
-            'interaction': interaction.to_dict()
-        }), 201
+            'message': 'Product view queued',
+            'productId': product_id
+        }), 202
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+@interactions_bp.route('/view/stats', methods=['GET'])
+@jwt_required()
+def get_view_queue_stats():
+    """Get counters for the view write queue"""
+    try:
+        return jsonify(get_view_queue().get_stats()), 200
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
@@ -4,7 +4,7 @@ from services.product_service import (
     get_all_products, get_product_by_id, 
     get_similar_products, get_featured_products, search_products
 )
-from models.interaction import Interaction
+from services.user_state_cache import get_user_state
 
 products_bp = Blueprint('products', __name__)
 
@@ -60,10 +60,11 @@ def get_products():
         jwt_identity = get_jwt_identity()
         if jwt_identity:
             user_id = jwt_identity
-            liked_products = Interaction.get_liked_products(user_id)
+            liked_products = get_user_state(user_id).liked
             
-            for product in result['products']:
-                product['isLiked'] = product['id'] in liked_products
+            # Annotate copies; the catalog dicts are shared between requests
+            result['products'] = [dict(product, isLiked=product['id'] in liked_products)
+                                  for product in result['products']]
         
         return jsonify(result), 200
     except Exception as e:
@@ -82,8 +83,7 @@ def get_product(product_id):
         jwt_identity = get_jwt_identity()
         if jwt_identity:
             user_id = jwt_identity
-            liked_products = Interaction.get_liked_products(user_id)
-            product['isLiked'] = product['id'] in liked_products
+            product = dict(product, isLiked=product['id'] in get_user_state(user_id).liked)
         
         return jsonify(product), 200
     except Exception as e:
@@ -103,10 +103,10 @@ def get_similar(product_id):
         jwt_identity = get_jwt_identity()
         if jwt_identity:
             user_id = jwt_identity
-            liked_products = Interaction.get_liked_products(user_id)
+            liked_products = get_user_state(user_id).liked
             
-            for product in similar_products:
-                product['isLiked'] = product['id'] in liked_products
+            # Annotate copies; the catalog dicts are shared between requests
+            similar_products = [dict(product, isLiked=product['id'] in liked_products) for product in similar_products]
         
         return jsonify(similar_products), 200
     except Exception as e:
@@ -123,10 +123,10 @@ def get_featured():
         jwt_identity = get_jwt_identity()
         if jwt_identity:
             user_id = jwt_identity
-            liked_products = Interaction.get_liked_products(user_id)
+            liked_products = get_user_state(user_id).liked
             
-            for product in featured_products:
-                product['isLiked'] = product['id'] in liked_products
+            # Annotate copies; the catalog dicts are shared between requests
+            featured_products = [dict(product, isLiked=product['id'] in liked_products) for product in featured_products]
         
         return jsonify(featured_products), 200
     except Exception as e:
@@ -148,10 +148,10 @@ def search():
         jwt_identity = get_jwt_identity()
         if jwt_identity:
             user_id = jwt_identity
-            liked_products = Interaction.get_liked_products(user_id)
+            liked_products = get_user_state(user_id).liked
             
-            for product in search_results:
-                product['isLiked'] = product['id'] in liked_products
+            # Annotate copies; the catalog dicts are shared between requests
+            search_results = [dict(product, isLiked=product['id'] in liked_products) for product in search_results]
         
         return jsonify(search_results), 200
     except Exception as e:
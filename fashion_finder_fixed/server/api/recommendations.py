@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from services.recommendation_service import RecommendationService
-from services.quiz_service import QuizService
+from models.user_signals import UserSignals
 
 recommendations_bp = Blueprint('recommendations', __name__)
 
@@ -12,14 +12,17 @@ def get_recommendations():
     try:
         user_id = get_jwt_identity()
         
+        # Load quiz answers and interactions once for the whole request
+        signals = UserSignals.load(user_id)
+        
         # Check if user has completed the quiz
-        has_completed_quiz = QuizService.has_completed_quiz(user_id)
+        has_completed_quiz = signals.has_quiz
         
         # Get limit from query params
         limit = int(request.args.get('limit', 8))
         
         # Get recommendations
-        recommendations = RecommendationService.get_recommendations_for_user(user_id, limit)
+        recommendations = RecommendationService.get_recommendations_for_user(user_id, limit, signals=signals)
         
         # If user hasn't completed the quiz and there are no recommendations
         if not has_completed_quiz and not recommendations:
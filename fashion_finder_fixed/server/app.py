@@ -6,10 +6,16 @@ from flask import Flask, Blueprint
 from api.chatbot import chatbot_bp
 from api.enhanced_recommendations import enhanced_recommendations_bp
 from api.quiz import quiz_bp
+from utils.json_provider import FashionJSONProvider
+from models.migrations import run_migrations
 
 def create_app():
     """Create and configure the Flask application"""
     app = Flask(__name__)
+    app.json = FashionJSONProvider(app)
+    
+    # Bring the database schema and indexes up to date
+    run_migrations()
     
     # Register blueprints
     app.register_blueprint(chatbot_bp, url_prefix='/api/chat')
@@ -0,0 +1,155 @@
+"""
+ASGI entry point for the Flask app
+
+Run from the server directory with any ASGI server, for example:
+    uvicorn asgi:create_asgi_app --factory --port 5001
+
+The app is the same create_app() the WSGI server runs. Connections are held
+by the event loop, and each request runs on a bounded pool
+(utils.executors). Recommendation scoring and chat search go to the CPU
+pool, everything else (quiz, interactions, auth: SQLite work) to the
+database pool. A full pool answers 503 at once instead of queueing.
+
+Compare both modes at 500 concurrent connections:
+    python asgi.py --connections 500 --requests 20000
+"""
+
+from flask import jsonify
+from app import create_app
+from utils.asgi_adapter import AsgiAdapter
+from utils.executors import cpu_executor, db_executor
+
+# Routes whose handlers are dominated by numpy/sklearn work rather than SQLite
+CPU_BOUND_PREFIXES = (
+    '/api/chat',
+    '/api/enhanced-recommendations',
+    '/api/recommendations',
+    '/api/embedding'
+)
+
+
+def create_asgi_app(flask_app=None):
+    """Wrap the Flask app for an ASGI server"""
+    flask_app = flask_app or create_app()
+
+    @flask_app.route('/api/executors/stats', methods=['GET'])
+    def get_executor_stats():
+        """Get load and admit/reject counters for the request pools"""
+        return jsonify({'db': db_executor.get_stats(), 'cpu': cpu_executor.get_stats()}), 200
+
+    return AsgiAdapter(flask_app, db_executor, [(prefix, cpu_executor) for prefix in CPU_BOUND_PREFIXES])
+
+
+# Default benchmark mix: a light DB-side route and a grounded chat reply
+BENCHMARK_REQUESTS = [
+    'GET /api/quiz/questions',
+    'POST /api/chat/api/chat {"message": "recommend black sports shoes for men"}'
+]
+
+
+def _parse_request(spec):
+    """'METHOD PATH [JSON body]' to raw HTTP/1.1 request bytes"""
+    parts = spec.split(' ', 2)
+    method, path = parts[0], parts[1]
+    body = parts[2].encode() if len(parts) > 2 else b''
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+    if body:
+        head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+    return (head + "\r\n").encode() + body
+
+
+async def _load(port, requests, connections, total):
+    """Send `total` requests over `connections` concurrent connections; one request per connection"""
+    import asyncio
+    import time
+
+    latencies, statuses = [], {}
+    remaining = [total]
+
+    async def client():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            raw = requests[remaining[0] % len(requests)]
+            started = time.perf_counter()
+            try:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                writer.write(raw)
+                await writer.drain()
+                response = await reader.read()
+                writer.close()
+                status = int(response.split(b' ', 2)[1]) if response else 'empty'
+            except (OSError, ValueError, IndexError):
+                status = 'error'
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(connections)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'seconds': elapsed,
+        'rps': total / elapsed,
+        'ok_rps': sum(n for status, n in statuses.items() if status == 200) / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+        'statuses': statuses
+    }
+
+
+def _serve(mode, port):
+    """Start the app in a child process; WSGI is the threaded server app.py uses"""
+    import os
+    import socket
+    import subprocess
+    import sys
+    import time
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    if mode == 'wsgi':
+        command = [sys.executable, '-c',
+                   f"from app import create_app; create_app().run(host='127.0.0.1', port={port}, threaded=True)"]
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:create_asgi_app', '--factory', '--host', '127.0.0.1',
+                   '--port', str(port), '--log-level', 'warning', '--no-access-log', '--backlog', '2048']
+    server = subprocess.Popen(command, cwd=here, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                raise SystemExit(f"{mode} server exited with code {server.returncode}")
+            time.sleep(0.2)
+    server.kill()
+    raise SystemExit(f"{mode} server did not start on port {port}")
+
+
+if __name__ == '__main__':
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description='Compare the WSGI and ASGI modes under concurrent load')
+    parser.add_argument('--connections', type=int, default=500, help='Concurrent client connections')
+    parser.add_argument('--requests', type=int, default=20000, help='Requests per mode')
+    parser.add_argument('--request', action='append', dest='request_specs',
+                        help="'METHOD PATH [JSON body]'; repeat for a mix (default: quiz questions and a chat reply)")
+    parser.add_argument('--modes', default='wsgi,asgi')
+    parser.add_argument('--port', type=int, default=5101)
+    args = parser.parse_args()
+
+    requests = [_parse_request(spec) for spec in (args.request_specs or BENCHMARK_REQUESTS)]
+    for offset, mode in enumerate(args.modes.split(',')):
+        port = args.port + offset
+        server = _serve(mode, port)
+        try:
+            # Warm up caches and lazy loads before measuring
+            asyncio.run(_load(port, requests, 4, 20))
+            result = asyncio.run(_load(port, requests, args.connections, args.requests))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{mode}: {result['rps']:.0f} req/s ({result['ok_rps']:.0f} ok/s), p50 {result['p50_ms']:.1f} ms, "
+              f"p99 {result['p99_ms']:.1f} ms, statuses {result['statuses']}")
@@ -1,6 +1,9 @@
 import sqlite3
-import os
 from datetime import datetime
+from utils.db import connection, transaction
+
+# INSERT ... RETURNING needs SQLite 3.35 or newer
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
 
 class Interaction:
     def __init__(self, id, user_id, product_id, interaction_type, created_at=None):
@@ -13,17 +16,13 @@ class Interaction:
     @staticmethod
     def create(user_id, product_id, interaction_type):
         """Create a new interaction in the database"""
-        db_path = os.path.join(os.path.dirname(__file__), '../../data/fashionfinder.db')
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        try:
+        with transaction() as conn:
+            cursor = conn.cursor()
             cursor.execute(
                 "INSERT INTO interactions (user_id, product_id, interaction_type) VALUES (?, ?, ?)",
                 (user_id, product_id, interaction_type)
             )
             interaction_id = cursor.lastrowid
-            conn.commit()
             
             # Fetch the created interaction
             cursor.execute(
@@ -31,26 +30,18 @@ class Interaction:
                 (interaction_id,)
             )
             interaction_data = cursor.fetchone()
-            return Interaction(*interaction_data)
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+        return Interaction(*interaction_data)
     
     @staticmethod
     def get_by_user_id(user_id):
         """Retrieve all interactions for a user"""
-        db_path = os.path.join(os.path.dirname(__file__), '../../data/fashionfinder.db')
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT id, user_id, product_id, interaction_type, created_at FROM interactions WHERE user_id = ?",
-            (user_id,)
-        )
-        interactions_data = cursor.fetchall()
-        conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT id, user_id, product_id, interaction_type, created_at FROM interactions WHERE user_id = ?",
+                (user_id,)
+            )
+            interactions_data = cursor.fetchall()
         
         interactions = []
         for interaction_data in interactions_data:
@@ -60,16 +51,13 @@ class Interaction:
     @staticmethod
     def get_by_user_id_and_product_id(user_id, product_id):
         """Retrieve interactions for a specific user and product"""
-        db_path = os.path.join(os.path.dirname(__file__), '../../data/fashionfinder.db')
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT id, user_id, product_id, interaction_type, created_at FROM interactions WHERE user_id = ? AND product_id = ?",
-            (user_id, product_id)
-        )
-        interactions_data = cursor.fetchall()
-        conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT id, user_id, product_id, interaction_type, created_at FROM interactions WHERE user_id = ? AND product_id = ?",
+                (user_id, product_id)
+            )
+            interactions_data = cursor.fetchall()
         
         interactions = []
         for interaction_data in interactions_data:
@@ -79,52 +67,66 @@ class Interaction:
     @staticmethod
     def delete_like_dislike(user_id, product_id):
         """Delete like/dislike interactions for a user and product"""
-        db_path = os.path.join(os.path.dirname(__file__), '../../data/fashionfinder.db')
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        try:
+        with transaction() as conn:
+            conn.execute(
+                "DELETE FROM interactions WHERE user_id = ? AND product_id = ? AND interaction_type IN ('like', 'dislike')",
+                (user_id, product_id)
+            )
+        return True
+    
+    @staticmethod
+    def toggle_reaction(user_id, product_id, interaction_type):
+        """Replace any like/dislike for a user and product with a new one, atomically"""
+        with transaction() as conn:
+            cursor = conn.cursor()
             cursor.execute(
                 "DELETE FROM interactions WHERE user_id = ? AND product_id = ? AND interaction_type IN ('like', 'dislike')",
                 (user_id, product_id)
             )
-            conn.commit()
-            return True
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+            
+            # A fresh row (rather than an update) keeps the new reaction above
+            # the item similarity job's id watermark
+            if _HAS_RETURNING:
+                cursor.execute(
+                    "INSERT INTO interactions (user_id, product_id, interaction_type) VALUES (?, ?, ?) "
+                    "RETURNING id, user_id, product_id, interaction_type, created_at",
+                    (user_id, product_id, interaction_type)
+                )
+            else:
+                cursor.execute(
+                    "INSERT INTO interactions (user_id, product_id, interaction_type) VALUES (?, ?, ?)",
+                    (user_id, product_id, interaction_type)
+                )
+                cursor.execute(
+                    "SELECT id, user_id, product_id, interaction_type, created_at FROM interactions WHERE id = ?",
+                    (cursor.lastrowid,)
+                )
+            interaction_data = cursor.fetchone()
+        return Interaction(*interaction_data)
     
     @staticmethod
     def get_liked_products(user_id):
         """Get all products liked by a user"""
-        db_path = os.path.join(os.path.dirname(__file__), '../../data/fashionfinder.db')
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT product_id FROM interactions WHERE user_id = ? AND interaction_type = 'like'",
-            (user_id,)
-        )
-        product_ids = [row[0] for row in cursor.fetchall()]
-        conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT product_id FROM interactions WHERE user_id = ? AND interaction_type = 'like'",
+                (user_id,)
+            )
+            product_ids = [row[0] for row in cursor.fetchall()]
         
         return product_ids
     
     @staticmethod
     def get_user_interactions_by_type(user_id, interaction_type):
         """Retrieve user interactions of a specific type"""
-        db_path = os.path.join(os.path.dirname(__file__), '../../data/fashionfinder.db')
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT id, user_id, product_id, interaction_type, created_at FROM interactions WHERE user_id = ? AND interaction_type = ?",
-            (user_id, interaction_type)
-        )
-        interactions_data = cursor.fetchall()
-        conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT id, user_id, product_id, interaction_type, created_at FROM interactions WHERE user_id = ? AND interaction_type = ?",
+                (user_id, interaction_type)
+            )
+            interactions_data = cursor.fetchall()
         
         interactions = []
         for interaction_data in interactions_data:
@@ -0,0 +1,220 @@
+"""
+Schema migrations for the FashionFinder SQLite database
+
+Migrations are applied in order and tracked with PRAGMA user_version, so
+running them again is a no-op. They add the indexes behind the hot model
+queries:
+
+- interactions by (user_id, interaction_type): liked products, views
+- interactions by (user_id, product_id): the like/dislike toggle
+- quiz_responses by user_id
+
+The interaction and quiz indexes carry every selected column, so those
+queries are answered from the index without touching the table. A partial
+unique index allows one like or dislike per (user, product), which is what
+lets toggling a reaction be a single upsert.
+
+Run from the server directory:
+    python -m models.migrations migrate
+    python -m models.migrations verify --rows 10000000
+"""
+
+import os
+import sqlite3
+import time
+
+DB_PATH = os.path.join(os.path.dirname(__file__), '../../data/fashionfinder.db')
+
+# Keeps only the most recent like/dislike per (user, product)
+DEDUPE_REACTIONS_SQL = (
+    "DELETE FROM interactions WHERE interaction_type IN ('like', 'dislike') AND id NOT IN ("
+    "SELECT MAX(id) FROM interactions WHERE interaction_type IN ('like', 'dislike') "
+    "GROUP BY user_id, product_id)"
+)
+
+# (version, description, statements); append only, never edit a shipped entry
+MIGRATIONS = [
+    (1, 'Covering indexes for interaction and quiz lookups', [
+        "CREATE INDEX IF NOT EXISTS idx_interactions_user_type "
+        "ON interactions (user_id, interaction_type, product_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_interactions_user_product "
+        "ON interactions (user_id, product_id, interaction_type, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_quiz_responses_user "
+        "ON quiz_responses (user_id, question_id, response, created_at)"
+    ]),
+    (2, 'One like or dislike per user and product', [
+        # Keep only the most recent reaction before enforcing uniqueness
+        DEDUPE_REACTIONS_SQL,
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_interactions_reaction "
+        "ON interactions (user_id, product_id) WHERE interaction_type IN ('like', 'dislike')"
+    ])
+]
+
+REQUIRED_TABLES = ('interactions', 'quiz_responses')
+
+# The model queries the indexes are for, with the index each must use
+HOT_QUERIES = [
+    ('Interaction.get_by_user_id',
+     "SELECT id, user_id, product_id, interaction_type, created_at FROM interactions WHERE user_id = ?",
+     (1,), 'idx_interactions_user_'),
+    ('Interaction.get_by_user_id_and_product_id',
+     "SELECT id, user_id, product_id, interaction_type, created_at FROM interactions WHERE user_id = ? AND product_id = ?",
+     (1, '1'), 'idx_interactions_user_product'),
+    ('Interaction.get_liked_products',
+     "SELECT product_id FROM interactions WHERE user_id = ? AND interaction_type = 'like'",
+     (1,), 'idx_interactions_user_type'),
+    ('Interaction.get_user_interactions_by_type',
+     "SELECT id, user_id, product_id, interaction_type, created_at FROM interactions WHERE user_id = ? AND interaction_type = ?",
+     (1, 'view'), 'idx_interactions_user_type'),
+    ('Interaction.delete_like_dislike',
+     "DELETE FROM interactions WHERE user_id = ? AND product_id = ? AND interaction_type IN ('like', 'dislike')",
+     (1, '1'), 'idx_interactions_user_product'),
+    ('QuizResponse.get_by_user_id',
+     "SELECT id, user_id, question_id, response, created_at FROM quiz_responses WHERE user_id = ?",
+     (1,), 'idx_quiz_responses_user'),
+    ('UserSignals.load',
+     "SELECT 'quiz', question_id, response, created_at FROM quiz_responses WHERE user_id = ? "
+     "UNION ALL "
+     "SELECT interaction_type, product_id, NULL, created_at FROM interactions WHERE user_id = ? "
+     "ORDER BY 4",
+     (1, 1), 'idx_interactions_user_')
+]
+
+
+def run_migrations(db_path=DB_PATH):
+    """Apply pending migrations and refresh planner statistics"""
+    if not os.path.exists(db_path):
+        print(f"Skipping migrations: {db_path} does not exist")
+        return 0
+
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        missing = [t for t in REQUIRED_TABLES if t not in tables]
+        if missing:
+            print(f"Skipping migrations: missing tables {', '.join(missing)}")
+            return 0
+
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        applied = 0
+        for target, description, statements in MIGRATIONS:
+            if target <= version:
+                continue
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for statement in statements:
+                    conn.execute(statement)
+                # PRAGMA does not accept parameters; target is our own integer
+                conn.execute(f"PRAGMA user_version = {int(target)}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            print(f"Applied migration {target}: {description}")
+            applied += 1
+
+        if applied:
+            conn.execute("ANALYZE")
+            conn.commit()
+        return applied
+    finally:
+        conn.close()
+
+
+def explain(conn, sql, params):
+    """EXPLAIN QUERY PLAN detail lines for a statement"""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def verify_query_plans(db_path=DB_PATH):
+    """Check that every hot query is planned on its index; returns the failures"""
+    conn = sqlite3.connect(db_path)
+    failures = []
+    try:
+        for name, sql, params, index_name in HOT_QUERIES:
+            plan = explain(conn, sql, params)
+            uses_index = any(index_name in line for line in plan)
+            scans_table = any(line.startswith('SCAN') for line in plan)
+            print(f"{'ok  ' if uses_index and not scans_table else 'FAIL'} {name}: {' | '.join(plan)}")
+            if not uses_index or scans_table:
+                failures.append((name, plan))
+    finally:
+        conn.close()
+    return failures
+
+
+def build_synthetic_database(db_path, rows, users=100_000, products=44_000):
+    """Create a database with `rows` random interactions for plan and timing checks"""
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        CREATE TABLE interactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            product_id TEXT NOT NULL,
+            interaction_type TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE quiz_responses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            question_id TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    # Views dominate; likes and dislikes are a small share
+    if rows > 0:
+        conn.execute(f"""
+            WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < {int(rows)})
+            INSERT INTO interactions (user_id, product_id, interaction_type)
+            SELECT abs(random()) % {int(users)} + 1,
+                   CAST(abs(random()) % {int(products)} + 1 AS TEXT),
+                   CASE abs(random()) % 10 WHEN 0 THEN 'like' WHEN 1 THEN 'dislike' ELSE 'view' END
+            FROM seq
+        """)
+    conn.execute(f"""
+        WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < {int(users)})
+        INSERT INTO quiz_responses (user_id, question_id, response)
+        SELECT n, 'style_preference', 'casual' FROM seq
+    """)
+    conn.commit()
+    conn.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(description='Apply or verify database migrations')
+    parser.add_argument('command', choices=['migrate', 'verify'])
+    parser.add_argument('--db', default=DB_PATH, help='Path to the SQLite database')
+    parser.add_argument('--rows', type=int, default=0,
+                        help='Verify against a fresh synthetic database with this many interactions')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        run_migrations(args.db)
+    elif args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'verify.db')
+            started = time.perf_counter()
+            build_synthetic_database(db_path, args.rows)
+            print(f"Built {args.rows} interactions in {time.perf_counter() - started:.1f}s")
+            started = time.perf_counter()
+            run_migrations(db_path)
+            print(f"Migrated in {time.perf_counter() - started:.1f}s")
+            failures = verify_query_plans(db_path)
+
+            conn = sqlite3.connect(db_path)
+            for name, sql, params, _ in HOT_QUERIES:
+                if sql.startswith('SELECT'):
+                    started = time.perf_counter()
+                    for user_id in range(1, 101):
+                        conn.execute(sql, tuple(user_id if p == 1 else p for p in params)).fetchall()
+                    print(f"{name}: {(time.perf_counter() - started) * 10:.3f} ms/query")
+            conn.close()
+            raise SystemExit(1 if failures else 0)
+    else:
+        raise SystemExit(1 if verify_query_plans(args.db) else 0)
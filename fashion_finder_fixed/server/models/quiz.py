@@ -2,9 +2,8 @@
 Improved quiz system with simplified questions and better recommendation mapping
 """
 
-import sqlite3
-import os
 from datetime import datetime
+from utils.db import connection, transaction
 
 class QuizResponse:
     def __init__(self, id, user_id, question_id, response, created_at=None):
@@ -17,17 +16,13 @@ class QuizResponse:
     @staticmethod
     def create(user_id, question_id, response):
         """Create a new quiz response in the database"""
-        db_path = os.path.join(os.path.dirname(__file__), '../../data/fashionfinder.db')
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        try:
+        with transaction() as conn:
+            cursor = conn.cursor()
             cursor.execute(
                 "INSERT INTO quiz_responses (user_id, question_id, response) VALUES (?, ?, ?)",
                 (user_id, question_id, response)
             )
             response_id = cursor.lastrowid
-            conn.commit()
             
             # Fetch the created response
             cursor.execute(
@@ -35,26 +30,18 @@ class QuizResponse:
                 (response_id,)
             )
             response_data = cursor.fetchone()
-            return QuizResponse(*response_data)
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+        return QuizResponse(*response_data)
     
     @staticmethod
     def get_by_user_id(user_id):
         """Retrieve all quiz responses for a user"""
-        db_path = os.path.join(os.path.dirname(__file__), '../../data/fashionfinder.db')
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT id, user_id, question_id, response, created_at FROM quiz_responses WHERE user_id = ?",
-            (user_id,)
-        )
-        responses_data = cursor.fetchall()
-        conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT id, user_id, question_id, response, created_at FROM quiz_responses WHERE user_id = ?",
+                (user_id,)
+            )
+            responses_data = cursor.fetchall()
         
         responses = []
         for response_data in responses_data:
@@ -64,22 +51,12 @@ class QuizResponse:
     @staticmethod
     def delete_by_user_id(user_id):
         """Delete all quiz responses for a user"""
-        db_path = os.path.join(os.path.dirname(__file__), '../../data/fashionfinder.db')
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute(
+        with transaction() as conn:
+            conn.execute(
                 "DELETE FROM quiz_responses WHERE user_id = ?",
                 (user_id,)
             )
-            conn.commit()
-            return True
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+        return True
     
     def to_dict(self):
         """Convert quiz response object to dictionary"""
@@ -1,7 +1,7 @@
 import sqlite3
-import os
 import hashlib
 import uuid
+from utils.db import connection, transaction
 
 class User:
     def __init__(self, id, username, email, password, registration_date=None):
@@ -26,51 +26,42 @@ class User:
     @staticmethod
     def create_user(username, email, password):
         """Create a new user in the database"""
-        db_path = os.path.join(os.path.dirname(__file__), '../../data/fashionfinder.db')
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
         hashed_password = User.hash_password(password)
         
         try:
-            cursor.execute(
-                "INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
-                (username, email, hashed_password)
-            )
-            user_id = cursor.lastrowid
-            conn.commit()
-            
-            # Fetch the created user
-            cursor.execute(
-                "SELECT id, username, email, password, registration_date FROM users WHERE id = ?",
-                (user_id,)
-            )
-            user_data = cursor.fetchone()
+            with transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
+                    (username, email, hashed_password)
+                )
+                user_id = cursor.lastrowid
+                
+                # Fetch the created user
+                cursor.execute(
+                    "SELECT id, username, email, password, registration_date FROM users WHERE id = ?",
+                    (user_id,)
+                )
+                user_data = cursor.fetchone()
             return User(*user_data)
         except sqlite3.IntegrityError as e:
-            conn.rollback()
             if "UNIQUE constraint failed: users.username" in str(e):
                 raise ValueError("Username already exists")
             elif "UNIQUE constraint failed: users.email" in str(e):
                 raise ValueError("Email already exists")
             else:
                 raise
-        finally:
-            conn.close()
     
     @staticmethod
     def get_by_id(user_id):
         """Retrieve a user by ID"""
-        db_path = os.path.join(os.path.dirname(__file__), '../../data/fashionfinder.db')
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT id, username, email, password, registration_date FROM users WHERE id = ?",
-            (user_id,)
-        )
-        user_data = cursor.fetchone()
-        conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT id, username, email, password, registration_date FROM users WHERE id = ?",
+                (user_id,)
+            )
+            user_data = cursor.fetchone()
         
         if user_data:
             return User(*user_data)
@@ -79,16 +70,13 @@ class User:
     @staticmethod
     def get_by_username(username):
         """Retrieve a user by username"""
-        db_path = os.path.join(os.path.dirname(__file__), '../../data/fashionfinder.db')
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT id, username, email, password, registration_date FROM users WHERE username = ?",
-            (username,)
-        )
-        user_data = cursor.fetchone()
-        conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT id, username, email, password, registration_date FROM users WHERE username = ?",
+                (username,)
+            )
+            user_data = cursor.fetchone()
         
         if user_data:
             return User(*user_data)
@@ -97,16 +85,13 @@ class User:
     @staticmethod
     def get_by_email(email):
         """Retrieve a user by email"""
-        db_path = os.path.join(os.path.dirname(__file__), '../../data/fashionfinder.db')
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT id, username, email, password, registration_date FROM users WHERE email = ?",
-            (email,)
-        )
-        user_data = cursor.fetchone()
-        conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT id, username, email, password, registration_date FROM users WHERE email = ?",
+                (email,)
+            )
+            user_data = cursor.fetchone()
         
         if user_data:
             return User(*user_data)
@@ -0,0 +1,74 @@
+from utils.db import connection
+
+
+class UserSignals:
+    """Everything the recommenders know about a user, loaded in one query
+
+    Quiz answers and all interaction types come back from a single UNION ALL
+    over the covering indexes of quiz_responses and interactions. Product ids
+    are kept in time order (oldest first) with a parallel tuple of timestamps;
+    repeated views of a product are collapsed to the latest one.
+    """
+
+    __slots__ = ('user_id', 'quiz', 'liked', 'liked_at', 'disliked', 'disliked_at',
+                 'viewed', 'viewed_at')
+
+    def __init__(self, user_id, quiz=None, liked=(), liked_at=(), disliked=(), disliked_at=(),
+                 viewed=(), viewed_at=()):
+        self.user_id = user_id
+        self.quiz = quiz or {}
+        self.liked = tuple(liked)
+        self.liked_at = tuple(liked_at)
+        self.disliked = tuple(disliked)
+        self.disliked_at = tuple(disliked_at)
+        self.viewed = tuple(viewed)
+        self.viewed_at = tuple(viewed_at)
+
+    @staticmethod
+    def load(user_id):
+        """Load a user's quiz answers, likes, dislikes and views"""
+        with connection() as conn:
+            rows = conn.execute(
+                "SELECT 'quiz', question_id, response, created_at FROM quiz_responses WHERE user_id = ? "
+                "UNION ALL "
+                "SELECT interaction_type, product_id, NULL, created_at FROM interactions WHERE user_id = ? "
+                "ORDER BY 4",
+                (user_id, user_id)
+            ).fetchall()
+
+        quiz = {}
+        events = {'like': {}, 'dislike': {}, 'view': {}}
+        for kind, key, response, created_at in rows:
+            if kind == 'quiz':
+                quiz[key] = response
+            elif kind in events:
+                product_ids = events[kind]
+                product_id = str(key)
+                # Re-inserting moves a repeated product to its latest position
+                product_ids.pop(product_id, None)
+                product_ids[product_id] = created_at
+
+        return UserSignals(
+            user_id, quiz,
+            events['like'].keys(), events['like'].values(),
+            events['dislike'].keys(), events['dislike'].values(),
+            events['view'].keys(), events['view'].values()
+        )
+
+    @property
+    def has_quiz(self):
+        return bool(self.quiz)
+
+    @property
+    def has_interactions(self):
+        return bool(self.liked or self.disliked or self.viewed)
+
+    def to_dict(self):
+        """Convert the signals to a dictionary"""
+        return {
+            'userId': self.user_id,
+            'quiz': self.quiz,
+            'likedProductIds': list(self.liked),
+            'dislikedProductIds': list(self.disliked),
+            'viewedProductIds': list(self.viewed)
+        }
@@ -0,0 +1,289 @@
+"""
+Implicit-feedback matrix factorization (ALS) for FashionFinder
+
+Trains user and item factors from the interactions table with the implicit
+ALS method of Hu, Koren and Volinsky. Every (user, product) pair gets a signed
+weight from its interactions: likes and views add positive evidence, dislikes
+add negative evidence. The sign decides the preference (1 or 0) and the size
+sets the confidence, 1 + alpha * |weight|.
+
+Factors are written as embedding matrices (utils/embedding_store.py), and
+serving a user is one matrix-vector product over the item factors plus a
+top-k selection. RecommendationService serves from them when
+USE_ALS_RECOMMENDATIONS is set there and a trained store exists.
+
+Run from the server directory:
+    python -m services.als_service train [--warm-start] [--threads N]
+    python -m services.als_service benchmark --interactions 1000000
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import scipy.sparse as sp
+from utils.embedding_store import load_embedding_matrix, save_embedding_matrix
+
+DB_PATH = os.path.join(os.path.dirname(__file__), '../../data/fashionfinder.db')
+USER_FACTORS_PATH = os.path.join(os.path.dirname(__file__), '../../data/als_user_factors.npz')
+ITEM_FACTORS_PATH = os.path.join(os.path.dirname(__file__), '../../data/als_item_factors.npz')
+
+# Signed weight of each interaction type; repeated interactions add up
+INTERACTION_WEIGHTS = {'like': 4.0, 'view': 1.0, 'dislike': -4.0}
+
+# Upper bound on the neighbour factors gathered per block
+_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def load_interaction_matrix(db_path=DB_PATH):
+    """Build the signed users x items weight matrix from the interactions table"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT user_id, product_id, interaction_type FROM interactions")
+    rows = cursor.fetchall()
+    conn.close()
+
+    user_index = {}
+    item_index = {}
+    users = np.empty(len(rows), dtype=np.int64)
+    items = np.empty(len(rows), dtype=np.int64)
+    weights = np.empty(len(rows), dtype=np.float32)
+    for n, (user_id, product_id, interaction_type) in enumerate(rows):
+        users[n] = user_index.setdefault(str(user_id), len(user_index))
+        items[n] = item_index.setdefault(str(product_id), len(item_index))
+        weights[n] = INTERACTION_WEIGHTS.get(interaction_type, 0.0)
+
+    matrix = sp.csr_matrix((weights, (users, items)), shape=(len(user_index), len(item_index)))
+    matrix.eliminate_zeros()
+    return matrix, list(user_index), list(item_index)
+
+
+class ImplicitALS:
+    """Implicit ALS trainer over a signed user x item weight matrix"""
+
+    def __init__(self, factors=32, regularization=0.1, alpha=10.0, iterations=10, num_threads=None,
+                 cg_steps=3):
+        self.factors = factors
+        self.regularization = regularization
+        self.alpha = alpha
+        self.iterations = iterations
+        self.cg_steps = cg_steps
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self.user_factors = None
+        self.item_factors = None
+
+    def fit(self, user_items, user_factors=None, item_factors=None, callback=None):
+        """Train on a users x items matrix, optionally warm-starting from previous factors"""
+        user_items = sp.csr_matrix(user_items, dtype=np.float32)
+        item_users = user_items.T.tocsr()
+        n_users, n_items = user_items.shape
+
+        rng = np.random.default_rng(42)
+        scale = 0.01
+        if user_factors is None:
+            user_factors = rng.normal(0, scale, (n_users, self.factors)).astype(np.float32)
+        if item_factors is None:
+            item_factors = rng.normal(0, scale, (n_items, self.factors)).astype(np.float32)
+        self.user_factors = np.ascontiguousarray(user_factors, dtype=np.float32)
+        self.item_factors = np.ascontiguousarray(item_factors, dtype=np.float32)
+
+        with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
+            for iteration in range(self.iterations):
+                started = time.perf_counter()
+                self.user_factors = self._solve(user_items, self.item_factors, self.user_factors, executor)
+                self.item_factors = self._solve(item_users, self.user_factors, self.item_factors, executor)
+                if callback:
+                    callback(iteration, time.perf_counter() - started)
+
+        return self
+
+    def _solve(self, weights, fixed, current, executor):
+        """Update all rows of `weights` against the fixed factors of the other side"""
+        n_rows = weights.shape[0]
+        gram = fixed.T @ fixed + self.regularization * np.eye(self.factors, dtype=np.float32)
+        solved = np.empty_like(current)
+
+        # Split rows into blocks whose gathered neighbour rows fit the budget
+        max_nnz = max(1, _BLOCK_BYTES // (4 * self.factors))
+        blocks = []
+        start = 0
+        while start < n_rows:
+            end = np.searchsorted(weights.indptr, weights.indptr[start] + max_nnz, side='right') - 1
+            end = min(max(end, start + 1), n_rows)
+            blocks.append((start, end))
+            start = end
+
+        futures = [executor.submit(self._solve_block, weights, fixed, gram, current, solved, s, e)
+                   for s, e in blocks]
+        for future in futures:
+            future.result()
+        return solved
+
+    def _solve_block(self, weights, fixed, gram, current, solved, start, end):
+        """A few conjugate gradient steps on the normal equations of rows [start, end)
+
+        For a row u with neighbour factors y_i this solves
+            (YtY + lambda I + sum_i (c_ui - 1) y_i y_i^T) x_u = sum_i c_ui p_ui y_i
+        starting from the current factors, which is what makes warm starts cheap.
+        """
+        block = weights[start:end]
+        values = block.data
+        confidence = 1.0 + self.alpha * np.abs(values)
+        shape = block.shape
+
+        b = sp.csr_matrix((confidence * (values > 0), block.indices, block.indptr), shape=shape) @ fixed
+        row_of = np.repeat(np.arange(end - start), np.diff(block.indptr))
+        neighbours = fixed[block.indices]
+        extra = confidence - 1.0
+
+        def apply(v):
+            dots = np.einsum('ij,ij->i', neighbours, v[row_of]) * extra
+            return v @ gram + sp.csr_matrix((dots, block.indices, block.indptr), shape=shape) @ fixed
+
+        x = current[start:end].copy()
+        r = b - apply(x)
+        p = r.copy()
+        rs_old = np.einsum('ij,ij->i', r, r)
+        for _ in range(self.cg_steps):
+            ap = apply(p)
+            step = rs_old / np.maximum(np.einsum('ij,ij->i', p, ap), 1e-10)
+            x += step[:, None] * p
+            r -= step[:, None] * ap
+            rs_new = np.einsum('ij,ij->i', r, r)
+            p = r + (rs_new / np.maximum(rs_old, 1e-10))[:, None] * p
+            rs_old = rs_new
+        solved[start:end] = x
+
+
+def _align_factors(previous_path, ids, factors):
+    """Rows of a previous factor store reordered to `ids`; unseen ids get random rows"""
+    if not os.path.exists(previous_path):
+        return None
+    previous_ids, previous = load_embedding_matrix(previous_path)
+    if previous.shape[1] != factors:
+        print(f"Ignoring {previous_path}: it has {previous.shape[1]} factors, not {factors}")
+        return None
+
+    rows = {pid: i for i, pid in enumerate(previous_ids)}
+    aligned = np.random.default_rng(42).normal(0, 0.01, (len(ids), factors)).astype(np.float32)
+    for i, pid in enumerate(ids):
+        if pid in rows:
+            aligned[i] = previous[rows[pid]]
+    return aligned
+
+
+def train(db_path=DB_PATH, factors=32, iterations=10, regularization=0.1, alpha=10.0,
+          num_threads=None, warm_start=False):
+    """Train ALS on the interactions table and write the user/item factor stores"""
+    user_items, user_ids, item_ids = load_interaction_matrix(db_path)
+    print(f"Training ALS on {user_items.nnz} user-item pairs "
+          f"({len(user_ids)} users, {len(item_ids)} products)")
+
+    user_factors = item_factors = None
+    if warm_start:
+        user_factors = _align_factors(USER_FACTORS_PATH, user_ids, factors)
+        item_factors = _align_factors(ITEM_FACTORS_PATH, item_ids, factors)
+
+    model = ImplicitALS(factors, regularization, alpha, iterations, num_threads)
+    model.fit(user_items, user_factors, item_factors,
+              callback=lambda i, seconds: print(f"Epoch {i + 1}/{iterations}: {seconds:.2f}s"))
+
+    save_embedding_matrix(USER_FACTORS_PATH, user_ids, model.user_factors)
+    save_embedding_matrix(ITEM_FACTORS_PATH, item_ids, model.item_factors)
+    return model
+
+
+class ALSScorer:
+    """Scores products for a user from stored ALS factors"""
+
+    def __init__(self, user_factors_path=USER_FACTORS_PATH, item_factors_path=ITEM_FACTORS_PATH):
+        user_ids, self.user_factors = load_embedding_matrix(user_factors_path)
+        self.item_ids, self.item_factors = load_embedding_matrix(item_factors_path)
+        self.user_index = {uid: i for i, uid in enumerate(user_ids)}
+        self.item_index = {pid: i for i, pid in enumerate(self.item_ids)}
+
+    def recommend(self, user_id, top_k=8, exclude_ids=None):
+        """Top products for a user as (product_id, score) pairs"""
+        row = self.user_index.get(str(user_id))
+        if row is None:
+            return []
+
+        scores = self.item_factors @ self.user_factors[row]
+        if exclude_ids:
+            excluded = [self.item_index[str(pid)] for pid in exclude_ids if str(pid) in self.item_index]
+            scores[excluded] = -np.inf
+
+        k = min(top_k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.item_ids[i], float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+
+_scorer = None
+_scorer_mtime = None
+_scorer_lock = threading.Lock()
+
+
+def get_als_scorer(user_factors_path=USER_FACTORS_PATH, item_factors_path=ITEM_FACTORS_PATH):
+    """Get the scorer, reloading it when training has written new factors; None before the first run"""
+    global _scorer, _scorer_mtime
+
+    if not (os.path.exists(user_factors_path) and os.path.exists(item_factors_path)):
+        return None
+
+    mtime = max(os.path.getmtime(user_factors_path), os.path.getmtime(item_factors_path))
+    if _scorer is None or mtime != _scorer_mtime:
+        with _scorer_lock:
+            if _scorer is None or mtime != _scorer_mtime:
+                _scorer = ALSScorer(user_factors_path, item_factors_path)
+                _scorer_mtime = mtime
+    return _scorer
+
+
+def benchmark(n_interactions=1_000_000, n_users=100_000, n_items=30_000, factors=32,
+              iterations=3, num_threads=None):
+    """Time ALS epochs on a synthetic power-law interaction matrix"""
+    rng = np.random.default_rng(0)
+    users = rng.integers(0, n_users, n_interactions)
+    # Popular products get most of the traffic
+    items = np.minimum(rng.zipf(1.3, n_interactions) - 1, n_items - 1)
+    kinds = rng.choice(np.array([1.0, 4.0, -4.0], dtype=np.float32), n_interactions, p=[0.8, 0.15, 0.05])
+    user_items = sp.csr_matrix((kinds, (users, items)), shape=(n_users, n_items))
+    user_items.eliminate_zeros()
+
+    print(f"Benchmark: {n_interactions} interactions -> {user_items.nnz} user-item pairs, "
+          f"{factors} factors, {num_threads or os.cpu_count()} threads")
+    epochs = []
+    ImplicitALS(factors, iterations=iterations, num_threads=num_threads).fit(
+        user_items, callback=lambda i, seconds: epochs.append(seconds))
+    for i, seconds in enumerate(epochs):
+        print(f"Epoch {i + 1}: {seconds:.2f}s")
+    print(f"Mean time per epoch: {sum(epochs) / len(epochs):.2f}s")
+    return epochs
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Train or benchmark implicit ALS')
+    parser.add_argument('command', choices=['train', 'benchmark'])
+    parser.add_argument('--db', default=DB_PATH, help='Path to the SQLite database')
+    parser.add_argument('--factors', type=int, default=32)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--regularization', type=float, default=0.1)
+    parser.add_argument('--alpha', type=float, default=10.0)
+    parser.add_argument('--threads', type=int, default=None, help='Solver threads (default: all cores)')
+    parser.add_argument('--warm-start', action='store_true', help='Start from the previously saved factors')
+    parser.add_argument('--interactions', type=int, default=1_000_000, help='Benchmark size')
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        train(args.db, args.factors, args.iterations, args.regularization, args.alpha,
+              args.threads, args.warm_start)
+    else:
+        benchmark(args.interactions, factors=args.factors, iterations=args.iterations,
+                  num_threads=args.threads)
@@ -0,0 +1,378 @@
+"""
+Bulk import and export of interactions
+
+Streams interactions between the SQLite interactions table and CSV, NDJSON
+or the legacy JSON array files (backend/data/interactions.json). Rows are
+read lazily and written with executemany in batches, committing every
+COMMIT_EVERY rows, so memory stays bounded by the batch size rather than the
+file size.
+
+Likes and dislikes are imported with INSERT OR REPLACE: the partial unique
+index from migration 2 then keeps the last reaction per (user, product), the
+same outcome as toggling through the API. Running servers keep their per-user
+caches until those users next write, so import before starting the server or
+restart it afterwards.
+
+Run from the server directory:
+    python -m services.bulk_interactions import ../backend/data/interactions.json
+    python -m services.bulk_interactions import views.csv --format csv
+    python -m services.bulk_interactions export interactions.ndjson --user 42
+    python -m services.bulk_interactions import-profiles ../backend/data/user_profiles.json
+    python -m services.bulk_interactions benchmark --rows 2000000
+"""
+
+import csv
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import time
+from models.migrations import DEDUPE_REACTIONS_SQL
+
+DB_PATH = os.path.join(os.path.dirname(__file__), '../../data/fashionfinder.db')
+
+BATCH_SIZE = 50_000
+COMMIT_EVERY = 1_000_000
+
+# Legacy JSON stores use different field names
+FIELD_ALIASES = {
+    'user_id': ('user_id', 'userId'),
+    'product_id': ('product_id', 'productId', 'item_id'),
+    'interaction_type': ('interaction_type', 'interactionType', 'type'),
+    'created_at': ('created_at', 'createdAt', 'timestamp')
+}
+
+EXPORT_COLUMNS = ('id', 'user_id', 'product_id', 'interaction_type', 'created_at')
+
+
+def iter_json_array(path, chunk_size=1 << 16):
+    """Yield the elements of a top-level JSON array without loading the whole file"""
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        started = False
+        eof = False
+        while True:
+            # Skip whitespace, separators and the opening bracket
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer):
+                if not started:
+                    if buffer[pos] != '[':
+                        raise ValueError(f"{path} does not contain a JSON array")
+                    started = True
+                    pos += 1
+                    continue
+                if buffer[pos] == ']':
+                    return
+
+            if pos < len(buffer):
+                try:
+                    element, end = decoder.raw_decode(buffer, pos)
+                    # A scalar is only complete once a delimiter follows it: "1" may be the
+                    # start of "1.5" and "1." of "1.5e3" when the rest is in the next chunk
+                    if eof or (end < len(buffer) and (buffer[end - 1] in '"}]' or buffer[end] in ' \t\r\n,]')):
+                        yield element
+                        pos = end
+                        continue
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+
+            if eof:
+                return
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+
+def _field_getter(keys):
+    """Map the canonical interaction fields to positions or keys present in `keys`"""
+    mapping = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            if alias in keys:
+                mapping[field] = alias
+                break
+    missing = [f for f in ('user_id', 'product_id', 'interaction_type') if f not in mapping]
+    if missing:
+        raise ValueError(f"Input has no column for {', '.join(missing)}")
+    return mapping
+
+
+def read_csv(path):
+    """Yield (user_id, product_id, interaction_type, created_at) rows from a CSV file with a header"""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        mapping = _field_getter(header)
+        columns = [header.index(mapping[f]) if f in mapping else None for f in FIELD_ALIASES]
+        user_col, product_col, type_col, created_col = columns
+        for row in reader:
+            if not row:
+                continue
+            yield (row[user_col], row[product_col], row[type_col],
+                   row[created_col] or None if created_col is not None else None)
+
+
+def _rows_from_objects(objects):
+    mapping = None
+    for obj in objects:
+        if mapping is None:
+            mapping = _field_getter(obj.keys())
+        created_key = mapping.get('created_at')
+        yield (obj[mapping['user_id']], str(obj[mapping['product_id']]), obj[mapping['interaction_type']],
+               obj.get(created_key) if created_key else None)
+
+
+def read_ndjson(path):
+    """Yield interaction rows from a file with one JSON object per line"""
+    def objects():
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    return _rows_from_objects(objects())
+
+
+def read_json_array(path):
+    """Yield interaction rows from a legacy JSON array file"""
+    return _rows_from_objects(iter_json_array(path))
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson, 'json': read_json_array}
+
+
+def detect_format(path):
+    """Guess the input format from the file name, peeking at .json files"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.ndjson', '.jsonl'):
+        return 'ndjson'
+    with open(path, encoding='utf-8') as f:
+        first = f.read(256).lstrip()
+    return 'json' if first.startswith('[') else 'ndjson'
+
+
+def _connect_for_bulk(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA cache_size = -262144")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+
+def import_interactions(rows, db_path=DB_PATH, batch_size=BATCH_SIZE, commit_every=COMMIT_EVERY,
+                        rebuild_indexes=None):
+    """Insert interaction rows in batches; returns the number of rows written
+
+    Keeping the interaction indexes up to date costs about two thirds of the
+    insert time. With `rebuild_indexes` they are dropped, the rows inserted,
+    duplicate reactions removed and the indexes recreated (a sort, much faster
+    than random inserts), all in one transaction. By default that is done
+    when the table starts out empty.
+    """
+    conn = _connect_for_bulk(db_path)
+    written = 0
+    since_commit = 0
+    started = time.perf_counter()
+    rows = iter(rows)
+    try:
+        if rebuild_indexes is None:
+            rebuild_indexes = conn.execute("SELECT 1 FROM interactions LIMIT 1").fetchone() is None
+        conn.execute("BEGIN")
+
+        indexes = []
+        if rebuild_indexes:
+            indexes = conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'interactions' "
+                "AND sql IS NOT NULL"
+            ).fetchall()
+            for name, _ in indexes:
+                conn.execute(f'DROP INDEX "{name}"')
+
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            conn.executemany(
+                "INSERT OR REPLACE INTO interactions (user_id, product_id, interaction_type, created_at) "
+                "VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))",
+                batch
+            )
+            written += len(batch)
+            since_commit += len(batch)
+            # Dropped indexes must come back in the same transaction
+            if since_commit >= commit_every and not rebuild_indexes:
+                conn.commit()
+                conn.execute("BEGIN")
+                since_commit = 0
+                elapsed = time.perf_counter() - started
+                print(f"  {written} rows ({written / elapsed:,.0f} rows/s)")
+
+        if rebuild_indexes:
+            # Plain indexes first so the reaction dedupe can use them, then
+            # the unique ones, which need the duplicates gone
+            unique = [sql for _, sql in indexes if sql.upper().startswith('CREATE UNIQUE')]
+            for _, sql in indexes:
+                if sql not in unique:
+                    conn.execute(sql)
+            conn.execute(DEDUPE_REACTIONS_SQL)
+            for sql in unique:
+                conn.execute(sql)
+            # Sampled statistics are enough for the planner and take milliseconds
+            conn.execute("PRAGMA analysis_limit = 1000")
+            conn.execute("ANALYZE interactions")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return written
+
+
+def export_interactions(output, db_path=DB_PATH, fmt='ndjson', user_id=None, interaction_type=None,
+                        batch_size=BATCH_SIZE):
+    """Stream interactions to a CSV or NDJSON file object; returns the number of rows"""
+    conn = sqlite3.connect(db_path)
+    conditions = []
+    params = []
+    if user_id is not None:
+        conditions.append("user_id = ?")
+        params.append(user_id)
+    if interaction_type is not None:
+        conditions.append("interaction_type = ?")
+        params.append(interaction_type)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    count = 0
+    try:
+        cursor = conn.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM interactions{where} ORDER BY id", params)
+        writer = None
+        if fmt == 'csv':
+            writer = csv.writer(output)
+            writer.writerow(EXPORT_COLUMNS)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if writer:
+                writer.writerows(rows)
+            else:
+                output.writelines(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + '\n' for row in rows)
+            count += len(rows)
+    finally:
+        conn.close()
+    return count
+
+
+def import_profiles(path, db_path=DB_PATH):
+    """Copy legacy user_profiles.json quiz answers into quiz_responses
+
+    Each preference becomes one response row; list answers are stored as JSON.
+    A user's previous responses are replaced, as QuizService does on resubmit.
+    """
+    conn = _connect_for_bulk(db_path)
+    users = 0
+    try:
+        conn.execute("BEGIN")
+        for profile in iter_json_array(path):
+            user_id = profile.get('user_id')
+            preferences = profile.get('preferences') or {}
+            if user_id is None:
+                continue
+            conn.execute("DELETE FROM quiz_responses WHERE user_id = ?", (user_id,))
+            conn.executemany(
+                "INSERT INTO quiz_responses (user_id, question_id, response) VALUES (?, ?, ?)",
+                [(user_id, question_id, value if isinstance(value, str) else json.dumps(value))
+                 for question_id, value in preferences.items()]
+            )
+            users += 1
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return users
+
+
+def benchmark(rows=2_000_000, fmt='csv'):
+    """Time a synthetic import into a fresh, fully migrated database"""
+    import random
+    import tempfile
+    from models.migrations import build_synthetic_database, run_migrations
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bulk.db')
+        build_synthetic_database(db_path, 0)
+        run_migrations(db_path)
+
+        path = os.path.join(tmp, f'interactions.{fmt}')
+        rng = random.Random(0)
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            if fmt == 'csv':
+                f.write('user_id,product_id,interaction_type\n')
+            for _ in range(rows):
+                values = (rng.randint(1, 100_000), rng.randint(1, 44_000),
+                          rng.choice(('view', 'view', 'view', 'view', 'like', 'dislike')))
+                if fmt == 'csv':
+                    f.write('%d,%d,%s\n' % values)
+                else:
+                    f.write(json.dumps(dict(zip(('user_id', 'product_id', 'interaction_type'), values))) + '\n')
+
+        started = time.perf_counter()
+        written = import_interactions(READERS[fmt](path), db_path)
+        elapsed = time.perf_counter() - started
+        print(f"Imported {written} {fmt} rows in {elapsed:.1f}s ({written / elapsed:,.0f} rows/s)")
+
+        started = time.perf_counter()
+        with open(os.devnull, 'w') as devnull:
+            exported = export_interactions(devnull, db_path, fmt=fmt)
+        elapsed = time.perf_counter() - started
+        print(f"Exported {exported} rows in {elapsed:.1f}s ({exported / elapsed:,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Bulk import/export of interactions')
+    parser.add_argument('command', choices=['import', 'export', 'import-profiles', 'benchmark'])
+    parser.add_argument('path', nargs='?', help='Input or output file (export writes stdout if omitted)')
+    parser.add_argument('--db', default=DB_PATH, help='Path to the SQLite database')
+    parser.add_argument('--format', choices=sorted(READERS), help='File format (default: from the file name)')
+    parser.add_argument('--user', help='Export only this user')
+    parser.add_argument('--type', dest='interaction_type', help='Export only this interaction type')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--rebuild-indexes', action='store_true', default=None,
+                        help='Drop and recreate indexes around the import (default: only into an empty table)')
+    parser.add_argument('--rows', type=int, default=2_000_000, help='Benchmark size')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == 'import':
+        fmt = args.format or detect_format(args.path)
+        written = import_interactions(READERS[fmt](args.path), args.db, batch_size=args.batch_size,
+                                      rebuild_indexes=args.rebuild_indexes)
+        print(f"Imported {written} interactions in {time.perf_counter() - started:.1f}s")
+    elif args.command == 'export':
+        fmt = args.format or ('csv' if args.path and args.path.endswith('.csv') else 'ndjson')
+        if fmt == 'json':
+            parser.error('export writes csv or ndjson')
+        if args.path:
+            with open(args.path, 'w', newline='', encoding='utf-8') as output:
+                count = export_interactions(output, args.db, fmt, args.user, args.interaction_type, args.batch_size)
+        else:
+            count = export_interactions(sys.stdout, args.db, fmt, args.user, args.interaction_type, args.batch_size)
+        print(f"Exported {count} interactions in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    elif args.command == 'import-profiles':
+        users = import_profiles(args.path, args.db)
+        print(f"Imported quiz answers for {users} users")
+    else:
+        benchmark(args.rows, args.format or 'csv')
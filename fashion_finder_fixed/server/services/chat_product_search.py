@@ -0,0 +1,229 @@
+"""
+Product lookup for chatbot answers
+
+A chat message is reduced to catalog attributes (gender, articleType,
+subCategory, masterCategory, baseColour, usage, season) by looking up its
+word n-grams in a lexicon built from the catalog's own values, plus a few
+synonyms and the quiz occasion mapping. Products are then scored with the
+same code gathers as quiz scoring, and leftover words are matched against
+the product name token index. Gender is a filter (Unisex always passes);
+every other attribute adds to the score.
+"""
+
+import threading
+import numpy as np
+from models.quiz import QUIZ_RECOMMENDATION_MAPPING
+from services import product_service
+from utils.catalog_index import CatalogIndex, tokenize
+
+# Points a product gets for each attribute the message asks for
+ATTRIBUTE_WEIGHTS = {
+    'articleType': 3.0,
+    'subCategory': 2.0,
+    'masterCategory': 1.0,
+    'baseColour': 2.0,
+    'usage': 2.0,
+    'season': 1.0
+}
+# Points per other message word found in the product name
+NAME_TOKEN_WEIGHT = 1.0
+# Base score of every allowed product when a message names only a gender
+GENDER_ONLY_SCORE = 1.0
+
+SEARCH_FIELDS = ('gender',) + tuple(ATTRIBUTE_WEIGHTS)
+
+# Longest phrase, in words, looked up in the lexicon
+MAX_PHRASE_WORDS = 3
+
+GENDER_SYNONYMS = {
+    'Men': ['men', 'man', 'mens', 'male', 'guys', 'boys'],
+    'Women': ['women', 'woman', 'womens', 'ladies', 'female', 'girls']
+}
+
+VALUE_SYNONYMS = {
+    ('articleType', 'Tshirts'): ['t shirt', 't shirts', 'tee', 'tees'],
+    ('articleType', 'Sports Shoes'): ['sneakers', 'trainers', 'running shoes'],
+    ('season', 'Fall'): ['autumn']
+}
+
+# Chat words for occasions, mapped to the quiz occasion whose usages they mean
+OCCASION_WORDS = {
+    'work': 'work', 'office': 'work', 'interview': 'work',
+    'formal': 'special', 'party': 'special', 'wedding': 'special', 'date': 'special',
+    'casual': 'everyday', 'everyday': 'everyday', 'weekend': 'everyday',
+    'workout': 'athletic', 'gym': 'athletic', 'running': 'athletic', 'sport': 'athletic', 'sports': 'athletic',
+    'lounge': 'lounge', 'home': 'lounge'
+}
+
+# Words that say nothing about which product is wanted
+STOPWORDS = set("""
+a an and any are be can could do does find for from get have i in is it looking me my need of on or please
+recommend recommendation recommendations show some something suggest suggestion suggestions that the there this
+to want wear what with would you your good nice new best buy outfit outfits ideas idea should
+""".split())
+
+
+class ChatProductSearch:
+    """Attribute and name search over one list of products"""
+
+    def __init__(self, products):
+        self.products = products
+        self.index = CatalogIndex(products)
+        self.row_of = {product['id']: row for row, product in enumerate(products)}
+        # {phrase tuple: [(field, value), ...]}
+        self.lexicon = {}
+
+        for field in SEARCH_FIELDS:
+            for value in self.index.vocabulary(field):
+                words = tuple(tokenize(value))
+                if not words:
+                    continue
+                self._add(words, field, value)
+                # Catalog values are mostly plural ("Tshirts", "Caps"); accept the singular too
+                if words[-1].endswith('s') and len(words[-1]) > 3:
+                    self._add(words[:-1] + (words[-1][:-1],), field, value)
+
+        for (field, value), synonyms in VALUE_SYNONYMS.items():
+            if value in self.index.vocabulary(field):
+                for synonym in synonyms:
+                    self._add(tuple(tokenize(synonym)), field, value)
+        for value, synonyms in GENDER_SYNONYMS.items():
+            if value in self.index.vocabulary('gender'):
+                for synonym in synonyms:
+                    self._add((synonym,), 'gender', value)
+        for word, occasion in OCCASION_WORDS.items():
+            for usage in QUIZ_RECOMMENDATION_MAPPING['occasion'][occasion]['usages']:
+                if usage in self.index.vocabulary('usage'):
+                    self._add((word,), 'usage', usage)
+
+    def _add(self, words, field, value):
+        entries = self.lexicon.setdefault(words, [])
+        if (field, value) not in entries:
+            entries.append((field, value))
+
+    def extract(self, message):
+        """Attributes named in a message as ({field: [values]}, [other words])"""
+        words = tokenize(message)
+        attributes = {}
+        other_words = []
+        position = 0
+        while position < len(words):
+            # Longest phrase first, so "sports shoes" wins over "sports"
+            for length in range(min(MAX_PHRASE_WORDS, len(words) - position), 0, -1):
+                entries = self.lexicon.get(tuple(words[position:position + length]))
+                if entries:
+                    for field, value in entries:
+                        values = attributes.setdefault(field, [])
+                        if value not in values:
+                            values.append(value)
+                    position += length
+                    break
+            else:
+                word = words[position]
+                if word not in STOPWORDS and len(word) > 1:
+                    other_words.append(word)
+                position += 1
+        return attributes, other_words
+
+    def search(self, attributes, other_words=(), limit=4):
+        """Best matching product rows as (row, score), best first"""
+        scores = np.zeros(len(self.products), dtype=np.float32)
+        for field, weight in ATTRIBUTE_WEIGHTS.items():
+            if field in attributes:
+                scores += self.index.weight_vector(field, attributes[field], weight)[self.index.codes(field)]
+        for word in other_words:
+            rows = self.index.tokens.rows(word)
+            if len(rows):
+                scores[rows] += NAME_TOKEN_WEIGHT
+
+        if 'gender' in attributes:
+            # Asked for nothing but a gender: every product of that gender is a match
+            if not other_words and not any(field in attributes for field in ATTRIBUTE_WEIGHTS):
+                scores += GENDER_ONLY_SCORE
+            allowed = self.index.weight_vector('gender', attributes['gender'] + ['Unisex'])
+            scores *= allowed[self.index.codes('gender')]
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        # Stable sort keeps catalog order among equal scores
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(int(row), float(scores[row])) for row in candidates]
+
+    def filter_rows(self, rows, attributes):
+        """The rows, in order, whose value is one of the given ones for every field (Unisex passes gender)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        keep = np.ones(len(rows), dtype=bool)
+        for field, values in attributes.items():
+            if field == 'gender':
+                values = values + ['Unisex']
+            keep &= self.index.weight_vector(field, values)[self.index.codes(field)[rows]] > 0
+        return rows[keep]
+
+    def find(self, message, limit=4, extra_attributes=None):
+        """Extract attributes from a message and return (attributes, matching products)"""
+        attributes, other_words = self.extract(message)
+        for field, values in (extra_attributes or {}).items():
+            merged = attributes.setdefault(field, [])
+            merged.extend(v for v in values if v not in merged)
+        if not attributes and not other_words:
+            return attributes, []
+        return attributes, [self.products[row] for row, _ in self.search(attributes, other_words, limit)]
+
+
+_search = None
+_search_version = None
+_search_lock = threading.Lock()
+
+
+def get_chat_product_search():
+    """Get the search for the current catalog, rebuilding it when the catalog is reloaded"""
+    global _search, _search_version
+
+    if not product_service.products_dict:
+        product_service.load_products()
+    with _search_lock:
+        if _search is None or _search_version != product_service.catalog_version:
+            _search = ChatProductSearch(list(product_service.products_dict.values()))
+            _search_version = product_service.catalog_version
+    return _search
+
+
+if __name__ == '__main__':
+    import argparse
+    import random
+    import time
+
+    parser = argparse.ArgumentParser(description='Benchmark chatbot product lookups')
+    parser.add_argument('--products', type=int, default=44000, help='Catalog size to replicate the sample data to')
+    args = parser.parse_args()
+
+    # Sample catalog: every sample product repeated with fresh ids up to the requested size
+    import os
+    from utils.csv_loader import CSVLoader
+    styles = CSVLoader.load_styles(os.path.join(os.path.dirname(__file__), '../../attached_assets/styles.csv'))
+    base = [dict(row, id=product_id) for product_id, row in styles.fillna('').iterrows()]
+    products = [dict(base[i % len(base)], id=str(i)) for i in range(args.products)]
+
+    started = time.perf_counter()
+    search = ChatProductSearch(products)
+    print(f"Built search over {len(products)} products in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    messages = [
+        "recommend a red tshirt for men", "can you suggest some black sports shoes",
+        "find me a white cap", "what should I wear to work", "suggest something for the gym",
+        "recommend a summer outfit for women", "find me a puma backpack", "suggest blue shorts",
+        "recommend something nice", "find me a navy blue jacket for autumn"
+    ]
+    timings = []
+    for _ in range(50):
+        for message in messages:
+            started = time.perf_counter()
+            search.find(message)
+            timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(f"find(): p50 {timings[len(timings) // 2] * 1000:.2f} ms, "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1000:.2f} ms")
+    for message in random.sample(messages, 4):
+        attributes, found = search.find(message)
+        print(f"{message!r}: {attributes} -> {[p['productDisplayName'] for p in found]}")
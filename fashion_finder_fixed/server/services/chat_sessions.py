@@ -0,0 +1,228 @@
+"""
+Conversation state for the chatbot
+
+The chatbot itself is one shared instance, so anything a follow-up needs
+("show me cheaper ones", "in blue") is kept per session here: the slots
+extracted so far, the ranked candidate ids of the last catalog search and
+which of them were shown. A refinement filters those candidates instead of
+searching the catalog again.
+
+Sessions live in an LRU with an idle TTL and an estimated byte budget. Each
+session is capped too (candidates, values per slot), so one
+long conversation cannot take over the budget. With a spill path set,
+sessions evicted for space are written to SQLite and read back on their next
+request instead of being lost.
+"""
+
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from utils.db import ConnectionPool
+
+# Seconds a session may sit idle before it is dropped
+SESSION_TTL_SECONDS = 30 * 60
+# Estimated bytes the in-memory sessions may hold together
+MAX_SESSIONS_BYTES = 32 * 1024 * 1024
+
+# Per-session caps
+MAX_CANDIDATES = 200
+MAX_SLOT_VALUES = 8
+
+# SQLite file for sessions evicted from memory; None drops them instead
+SPILL_DB_PATH = None
+
+
+class ChatSession:
+    """Slots and last results of one conversation"""
+
+    __slots__ = ('slots', 'candidate_ids', 'shown_ids', 'updated', 'nbytes')
+
+    def __init__(self, slots=None, candidate_ids=None, shown_ids=None, updated=None):
+        self.slots = {}
+        self.candidate_ids = []
+        self.shown_ids = []
+        self.remember(slots or {}, candidate_ids or [], shown_ids or [])
+        self.updated = updated or time.time()
+
+    def remember(self, slots, candidate_ids, shown_ids):
+        """Replace the conversation state, keeping it within the per-session caps"""
+        self.slots = {field: list(values)[:MAX_SLOT_VALUES] for field, values in slots.items()}
+        self.candidate_ids = [str(i) for i in candidate_ids][:MAX_CANDIDATES]
+        self.shown_ids = [str(i) for i in shown_ids][:MAX_CANDIDATES]
+        self.nbytes = (
+            sys.getsizeof(self.slots)
+            + sum(sys.getsizeof(f) + sum(sys.getsizeof(v) for v in vs) for f, vs in self.slots.items())
+            + sum(sys.getsizeof(ids) + sum(sys.getsizeof(i) for i in ids)
+                  for ids in (self.candidate_ids, self.shown_ids))
+        )
+
+    def copy(self):
+        """A copy to change during a reply; the store only sees it once put() swaps it in"""
+        return ChatSession(self.slots, self.candidate_ids, self.shown_ids, self.updated)
+
+    @property
+    def has_results(self):
+        return bool(self.candidate_ids)
+
+    def to_json(self):
+        return json.dumps({
+            'slots': self.slots,
+            'candidateIds': self.candidate_ids,
+            'shownIds': self.shown_ids
+        })
+
+    @classmethod
+    def from_json(cls, text, updated):
+        state = json.loads(text)
+        return cls(state['slots'], state['candidateIds'], state['shownIds'], updated)
+
+
+class ChatSessionStore:
+    """LRU of ChatSession with an idle TTL, a byte budget and optional SQLite spillover"""
+
+    def __init__(self, max_bytes=MAX_SESSIONS_BYTES, ttl_seconds=SESSION_TTL_SECONDS, spill_path=SPILL_DB_PATH):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.spilled = 0
+        self.restored = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._spill = None
+        if spill_path:
+            self._spill = ConnectionPool(spill_path, max_connections=2)
+            with self._spill.transaction() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                    "session_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated REAL NOT NULL)"
+                )
+
+    @staticmethod
+    def new_session_id():
+        return uuid.uuid4().hex
+
+    def get(self, session_id):
+        """Get a copy of a live session, or a new empty one if it is unknown or expired
+
+        The stored session, and the size charged for it, only change in put().
+        """
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                if now - session.updated <= self.ttl_seconds:
+                    self._sessions.move_to_end(session_id)
+                    self.hits += 1
+                    return session.copy()
+                del self._sessions[session_id]
+                self.current_bytes -= session.nbytes
+
+        session = self._restore(session_id, now)
+        with self._lock:
+            if session is None:
+                self.misses += 1
+                return ChatSession()
+            self.restored += 1
+            return session
+
+    def put(self, session_id, session):
+        """Save a session after a reply has changed it"""
+        session.updated = time.time()
+        with self._lock:
+            previous = self._sessions.pop(session_id, None)
+            if previous is not None:
+                self.current_bytes -= previous.nbytes
+            evicted = self._store(session_id, session)
+        if evicted:
+            self._spill_sessions(evicted)
+
+    def _store(self, session_id, session):
+        # Returns the live sessions evicted to make room; expired ones are simply dropped
+        self._sessions[session_id] = session
+        self.current_bytes += session.nbytes
+        evicted = []
+        now = time.time()
+        while self.current_bytes > self.max_bytes and len(self._sessions) > 1:
+            evicted_id, evicted_session = self._sessions.popitem(last=False)
+            self.current_bytes -= evicted_session.nbytes
+            if now - evicted_session.updated <= self.ttl_seconds:
+                evicted.append((evicted_id, evicted_session))
+        return evicted
+
+    def _spill_sessions(self, sessions):
+        if self._spill is None:
+            return
+        try:
+            with self._spill.transaction() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO chat_sessions (session_id, state, updated) VALUES (?, ?, ?)",
+                    [(session_id, session.to_json(), session.updated) for session_id, session in sessions]
+                )
+                conn.execute("DELETE FROM chat_sessions WHERE updated < ?", (time.time() - self.ttl_seconds,))
+            with self._lock:
+                self.spilled += len(sessions)
+        except Exception as e:
+            print(f"Error spilling chat sessions: {e}")
+
+    def _restore(self, session_id, now):
+        """Take a spilled session back out of SQLite, if it has not expired"""
+        if self._spill is None:
+            return None
+        try:
+            with self._spill.transaction() as conn:
+                row = conn.execute(
+                    "SELECT state, updated FROM chat_sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+        except Exception as e:
+            print(f"Error restoring chat session: {e}")
+            return None
+        if now - row[1] > self.ttl_seconds:
+            return None
+        return ChatSession.from_json(row[0], row[1])
+
+    def purge_expired(self):
+        """Drop idle sessions from memory and the spill file"""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [sid for sid, session in self._sessions.items() if session.updated < cutoff]
+            for session_id in expired:
+                self.current_bytes -= self._sessions.pop(session_id).nbytes
+        if self._spill is not None:
+            with self._spill.transaction() as conn:
+                conn.execute("DELETE FROM chat_sessions WHERE updated < ?", (cutoff,))
+        return len(expired)
+
+    def get_stats(self):
+        """Session count, estimated size and hit/miss/spill counters"""
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'bytes': self.current_bytes,
+                'maxBytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'spilled': self.spilled,
+                'restored': self.restored
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_chat_session_store():
+    """Get the process-wide chat session store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ChatSessionStore()
+    return _store
@@ -0,0 +1,93 @@
+"""
+Server-Sent Events streaming for chat replies
+
+A streamed reply sends each chatbot event as soon as it exists: the answer
+text first, then one `product` event per ranked product, then a `done`
+event carrying the timings. Time to first byte is measured from the start
+of the request to the first event handed to the server. It is recorded
+alongside the full-response latency of the plain JSON mode, so the two can
+be compared at /api/chat/stats.
+"""
+
+import threading
+import time
+from collections import deque
+from flask import current_app
+from services.chat_sessions import get_chat_session_store
+
+# Latest samples kept per metric for percentiles
+STATS_WINDOW = 1000
+
+
+class ChatLatencyStats:
+    """Rolling latency samples, in milliseconds, per named metric"""
+
+    def __init__(self, window=STATS_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, metric, seconds):
+        with self._lock:
+            self._samples.setdefault(metric, deque(maxlen=self.window)).append(seconds * 1000)
+            self._counts[metric] = self._counts.get(metric, 0) + 1
+
+    def get_stats(self):
+        """Count and p50/p95/max over the window for every metric"""
+        with self._lock:
+            snapshot = {metric: sorted(samples) for metric, samples in self._samples.items()}
+            counts = dict(self._counts)
+        stats = {}
+        for metric, samples in snapshot.items():
+            stats[metric] = {
+                'count': counts[metric],
+                'p50_ms': round(samples[len(samples) // 2], 3),
+                'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+                'max_ms': round(samples[-1], 3)
+            }
+        return stats
+
+
+chat_latency = ChatLatencyStats()
+
+
+def sse_event(event, data):
+    """One SSE frame with a JSON payload"""
+    return f"event: {event}\ndata: {current_app.json.dumps(data)}\n\n"
+
+
+def stream_reply(chatbot, message, started, session_id):
+    """Yield SSE frames for a chat reply; `started` is the request's perf_counter() start"""
+    first_event = None
+    products = 0
+    store = get_chat_session_store()
+    session = store.get(session_id)
+    try:
+        for kind, value in chatbot.iter_reply(message, session):
+            if kind == 'product':
+                products += 1
+                frame = sse_event('product', value)
+            else:
+                frame = sse_event('text', {'text': value})
+            if first_event is None:
+                first_event = time.perf_counter() - started
+                chat_latency.record('stream_ttfb', first_event)
+            yield frame
+    except Exception as e:
+        print(f"Error streaming chat reply: {e}")
+        yield sse_event('error', {'message': f'Failed to process message: {str(e)}'})
+        return
+
+    # The reply changed a copy from store.get(); it is saved only once the whole reply went out,
+    # so a dropped stream leaves the stored session as it was
+    if session.has_results:
+        store.put(session_id, session)
+    total = time.perf_counter() - started
+    chat_latency.record('stream_total', total)
+    yield sse_event('done', {
+        'sessionId': session_id,
+        'products': products,
+        'ttfb_ms': round((first_event if first_event is not None else total) * 1000, 3),
+        'total_ms': round(total * 1000, 3)
+    })
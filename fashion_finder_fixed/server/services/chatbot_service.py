@@ -5,10 +5,74 @@ Simple chatbot service for Fashion Finder
 import re
 import random
 from datetime import datetime
+from services.chat_product_search import get_chat_product_search
+from services.chat_sessions import MAX_CANDIDATES
+from services.product_service import simulated_price
+
+# Products shown with a grounded answer
+CHAT_PRODUCT_LIMIT = 4
+
+# Follow-up wording that asks for a different price than the products just shown
+CHEAPER = re.compile(r'\b(cheaper|less expensive|lower price|budget)\b')
+PRICIER = re.compile(r'\b(pricier|more expensive|higher end|premium)\b')
+
+# Naming a different kind of product in a follow-up starts a new search instead of filtering
+CATEGORY_SLOTS = ('articleType', 'subCategory', 'masterCategory')
+
+
+def _pattern_keywords(pattern):
+    """Lowercase words of which a match must contain at least one; empty if none can be derived"""
+    # Escapes (\b, \s, ...) and letters made optional by ? or * are not literal words
+    text = re.sub(r'\\.|[A-Za-z][?*]', ' ', pattern)
+    if any(c in text for c in '[{+.'):
+        return set()
+    
+    # Split into top-level text and top-level groups
+    top_level, groups, depth, start = [], [], 0, 0
+    for i, c in enumerate(text):
+        if c == '(':
+            if depth == 0:
+                start = i
+            depth += 1
+        elif c == ')':
+            depth -= 1
+            if depth == 0:
+                optional = text[i + 1:i + 2] in ('?', '*')
+                groups.append((text[start + 1:i], optional))
+                top_level.append(' ')
+        elif depth == 0:
+            top_level.append(c)
+    top_level = ''.join(top_level)
+    if '|' in top_level:
+        return set()
+    
+    # A word outside any group is always required; the longest is the most selective
+    words = re.findall(r'[a-z]+', top_level.lower())
+    if words:
+        return {max(words, key=len)}
+    
+    # Otherwise every match contains one alternative of the first required group
+    for body, optional in groups:
+        if optional:
+            continue
+        if '(' in body:
+            return set()
+        keywords = set()
+        for alternative in body.split('|'):
+            alternative_words = re.findall(r'[a-z]+', alternative.lower())
+            if not alternative_words:
+                return set()
+            keywords.add(max(alternative_words, key=len))
+        return keywords
+    return set()
+
 
 class FashionChatbot:
-    def __init__(self):
+    def __init__(self, product_search=get_chat_product_search):
         """Initialize the chatbot with fashion knowledge"""
+        # Callable returning the catalog search used to ground answers in real products
+        self.product_search = product_search
+        
         # Define fashion knowledge base
         self.fashion_knowledge = {
             'styles': {
@@ -85,6 +149,9 @@ class FashionChatbot:
             (r'suggest', self._handle_recommendation_request),
             (r'find me', self._handle_recommendation_request),
             
+            # Follow-ups on the last recommendations
+            (r'\b(cheaper|less expensive|pricier|more expensive|what about|how about)\b', self._handle_refinement),
+            
             # Quiz
             (r'(style )?quiz', self._handle_quiz_question),
             (r'take (a|the) quiz', self._handle_quiz_question),
@@ -95,70 +162,321 @@ class FashionChatbot:
             (r'what can you do', self._handle_help_request),
             (r'how (can|do) you (help|work)', self._handle_help_request)
         ]
+        
+        self._compile_patterns()
     
-    def get_response(self, message):
-        """Generate a response to the user's message"""
+    def _compile_patterns(self):
+        """Compile the patterns and a keyword scanner that selects which of them can match"""
+        # Patterns are written with "I" but messages are lowercased, so match case-insensitively
+        self.compiled_patterns = [(re.compile(pattern, re.IGNORECASE), handler) for pattern, handler in self.patterns]
+        
+        keywords_by_pattern = [_pattern_keywords(pattern) for pattern, _ in self.patterns]
+        all_keywords = set().union(*keywords_by_pattern)
+        
+        # Map each keyword to the shortest keyword it starts with, so no scanned keyword is a
+        # prefix of another and the scanner cannot skip an occurrence at the same position
+        def scanned(keyword):
+            return min((k for k in all_keywords if keyword.startswith(k)), key=len)
+        
+        self.keyword_patterns = {}
+        self.unfiltered_patterns = []
+        for index, keywords in enumerate(keywords_by_pattern):
+            if not keywords:
+                self.unfiltered_patterns.append(index)
+            for keyword in keywords:
+                self.keyword_patterns.setdefault(scanned(keyword), []).append(index)
+        
+        alternation = '|'.join(re.escape(k) for k in sorted(self.keyword_patterns, key=len, reverse=True))
+        self.keyword_scanner = re.compile(f'(?=({alternation}))') if alternation else None
+    
+    def match_pattern(self, message):
+        """Find the first pattern, in list order, matching a lowercased message"""
+        # One scan for keywords picks the candidate patterns; messages with none skip the patterns entirely
+        candidates = set(self.unfiltered_patterns)
+        if self.keyword_scanner:
+            for keyword in self.keyword_scanner.findall(message):
+                candidates.update(self.keyword_patterns[keyword])
+        
+        for index in sorted(candidates):
+            pattern, handler = self.compiled_patterns[index]
+            match = pattern.search(message)
+            if match:
+                return match, handler
+        return None, None
+    
+    def iter_reply(self, message, session=None):
+        """Yield the reply as ('text', str) and ('product', dict) events, text first
+
+        A ChatSession, if given, is read for follow-ups and updated with the slots
+        and results of any catalog search the reply makes.
+        """
         # Convert message to lowercase for easier matching
         message = message.lower()
         
         # Try to match the message against our patterns
-        for pattern, handler in self.patterns:
-            match = re.search(pattern, message)
-            if match:
-                return handler(match, message)
+        match, handler = self.match_pattern(message)
+        if not match:
+            # A bare follow-up such as "in blue" refines the last results
+            refined = self._refine(message, session)
+            if refined:
+                yield from refined
+                return
+            # If no pattern matches, return a fallback response
+            yield 'text', random.choice(self.fallbacks)
+            return
         
-        # If no pattern matches, return a fallback response
-        return random.choice(self.fallbacks)
+        # Handlers return text, or a generator of events when the answer is grounded in the catalog
+        reply = handler(match, message, session)
+        if isinstance(reply, str):
+            yield 'text', reply
+        else:
+            yield from reply
+    
+    def get_reply(self, message, session=None):
+        """Generate a response to the user's message, with any products it refers to"""
+        texts, products = [], []
+        for kind, value in self.iter_reply(message, session):
+            (texts if kind == 'text' else products).append(value)
+        response = '\n'.join(texts)
+        if products:
+            response += '\n' + '\n'.join(f"- {p['productDisplayName']}" for p in products)
+        return {'response': response, 'products': products}
     
-    def _handle_greeting(self, match, message):
+    def get_response(self, message):
+        """Generate a text response to the user's message"""
+        return self.get_reply(message)['response']
+    
+    def _get_product_search(self):
+        """The catalog search, or None if the catalog cannot be loaded"""
+        try:
+            return self.product_search()
+        except Exception as e:
+            print(f"Error loading products for chat: {e}")
+            return None
+    
+    @staticmethod
+    def _describe(attributes):
+        """Short phrase for extracted attributes, such as: red tshirts for men"""
+        words = [v.lower() for field in ('baseColour', 'season', 'usage') for v in attributes.get(field, [])]
+        kind = attributes.get('articleType') or attributes.get('subCategory') or attributes.get('masterCategory')
+        words.append(' or '.join(v.lower() for v in kind) if kind else 'picks')
+        phrase = ' '.join(words)
+        if attributes.get('gender'):
+            phrase += ' for ' + ' and '.join(v.lower() for v in attributes['gender'])
+        return phrase
+    
+    def _handle_greeting(self, match, message, session=None):
         """Handle greeting messages"""
         return random.choice(self.greetings)
     
-    def _handle_style_question(self, match, message):
+    def _handle_style_question(self, match, message, session=None):
         """Handle questions about fashion styles"""
         style = match.group(1).lower()
         if style in self.fashion_knowledge['styles']:
             return self.fashion_knowledge['styles'][style]
         return f"I don't have specific information about {style} style, but I can tell you about casual, formal, athletic, bohemian, or minimalist styles."
     
-    def _handle_occasion_question(self, match, message):
+    def _handle_occasion_question(self, match, message, session=None):
         """Handle questions about what to wear for different occasions"""
         occasion = match.group(3).lower()
-        if occasion in self.fashion_knowledge['occasions']:
-            return self.fashion_knowledge['occasions'][occasion]
-        return f"I don't have specific recommendations for {occasion}, but I can suggest outfits for work, casual outings, formal events, dates, or workouts."
+        if occasion not in self.fashion_knowledge['occasions']:
+            yield 'text', f"I don't have specific recommendations for {occasion}, but I can suggest outfits for work, casual outings, formal events, dates, or workouts."
+            return
+        
+        # The advice goes out before the catalog is searched
+        yield 'text', self.fashion_knowledge['occasions'][occasion]
+        search = self._get_product_search()
+        if search is None:
+            return
+        attributes, other_words = search.extract(message)
+        ranked = search.search(attributes, other_words, MAX_CANDIDATES if session else CHAT_PRODUCT_LIMIT)
+        if ranked:
+            self._remember(session, search, attributes, ranked)
+            yield 'text', "A few pieces from our catalog:"
+            for row, _ in ranked[:CHAT_PRODUCT_LIMIT]:
+                yield 'product', search.products[row]
     
-    def _handle_seasonal_question(self, match, message):
+    def _handle_seasonal_question(self, match, message, session=None):
         """Handle questions about seasonal fashion"""
         season = match.group(3).lower()
         if season in self.fashion_knowledge['seasonal']:
             return self.fashion_knowledge['seasonal'][season]
         return f"I don't have specific information about {season} fashion, but I can tell you about summer, winter, spring, or fall fashion."
     
-    def _handle_care_question(self, match, message):
+    def _handle_care_question(self, match, message, session=None):
         """Handle questions about clothing care"""
-        care_type = match.group(2).lower()
-        if care_type == "wash":
-            care_type = "washing"
-        elif care_type == "dry":
-            care_type = "drying"
-        elif care_type == "iron":
-            care_type = "ironing"
-        elif care_type == "store":
-            care_type = "storage"
+        # The care word is group 2 in "how do I wash my clothes" but group 1 in "washing tips for clothes"
+        care_words = {'wash': 'washing', 'dry': 'drying', 'iron': 'ironing', 'store': 'storage'}
+        words = [g.lower() for g in match.groups() if g]
+        care_type = next((care_words.get(w, w) for w in words if w in care_words or w in care_words.values()), '')
             
         if care_type in self.fashion_knowledge['care']:
             return self.fashion_knowledge['care'][care_type]
         return "For clothing care, I can provide tips on washing, drying, ironing, and storage. Always check the care label on your garments for specific instructions."
     
-    def _handle_recommendation_request(self, match, message):
+    def _handle_recommendation_request(self, match, message, session=None):
         """Handle requests for fashion recommendations"""
-        return "I'd be happy to help you find something! You can try our style quiz for personalized recommendations, or browse our collection using the filters. What kind of items are you looking for today?"
+        search = self._get_product_search()
+        attributes, other_words = search.extract(message) if search else ({}, [])
+        if not attributes and not other_words:
+            yield 'text', "I'd be happy to help you find something! You can try our style quiz for personalized recommendations, or browse our collection using the filters. What kind of items are you looking for today?"
+            return
+        
+        # Say what we are looking for before ranking, then send products in rank order;
+        # the wording has to hold whether or not anything is found
+        yield 'text', f"Looking for {self._describe(attributes)}..."
+        ranked = search.search(attributes, other_words, MAX_CANDIDATES if session else CHAT_PRODUCT_LIMIT)
+        self._remember(session, search, attributes, ranked)
+        for row, _ in ranked[:CHAT_PRODUCT_LIMIT]:
+            yield 'product', search.products[row]
+        if not ranked:
+            yield 'text', "Nothing in our catalog matches that right now. Try a different colour or style, or take our style quiz for personalized recommendations."
+    
+    def _handle_refinement(self, match, message, session=None):
+        """Handle follow-ups that narrow down the last recommendations"""
+        refined = self._refine(message, session)
+        if refined:
+            yield from refined
+        elif session is None or not session.has_results:
+            yield 'text', "I haven't shown you any products yet. What kind of items are you looking for?"
+        else:
+            yield 'text', "Tell me what to change, like a colour, a style, or cheaper or pricier options."
+    
+    @staticmethod
+    def _remember(session, search, attributes, ranked):
+        """Keep a search's catalog attributes and ranked results for follow-ups"""
+        if session is None or not ranked:
+            return
+        ids = [search.products[row]['id'] for row, _ in ranked]
+        session.remember(attributes, ids, ids[:CHAT_PRODUCT_LIMIT])
+    
+    def _refine(self, message, session):
+        """Events answering a follow-up from the last results, or None if the message refines nothing"""
+        if session is None or not session.has_results:
+            return None
+        search = self._get_product_search()
+        if search is None:
+            return None
+        # Only catalog attributes or a price direction make a follow-up; other words
+        # ("thanks", "where is my order") are left to the fallback
+        attributes, _ = search.extract(message)
+        direction = -1 if CHEAPER.search(message) else 1 if PRICIER.search(message) else 0
+        if not attributes and not direction:
+            return None
+        
+        # New values replace earlier ones for the same slot
+        slots = dict(session.slots)
+        slots.update(attributes)
+        
+        # A different kind of product: search the catalog again, keeping the other slots
+        if any(field in attributes and attributes[field] != session.slots.get(field) for field in CATEGORY_SLOTS):
+            for field in CATEGORY_SLOTS:
+                if field not in attributes:
+                    slots.pop(field, None)
+            return self._fresh_search(search, slots, session)
+        
+        # Filter the previous candidates, keeping their order; the catalog itself is not searched again.
+        # Candidates include partial matches, so every remembered slot is applied, not just the new ones
+        rows = search.filter_rows([search.row_of[i] for i in session.candidate_ids if i in search.row_of], slots)
+        if direction:
+            shown = [simulated_price(search.products[search.row_of[i]]) for i in session.shown_ids if i in search.row_of]
+            if shown:
+                reference = min(shown) if direction < 0 else max(shown)
+                rows = [row for row in rows if (simulated_price(search.products[row]) - reference) * direction > 0]
+        if not len(rows):
+            return [('text', "None of the products I just showed you match that. Try another colour or style, or ask me for something new.")]
+        
+        ranked = [(int(row), None) for row in rows]
+        self._remember(session, search, slots, ranked)
+        price = 'cheaper ' if direction < 0 else 'pricier ' if direction > 0 else ''
+        events = [('text', f"Here are {price}{self._describe(slots)} from those results:")]
+        events.extend(('product', search.products[row]) for row, _ in ranked[:CHAT_PRODUCT_LIMIT])
+        return events
     
-    def _handle_quiz_question(self, match, message):
+    def _fresh_search(self, search, slots, session):
+        """Events for a catalog search with the given slots, remembered for further follow-ups"""
+        ranked = search.search(slots, (), MAX_CANDIDATES)
+        events = [('text', f"Looking for {self._describe(slots)}...")]
+        if not ranked:
+            events.append(('text', "Nothing in our catalog matches that right now. Try a different colour or style, or take our style quiz for personalized recommendations."))
+            return events
+        self._remember(session, search, slots, ranked)
+        events.extend(('product', search.products[row]) for row, _ in ranked[:CHAT_PRODUCT_LIMIT])
+        return events
+    
+    def _handle_quiz_question(self, match, message, session=None):
         """Handle questions about the style quiz"""
         return "Our style quiz helps find your perfect fashion matches! It's quick and fun - just answer a few questions about your preferences, and we'll recommend items tailored to your style. Would you like to take it now?"
     
-    def _handle_help_request(self, match, message):
+    def _handle_help_request(self, match, message, session=None):
         """Handle help requests"""
         return "I'm your Fashion Finder assistant! I can help with:\n- Fashion advice and style information\n- Outfit recommendations for different occasions\n- Seasonal fashion tips\n- Clothing care guidance\n- Finding products that match your style\nJust ask me anything about fashion, or try our style quiz for personalized recommendations!"
+
+
+# Stand-in chat log for the benchmark when no --corpus is given; most real messages hit the fallback
+SAMPLE_MESSAGES = [
+    "hi", "Hello!", "hey there", "what should I wear to work", "what is casual style",
+    "tell me about minimalist style", "summer fashion tips", "how do I wash my clothes",
+    "can you recommend a red dress", "suggest some sneakers", "find me a blue shirt", "style quiz",
+    "help", "what can you do",
+    "where is my order", "do you ship to canada", "is this available in size m",
+    "i need something for my sister's wedding next month", "do these jeans run small",
+    "what's the return policy", "are there any discounts right now", "my package arrived damaged",
+    "can i change my delivery address", "do you have this in black", "how long does shipping take",
+    "i love the new collection", "is the leather real", "what material is this jacket",
+    "thanks", "ok cool", "lol", "this is taking forever", "can i pay with paypal",
+    "which one looks better on petite women", "is the fit true to size"
+]
+
+
+def load_corpus(path):
+    """One message per line; NDJSON lines use their "message" field"""
+    import json
+    messages = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                line = json.loads(line).get('message', '')
+            messages.append(line)
+    return messages
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    
+    parser = argparse.ArgumentParser(description='Benchmark chatbot intent matching')
+    parser.add_argument('--corpus', help='Chat log: one message per line, or NDJSON with a "message" field')
+    parser.add_argument('--repeat', type=int, default=2000, help='Passes over the corpus')
+    args = parser.parse_args()
+    
+    messages = [m.lower() for m in (load_corpus(args.corpus) if args.corpus else SAMPLE_MESSAGES)]
+    chatbot = FashionChatbot()
+    
+    def sequential(message):
+        """The previous strategy: search every pattern in order until one matches"""
+        for index, (pattern, _) in enumerate(chatbot.compiled_patterns):
+            if pattern.search(message):
+                return index
+        return None
+    
+    # Both strategies must pick the same pattern for every message
+    mismatches = 0
+    for message in messages:
+        match, handler = chatbot.match_pattern(message)
+        expected = sequential(message)
+        actual = chatbot.compiled_patterns.index((match.re, handler)) if match else None
+        mismatches += expected != actual
+    unmatched = sum(sequential(m) is None for m in messages)
+    print(f"{len(messages)} messages, {unmatched} unmatched, {mismatches} dispatch mismatches")
+    
+    for name, strategy in (('sequential', sequential), ('keyword dispatch', chatbot.match_pattern)):
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for message in messages:
+                strategy(message)
+        elapsed = time.perf_counter() - started
+        print(f"{name}: {elapsed / (args.repeat * len(messages)) * 1e6:.2f} us/message")
@@ -10,6 +10,7 @@ import numpy as np
 from sklearn.preprocessing import OneHotEncoder
 import pandas as pd
 from .image_embedding_service_new import get_embeddings_for_all_products, compute_similarity
+from .recommendation_result import RecommendedProduct
 
 class EmbeddingRecommendationService:
     def __init__(self, products, images_dir="attached_assets/images"):
@@ -17,6 +18,7 @@ class EmbeddingRecommendationService:
         self.products = products
         self.images_dir = images_dir
         self.product_dict = {p['id']: p for p in products}
+        self.product_index = {p['id']: i for i, p in enumerate(products)}
         
         # Generate embeddings (this can be slow for large product catalogs)
         self.setup_embeddings()
@@ -137,11 +139,9 @@ class EmbeddingRecommendationService:
         similar_products = []
         
         for pid, similarity in top_similar:
-            if pid in self.product_dict:
-                product = self.product_dict[pid].copy()
-                product['similarityScore'] = float(similarity)
-                product['recommendationReason'] = "Visually similar"
-                similar_products.append(product)
+            if pid in self.product_index:
+                similar_products.append(
+                    RecommendedProduct(self.products, self.product_index[pid], similarity, "Visually similar"))
         
         return similar_products
     
@@ -194,10 +194,8 @@ class EmbeddingRecommendationService:
         recommended_products = []
         
         for pid, similarity in top_similar:
-            if pid in self.product_dict:
-                product = self.product_dict[pid].copy()
-                product['similarityScore'] = float(similarity)
-                product['recommendationReason'] = "Based on your style preferences"
-                recommended_products.append(product)
+            if pid in self.product_index:
+                recommended_products.append(
+                    RecommendedProduct(self.products, self.product_index[pid], similarity, "Based on your style preferences"))
         
         return recommended_products
\ No newline at end of file
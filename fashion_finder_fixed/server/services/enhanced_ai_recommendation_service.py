@@ -18,6 +18,10 @@ from sklearn.metrics.pairwise import cosine_similarity
 import random
 import json
 from collections import Counter
+from services.recommendation_result import RecommendedProduct
+from services.quiz_recommendation_table import QuizRecommendationTable
+from services.quiz_scoring import QuizScoringEngine
+from utils.cache_invalidation import subscribe
 
 class EnhancedAIRecommendationService:
     def __init__(self, products, images_dir="server/static/images"):
@@ -25,6 +29,7 @@ class EnhancedAIRecommendationService:
         self.products = products
         self.images_dir = images_dir
         self.product_dict = {p['id']: p for p in products}
+        self.product_index = {p['id']: i for i, p in enumerate(products)}
         
         # Generate embeddings
         self.setup_embeddings()
@@ -32,8 +37,12 @@ class EnhancedAIRecommendationService:
         # Fashion knowledge base for contextual recommendations
         self.setup_fashion_knowledge()
         
-        # User preference model cache
+        # User preference model cache, dropped when the user's interactions change
         self.user_preference_cache = {}
+        subscribe(self.invalidate_user)
+        
+        # Rank the catalog for every quiz answer combination up front
+        self.quiz_table = QuizRecommendationTable(QuizScoringEngine(self.products), jitter=0.5)
         
         print(f"Enhanced AI recommendation system initialized with {len(self.products)} products")
     
@@ -265,11 +274,9 @@ class EnhancedAIRecommendationService:
         recommended_products = []
         
         for pid, similarity, reason in combined_recommendations:
-            if pid in self.product_dict:
-                product = self.product_dict[pid].copy()
-                product['similarityScore'] = float(similarity)
-                product['recommendationReason'] = reason
-                recommended_products.append(product)
+            if pid in self.product_index:
+                recommended_products.append(
+                    RecommendedProduct(self.products, self.product_index[pid], similarity, reason))
         
         return recommended_products
     
@@ -371,6 +378,11 @@ class EnhancedAIRecommendationService:
             'has_preferences': preference_embedding is not None
         }
     
+    def invalidate_user(self, user_id):
+        """Forget the cached preference model for a user"""
+        self.user_preference_cache.pop(user_id, None)
+        self.user_preference_cache.pop(str(user_id), None)
+    
     def get_recommendations_for_user(self, user_id, liked_product_ids, disliked_product_ids=None, 
                                     viewed_product_ids=None, top_k=8):
         """Get personalized recommendations based on a user's interactions"""
@@ -495,104 +507,20 @@ class EnhancedAIRecommendationService:
         recommended_products = []
         
         for pid, similarity, reason in combined_recommendations:
-            if pid in self.product_dict:
-                product = self.product_dict[pid].copy()
-                product['similarityScore'] = float(similarity)
-                product['recommendationReason'] = reason
-                product['isRecommended'] = True
-                recommended_products.append(product)
+            if pid in self.product_index:
+                recommended_products.append(
+                    RecommendedProduct(self.products, self.product_index[pid], similarity, reason,
+                                       is_recommended=True))
         
         return recommended_products
     
-    def get_recommendations_from_quiz(self, quiz_answers, top_k=8):
+    def get_recommendations_from_quiz(self, quiz_answers, top_k=8, exclude_ids=None):
         """Generate recommendations based on quiz answers"""
         # Extract preferences from quiz answers
-        style_preference = None
-        color_preference = None
-        occasion = None
-        
-        for answer in quiz_answers:
-            if answer.get('questionId') == 'style_preference':
-                style_preference = answer.get('response')
-            elif answer.get('questionId') == 'color_preference':
-                color_preference = answer.get('response')
-            elif answer.get('questionId') == 'occasion':
-                occasion = answer.get('response')
-        
-        # Define mappings for quiz answers
-        style_mapping = {
-            'minimalist': ['Minimalist', 'Clean', 'Simple'],
-            'casual': ['Casual', 'Everyday', 'Relaxed'],
-            'formal': ['Formal', 'Business', 'Elegant'],
-            'athletic': ['Sports', 'Active', 'Athletic'],
-            'bohemian': ['Bohemian', 'Boho', 'Ethnic']
-        }
-        
-        color_mapping = {
-            'neutral': ['Black', 'White', 'Grey', 'Navy Blue', 'Beige', 'Brown'],
-            'vibrant': ['Red', 'Blue', 'Green', 'Yellow', 'Orange', 'Purple', 'Pink'],
-            'pastel': ['Pink', 'Light Blue', 'Mint', 'Lavender', 'Peach', 'Sky Blue']
-        }
-        
-        occasion_mapping = {
-            'everyday': ['Casual'],
-            'work': ['Formal', 'Office'],
-            'special': ['Ethnic', 'Formal', 'Party'],
-            'athletic': ['Sports', 'Active']
-        }
-        
-        # Score each product based on quiz matches
-        scored_products = []
-        
-        for product in self.products:
-            score = 0
-            reasons = []
-            
-            # Match style preference
-            if style_preference and style_preference in style_mapping:
-                for style_keyword in style_mapping[style_preference]:
-                    if (style_keyword.lower() in product.get('usage', '').lower() or 
-                        style_keyword.lower() in product.get('productDisplayName', '').lower()):
-                        score += 3
-                        reasons.append(f"Matches {style_preference} style")
-                        break
-            
-            # Match color preference
-            if color_preference and color_preference in color_mapping:
-                if product.get('baseColour') in color_mapping[color_preference]:
-                    score += 2
-                    reasons.append(f"In your preferred {color_preference} palette")
-            
-            # Match occasion
-            if occasion and occasion in occasion_mapping:
-                for occasion_keyword in occasion_mapping[occasion]:
-                    if occasion_keyword.lower() in product.get('usage', '').lower():
-                        score += 2
-                        reasons.append(f"Perfect for {occasion} occasions")
-                        break
-            
-            # Add small random factor for variety
-            score += random.uniform(0, 0.5)
-            
-            # Only include products with some match
-            if score > 1:
-                scored_products.append((product, score, reasons[0] if reasons else "Matches your preferences"))
-        
-        # Sort by score (descending) and take top products
-        scored_products.sort(key=lambda x: x[1], reverse=True)
-        top_products = scored_products[:top_k]
+        answers = {answer.get('questionId'): answer.get('response') for answer in quiz_answers}
         
-        # Return the recommended products with reasons
-        recommended_products = []
-        
-        for product, score, reason in top_products:
-            product_copy = product.copy()
-            product_copy['similarityScore'] = float(score)
-            product_copy['recommendationReason'] = reason
-            product_copy['isRecommended'] = True
-            recommended_products.append(product_copy)
-        
-        return recommended_products
+        # Candidates for every answer combination are ranked at startup
+        return self.quiz_table.recommend(answers, exclude_ids=exclude_ids, limit=top_k)
     
     def get_default_recommendations(self, top_k=8):
         """Get default recommendations for new users"""
@@ -601,18 +529,18 @@ class EnhancedAIRecommendationService:
         
         # Get a diverse set of products across categories
         categories = {}
-        for product in self.products:
+        for row, product in enumerate(self.products):
             category = product.get('articleType', 'unknown')
             if category not in categories:
                 categories[category] = []
-            categories[category].append(product)
+            categories[category].append(row)
         
         # Take a few products from each major category
         recommendations = []
-        for category, products in categories.items():
-            if len(products) > 0:
+        for category, rows in categories.items():
+            if len(rows) > 0:
                 # Take up to 2 products from each category
-                category_picks = random.sample(products, min(2, len(products)))
+                category_picks = random.sample(rows, min(2, len(rows)))
                 recommendations.extend(category_picks)
                 
                 # Stop if we have enough recommendations
@@ -621,7 +549,7 @@ class EnhancedAIRecommendationService:
         
         # If we still need more, add random products
         if len(recommendations) < top_k:
-            remaining = random.sample(self.products, min(top_k - len(recommendations), len(self.products)))
+            remaining = random.sample(range(len(self.products)), min(top_k - len(recommendations), len(self.products)))
             recommendations.extend(remaining)
         
         # Shuffle and limit to top_k
@@ -629,10 +557,7 @@ class EnhancedAIRecommendationService:
         recommendations = recommendations[:top_k]
         
         # Add recommendation metadata
-        for product in recommendations:
-            product_copy = product.copy()
-            product_copy['recommendationReason'] = "Popular item"
-            product_copy['isRecommended'] = True
-            product_copy['similarityScore'] = 1.0
-        
-        return recommendations
+        return [
+            RecommendedProduct(self.products, row, 1.0, "Popular item", is_recommended=True)
+            for row in recommendations
+        ]
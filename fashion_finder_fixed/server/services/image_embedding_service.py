@@ -11,6 +11,7 @@ from PIL import Image
 import torch
 from torchvision import transforms, models
 from torchvision.models import ResNet50_Weights
+from .recommendation_result import RecommendedProduct
 
 # Cache for storing computed embeddings to avoid recomputing
 embedding_cache = {}
@@ -117,13 +118,11 @@ def find_similar_products(product_id, product_embeddings, products, top_k=10):
     top_similar = similarities[:top_k]
     
     # Return the actual product objects
-    similar_products = []
-    product_dict = {p['id']: p for p in products}
+    wanted = {pid for pid, _ in top_similar}
+    rows = {p['id']: row for row, p in enumerate(products) if p['id'] in wanted}
     
-    for pid, similarity in top_similar:
-        if pid in product_dict:
-            product = product_dict[pid].copy()
-            product['similarityScore'] = float(similarity)
-            similar_products.append(product)
-    
-    return similar_products
\ No newline at end of file
+    return [
+        RecommendedProduct(products, rows[pid], similarity, None)
+        for pid, similarity in top_similar
+        if pid in rows
+    ]
\ No newline at end of file
@@ -0,0 +1,280 @@
+"""
+Item-to-item collaborative filtering for FashionFinder
+
+An offline job reads the interactions table and counts how often two products
+are liked (or viewed) by the same user. From those co-occurrence counts it
+keeps the top-N most similar neighbours of every product, stored compactly in
+a single .npz file next to the database.
+
+The job is incremental: it remembers the highest interaction id it has
+processed (the watermark) and on the next run only folds in newer rows.
+Deleted interactions (e.g. a like toggled to a dislike) are only picked up by
+a full rebuild, so run it with --full periodically.
+
+Serving merges the neighbour lists of a user's liked products, which only
+touches a few small arrays and takes well under a millisecond.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+import scipy.sparse as sp
+
+DB_PATH = os.path.join(os.path.dirname(__file__), '../../data/fashionfinder.db')
+NEIGHBORS_PATH = os.path.join(os.path.dirname(__file__), '../../data/item_neighbors.npz')
+
+# How much each kind of co-occurrence contributes to item similarity
+SIGNAL_WEIGHTS = {'like': 1.0, 'view': 0.3}
+
+DEFAULT_NEIGHBORS = 50
+
+
+def _empty_counts(n_items):
+    return sp.csr_matrix((n_items, n_items), dtype=np.float32)
+
+
+def _load_state(path):
+    """Load the previous job output, or None if there is none"""
+    if not os.path.exists(path):
+        return None
+
+    with np.load(path, allow_pickle=False) as data:
+        item_ids = data['item_ids'].tolist()
+        n_items = len(item_ids)
+        counts = {}
+        for signal in SIGNAL_WEIGHTS:
+            counts[signal] = sp.csr_matrix(
+                (data[f'{signal}_data'], data[f'{signal}_indices'], data[f'{signal}_indptr']),
+                shape=(n_items, n_items)
+            )
+        return {
+            'item_ids': item_ids,
+            'counts': counts,
+            'watermark': int(data['watermark'])
+        }
+
+
+def _user_item_matrix(rows, user_index, item_index, n_users, n_items):
+    """Binary users x items matrix from (user, product) pairs"""
+    if not rows:
+        return sp.csr_matrix((n_users, n_items), dtype=np.float32)
+
+    users = np.fromiter((user_index[u] for u, _ in rows), dtype=np.int64, count=len(rows))
+    items = np.fromiter((item_index[p] for _, p in rows), dtype=np.int64, count=len(rows))
+    matrix = sp.csr_matrix((np.ones(len(rows), dtype=np.float32), (users, items)),
+                           shape=(n_users, n_items))
+    # Repeated views of the same product count once
+    matrix.data[:] = 1.0
+    return matrix
+
+
+def _top_neighbors(counts, n_neighbors):
+    """Blend the co-occurrence counts into cosine similarities and keep the top N per item"""
+    similarity = None
+    for signal, weight in SIGNAL_WEIGHTS.items():
+        co = counts[signal].tocsr()
+        diag = co.diagonal()
+        norm = np.zeros_like(diag)
+        nonzero = diag > 0
+        norm[nonzero] = 1.0 / np.sqrt(diag[nonzero])
+        scaled = sp.diags(norm) @ co @ sp.diags(norm) * weight
+        similarity = scaled if similarity is None else similarity + scaled
+
+    similarity = similarity.tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+
+    indptr = [0]
+    indices = []
+    scores = []
+    for row in range(similarity.shape[0]):
+        start, end = similarity.indptr[row], similarity.indptr[row + 1]
+        row_indices = similarity.indices[start:end]
+        row_scores = similarity.data[start:end]
+        if len(row_scores) > n_neighbors:
+            keep = np.argpartition(-row_scores, n_neighbors)[:n_neighbors]
+            row_indices, row_scores = row_indices[keep], row_scores[keep]
+        order = np.argsort(-row_scores)
+        indices.append(row_indices[order])
+        scores.append(row_scores[order])
+        indptr.append(indptr[-1] + len(order))
+
+    return (
+        np.asarray(indptr, dtype=np.int64),
+        np.concatenate(indices).astype(np.int32) if indices else np.zeros(0, dtype=np.int32),
+        np.concatenate(scores).astype(np.float32) if scores else np.zeros(0, dtype=np.float32)
+    )
+
+
+def build_item_neighbors(db_path=DB_PATH, output_path=NEIGHBORS_PATH, full=False,
+                         n_neighbors=DEFAULT_NEIGHBORS):
+    """Build or incrementally refresh the item-item neighbour lists"""
+    state = None if full else _load_state(output_path)
+    watermark = state['watermark'] if state else 0
+    item_ids = state['item_ids'] if state else []
+    item_index = {pid: i for i, pid in enumerate(item_ids)}
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT MAX(id) FROM interactions WHERE id > ?",
+            (watermark,)
+        )
+        new_watermark = cursor.fetchone()[0]
+        if new_watermark is None:
+            print(f"No interactions newer than watermark {watermark}")
+            return state
+
+        # Only users with new likes/views can change the counts
+        cursor.execute(
+            "SELECT DISTINCT user_id FROM interactions WHERE id > ? AND id <= ? AND interaction_type IN ('like', 'view')",
+            (watermark, new_watermark)
+        )
+        affected_users = [row[0] for row in cursor.fetchall()]
+
+        old_rows = {signal: [] for signal in SIGNAL_WEIGHTS}
+        new_rows = {signal: [] for signal in SIGNAL_WEIGHTS}
+        for start in range(0, len(affected_users), 500):
+            batch = affected_users[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            cursor.execute(
+                f"SELECT id, user_id, product_id, interaction_type FROM interactions "
+                f"WHERE user_id IN ({placeholders}) AND id <= ? AND interaction_type IN ('like', 'view')",
+                (*batch, new_watermark)
+            )
+            for interaction_id, user_id, product_id, interaction_type in cursor.fetchall():
+                product_id = str(product_id)
+                if product_id not in item_index:
+                    item_index[product_id] = len(item_ids)
+                    item_ids.append(product_id)
+                target = old_rows if interaction_id <= watermark else new_rows
+                target[interaction_type].append((user_id, product_id))
+    finally:
+        conn.close()
+
+    n_items = len(item_ids)
+    user_index = {u: i for i, u in enumerate(affected_users)}
+    n_users = len(affected_users)
+
+    counts = {}
+    for signal in SIGNAL_WEIGHTS:
+        previous = state['counts'][signal] if state else _empty_counts(0)
+        previous = previous.tocsr()
+        previous.resize((n_items, n_items))
+
+        old = _user_item_matrix(old_rows[signal], user_index, item_index, n_users, n_items)
+        both = _user_item_matrix(old_rows[signal] + new_rows[signal], user_index, item_index, n_users, n_items)
+        # (old + new)^T (old + new) - old^T old, restricted to the affected users
+        delta = (both.T @ both) - (old.T @ old)
+        counts[signal] = (previous + delta).tocsr()
+        counts[signal].eliminate_zeros()
+
+    indptr, indices, scores = _top_neighbors(counts, n_neighbors)
+
+    arrays = {
+        'item_ids': np.asarray(item_ids, dtype=str),
+        'watermark': np.asarray(new_watermark, dtype=np.int64),
+        'neighbor_indptr': indptr,
+        'neighbor_indices': indices,
+        'neighbor_scores': scores
+    }
+    for signal, matrix in counts.items():
+        arrays[f'{signal}_data'] = matrix.data.astype(np.float32)
+        arrays[f'{signal}_indices'] = matrix.indices.astype(np.int32)
+        arrays[f'{signal}_indptr'] = matrix.indptr.astype(np.int64)
+
+    # Write to a temporary file first so readers never see a partial file
+    tmp_path = output_path + '.tmp.npz'
+    np.savez_compressed(tmp_path, **arrays)
+    os.replace(tmp_path, output_path)
+
+    print(f"Item neighbours built for {n_items} products "
+          f"({n_users} users refreshed, watermark {watermark} -> {new_watermark})")
+    return {'item_ids': item_ids, 'counts': counts, 'watermark': int(new_watermark)}
+
+
+class ItemSimilarityIndex:
+    """Read-only view over the neighbour lists written by build_item_neighbors"""
+
+    def __init__(self, path=NEIGHBORS_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            self.item_ids = data['item_ids'].tolist()
+            self.indptr = data['neighbor_indptr']
+            self.indices = data['neighbor_indices']
+            self.scores = data['neighbor_scores']
+            self.watermark = int(data['watermark'])
+        self.item_index = {pid: i for i, pid in enumerate(self.item_ids)}
+
+    def neighbors(self, product_id, top_k=10):
+        """Most similar products to one product as (product_id, score) pairs"""
+        row = self.item_index.get(str(product_id))
+        if row is None:
+            return []
+        start = self.indptr[row]
+        end = min(self.indptr[row + 1], start + top_k)
+        return [(self.item_ids[i], float(s))
+                for i, s in zip(self.indices[start:end], self.scores[start:end])]
+
+    def recommend(self, liked_product_ids, exclude_ids=None, top_k=8):
+        """Merge the neighbour lists of the liked products into one ranking"""
+        rows = [self.item_index[str(pid)] for pid in liked_product_ids if str(pid) in self.item_index]
+        if not rows:
+            return []
+
+        candidates = np.concatenate([self.indices[self.indptr[r]:self.indptr[r + 1]] for r in rows])
+        weights = np.concatenate([self.scores[self.indptr[r]:self.indptr[r + 1]] for r in rows])
+        if candidates.size == 0:
+            return []
+
+        unique, inverse = np.unique(candidates, return_inverse=True)
+        totals = np.bincount(inverse, weights=weights)
+
+        exclude = set(rows)
+        if exclude_ids:
+            exclude.update(self.item_index[str(pid)] for pid in exclude_ids if str(pid) in self.item_index)
+        if exclude:
+            totals[np.isin(unique, list(exclude))] = -np.inf
+
+        k = min(top_k, len(totals))
+        top = np.argpartition(-totals, k - 1)[:k]
+        top = top[np.argsort(-totals[top])]
+        return [(self.item_ids[unique[i]], float(totals[i])) for i in top if np.isfinite(totals[i])]
+
+
+_index = None
+_index_mtime = None
+_index_lock = threading.Lock()
+
+
+def get_item_similarity_index(path=NEIGHBORS_PATH):
+    """Get the neighbour index, reloading it when the job has written a new file"""
+    global _index, _index_mtime
+
+    if not os.path.exists(path):
+        return None
+
+    mtime = os.path.getmtime(path)
+    if _index is None or mtime != _index_mtime:
+        with _index_lock:
+            if _index is None or mtime != _index_mtime:
+                _index = ItemSimilarityIndex(path)
+                _index_mtime = mtime
+    return _index
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build item-to-item neighbour lists from interactions')
+    parser.add_argument('--db', default=DB_PATH, help='Path to the SQLite database')
+    parser.add_argument('--output', default=NEIGHBORS_PATH, help='Where to write the neighbour file')
+    parser.add_argument('--full', action='store_true', help='Rebuild from scratch instead of from the watermark')
+    parser.add_argument('--neighbors', type=int, default=DEFAULT_NEIGHBORS, help='Neighbours kept per product')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    build_item_neighbors(args.db, args.output, full=args.full, n_neighbors=args.neighbors)
+    print(f"Done in {time.perf_counter() - started:.2f}s")
@@ -7,9 +7,16 @@ products_df = None
 images_df = None
 products_dict = {}
 
+# Bumped on every reload so derived caches know when to rebuild
+catalog_version = 0
+
+def simulated_price(product):
+    """Stand-in price for a product; the catalog has no real prices, so it is derived from the id"""
+    return int(product['id']) % 100 + 30
+
 def load_products():
     """Load product data from CSV files"""
-    global products_df, images_df, products_dict
+    global products_df, images_df, products_dict, catalog_version
     
     # Load CSV data
     data_dir = os.path.join(os.path.dirname(__file__), '../../data')
@@ -18,9 +25,8 @@ def load_products():
     
     # Create a dictionary of products for quick access
     products_dict = {}
-    for _, row in products_df.iterrows():
-        product_id = str(row['id'])
-        
+    # load_styles makes the id the index
+    for product_id, row in products_df.iterrows():
         # Find corresponding image
         image_url = None
         image_record = images_df[images_df.index == product_id]
@@ -41,6 +47,8 @@ def load_products():
             'productDisplayName': row['productDisplayName'],
             'imageUrl': image_url
         }
+    
+    catalog_version += 1
 
 def get_all_products(filters=None, sort=None, page=1, limit=12):
     """Get all products with optional filtering, sorting, and pagination"""
@@ -78,16 +86,16 @@ def get_all_products(filters=None, sort=None, page=1, limit=12):
         if 'priceRange' in filters and len(filters['priceRange']) == 2:
             # Since we don't have actual prices, we'll simulate price filtering based on product ID
             min_price, max_price = filters['priceRange']
-            filtered_products = [p for p in filtered_products if min_price <= (int(p['id']) % 100 + 30) <= max_price]
+            filtered_products = [p for p in filtered_products if min_price <= simulated_price(p) <= max_price]
     
     # Apply sorting
     if sort:
         if sort == 'price_asc':
             # Simulate price sorting based on product ID
-            filtered_products.sort(key=lambda p: int(p['id']) % 100)
+            filtered_products.sort(key=simulated_price)
         elif sort == 'price_desc':
             # Simulate price sorting based on product ID
-            filtered_products.sort(key=lambda p: int(p['id']) % 100, reverse=True)
+            filtered_products.sort(key=simulated_price, reverse=True)
         elif sort == 'newest':
             # Sort by year and season
             season_order = {'Spring': 0, 'Summer': 1, 'Fall': 2, 'Winter': 3}
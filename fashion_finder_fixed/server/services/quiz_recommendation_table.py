@@ -0,0 +1,104 @@
+"""
+Precomputed quiz recommendations for FashionFinder
+
+The style quiz has a small, finite answer space (a handful of options per
+question), so instead of re-scoring the whole catalog on every submission we
+rank the catalog once for every answer combination when the catalog is
+loaded. A request then only looks up its combination, drops the products the
+user already liked or viewed and re-ranks a short candidate list.
+
+Scores are coarse sums of a few match weights, so many products tie. Each
+combination keeps every product within `jitter` of its `candidates`-th
+score, and the re-rank samples among all of them instead of only the ones
+that come first in the catalog.
+"""
+
+import itertools
+import numpy as np
+from models.quiz import QUIZ_QUESTIONS
+from services.recommendation_result import RecommendedProduct
+
+# Candidates kept per answer combination, plus every product within `jitter` of the last one
+DEFAULT_CANDIDATES = 64
+
+
+def quiz_answer_options(question_ids=None):
+    """Option ids per quiz question, in QUIZ_QUESTIONS order"""
+    options = {q['id']: [o['id'] for o in q['options']] for q in QUIZ_QUESTIONS}
+    if question_ids is None:
+        return options
+    return {qid: options[qid] for qid in question_ids}
+
+
+class QuizRecommendationTable:
+    """Ranked candidate rows for every combination of quiz answers
+
+    Candidates come from a QuizScoringEngine. With `require_match` only
+    products that match at least one answer are candidates; otherwise the
+    whole catalog is, and the random jitter decides among unmatched products.
+    Unanswered questions are part of the answer space (as None), so partial
+    quizzes are precomputed too.
+    """
+
+    def __init__(self, engine, question_ids=None, jitter=1.0, candidates=DEFAULT_CANDIDATES,
+                 require_match=True):
+        self.engine = engine
+        self.products = engine.products
+        self.options = quiz_answer_options(question_ids)
+        self.question_ids = list(self.options)
+        self.jitter = jitter
+        self.candidates = candidates
+        self.require_match = require_match
+        self.row_of = {product['id']: row for row, product in enumerate(self.products)}
+        self.table = {}
+
+        for combination in itertools.product(*[opts + [None] for opts in self.options.values()]):
+            answers = dict(zip(self.question_ids, combination))
+            self.table[combination] = self._rank(answers)
+
+    def _key(self, answers):
+        return tuple(
+            answers.get(qid) if answers.get(qid) in self.options[qid] else None
+            for qid in self.question_ids
+        )
+
+    def _rank(self, answers, top_k=None):
+        """Candidates for one answer combination as arrays (rows, scores, reason codes) and the reasons"""
+        return self.engine.rank(answers, top_k or self.candidates, require_match=self.require_match,
+                                margin=self.jitter)
+
+    def recommend(self, answers, exclude_ids=None, limit=8):
+        """Recommendations for a user's answers, skipping products they already know"""
+        ranked = self.table.get(self._key(answers))
+        if ranked is None:
+            ranked = self._rank(answers)
+        rows, scores, codes, reasons = ranked
+
+        if exclude_ids:
+            excluded = np.fromiter((self.row_of[pid] for pid in set(exclude_ids) if pid in self.row_of),
+                                   dtype=np.int32)
+            keep = ~np.isin(rows, excluded)
+            kept = scores[keep]
+            # The stored rows stop at `jitter` below the cut; if exclusions pushed the
+            # re-rank past them, rank deep enough that every excluded product could be
+            # skipped and the pool below still be complete
+            if len(rows) >= self.candidates and (len(kept) < limit or kept[limit - 1] - self.jitter < scores[-1]):
+                rows, scores, codes, reasons = self._rank(answers, self.candidates + len(excluded) + limit)
+                keep = ~np.isin(rows, excluded)
+            rows, scores, codes = rows[keep], scores[keep], codes[keep]
+        if not len(rows):
+            return []
+
+        # Random jitter can only lift a product above others within `jitter` of
+        # its score, so only those take part in the re-rank; scores are sorted,
+        # so they are a prefix
+        cutoff = scores[min(limit, len(rows)) - 1] - self.jitter
+        pool = int(np.count_nonzero(scores >= cutoff))
+        jittered = scores[:pool] + np.random.uniform(0, self.jitter, pool)
+        order = np.argsort(-jittered)[:limit]
+
+        return [
+            RecommendedProduct(self.products, int(rows[i]), float(jittered[i]),
+                               reasons[codes[i]] if codes[i] >= 0 else None, is_recommended=True)
+            for i in order
+        ]
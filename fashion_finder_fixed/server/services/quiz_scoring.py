@@ -0,0 +1,130 @@
+"""
+Vectorized quiz scoring for FashionFinder
+
+QUIZ_RECOMMENDATION_MAPPING is compiled once per catalog into weight vectors
+over the categorical codes of the product fields it refers to. Scoring an
+answer set is then one gather-and-add per matched field over the whole
+catalog; fit keywords are looked up in the product name token index.
+"""
+
+import numpy as np
+from models.quiz import QUIZ_RECOMMENDATION_MAPPING
+from utils.catalog_index import CatalogIndex, tokenize
+
+# Points each kind of match adds to a product's quiz score
+QUIZ_MATCH_WEIGHTS = {
+    'style_article_type': 3.0,
+    'style_usage': 2.0,
+    'color': 2.0,
+    'occasion_usage': 2.0,
+    'occasion_category': 1.0,
+    'fit': 1.0
+}
+
+# Reason shown for a product, by the first question it matches
+QUIZ_MATCH_REASONS = {
+    'style_preference': "Matches {} style",
+    'color_preference': "In your preferred {} palette",
+    'occasion': "Perfect for {} occasions",
+    'fit_preference': "Suits a {} fit"
+}
+
+
+class QuizScoringEngine:
+    """Scores the whole catalog against a set of quiz answers"""
+
+    def __init__(self, products, mapping=QUIZ_RECOMMENDATION_MAPPING, weights=QUIZ_MATCH_WEIGHTS):
+        self.products = products
+        self.index = CatalogIndex(products)
+        self.size = len(products)
+        # {question_id: {option_id: [(codes, weight_vector), ...]}}
+        self.vectors = {}
+        # {option_id: (rows, weight)} for keyword matches on product names
+        self.fit_rows = {}
+
+        index = self.index
+        for option, spec in mapping.get('style_preference', {}).items():
+            self.vectors.setdefault('style_preference', {})[option] = [
+                (index.codes('articleType'),
+                 index.weight_vector('articleType', spec.get('articleTypes', []), weights['style_article_type'])),
+                (index.codes('usage'),
+                 index.weight_vector('usage', spec.get('usages', []), weights['style_usage']))
+            ]
+
+        for option, colours in mapping.get('color_preference', {}).items():
+            self.vectors.setdefault('color_preference', {})[option] = [
+                (index.codes('baseColour'), index.weight_vector('baseColour', colours, weights['color']))
+            ]
+
+        for option, spec in mapping.get('occasion', {}).items():
+            categories = spec.get('boost_categories', [])
+            self.vectors.setdefault('occasion', {})[option] = [
+                (index.codes('usage'),
+                 index.weight_vector('usage', spec.get('usages', []), weights['occasion_usage'])),
+                # Boost categories name sub-categories as well as article types
+                (index.codes('subCategory'),
+                 index.weight_vector('subCategory', categories, weights['occasion_category'])),
+                (index.codes('articleType'),
+                 index.weight_vector('articleType', categories, weights['occasion_category']))
+            ]
+
+        for option, keywords in mapping.get('fit_preference', {}).items():
+            tokens = [token for keyword in keywords for token in tokenize(keyword)]
+            self.fit_rows[option] = (index.tokens.rows_matching_any(tokens), weights['fit'])
+
+    def _contributions(self, answers):
+        """Per-question score arrays for the answered questions, in mapping order"""
+        contributions = []
+        for question_id, options in self.vectors.items():
+            option = answers.get(question_id)
+            if option not in options:
+                continue
+            scores = np.zeros(self.size, dtype=np.float32)
+            for codes, vector in options[option]:
+                scores += vector[codes]
+            contributions.append((question_id, option, scores))
+
+        option = answers.get('fit_preference')
+        if option in self.fit_rows:
+            rows, weight = self.fit_rows[option]
+            if len(rows):
+                scores = np.zeros(self.size, dtype=np.float32)
+                scores[rows] = weight
+                contributions.append(('fit_preference', option, scores))
+        return contributions
+
+    def score(self, answers):
+        """Quiz score of every product for a dict of {question_id: option_id}"""
+        total = np.zeros(self.size, dtype=np.float32)
+        for _, _, scores in self._contributions(answers):
+            total += scores
+        return total
+
+    def rank(self, answers, top_k, require_match=True, margin=None):
+        """Best products for the answers, best first, as arrays (rows, scores, reason codes) and the reasons
+
+        With `margin`, every product within `margin` of the top_k-th score is kept
+        too, so products tied at the cut are not dropped in catalog order. A
+        reason code indexes the reasons list; -1 means the product matches no answer.
+        """
+        contributions = self._contributions(answers)
+        total = np.zeros(self.size, dtype=np.float32)
+        for _, _, scores in contributions:
+            total += scores
+
+        candidates = np.flatnonzero(total > 0) if require_match else np.arange(self.size)
+        if len(candidates) > top_k:
+            keep = np.argpartition(-total[candidates], top_k - 1)[:top_k]
+            if margin is not None:
+                keep = np.flatnonzero(total[candidates] >= total[candidates[keep]].min() - margin)
+            candidates = candidates[keep]
+        # Stable sort keeps catalog order among equal scores
+        candidates = candidates[np.argsort(-total[candidates], kind='stable')]
+
+        # The reason is that of the first question a product matches
+        codes = np.full(len(candidates), -1, dtype=np.int8)
+        reasons = []
+        for question_id, option, scores in contributions:
+            codes[(codes < 0) & (scores[candidates] > 0)] = len(reasons)
+            reasons.append(QUIZ_MATCH_REASONS[question_id].format(option))
+        return candidates.astype(np.int32), total[candidates], codes, reasons
@@ -0,0 +1,53 @@
+"""
+Lightweight recommendation results for FashionFinder
+
+Recommendation paths used to copy the full product dict for every result and
+then add the score and reason to the copy. A RecommendedProduct only keeps a
+reference to the catalog row plus the score and reason; the product fields
+are merged in once, when the result is serialized to JSON.
+"""
+
+
+class RecommendedProduct:
+    """A catalog row with a similarity score and a recommendation reason"""
+
+    __slots__ = ('catalog', 'row', 'score', 'reason', 'is_recommended')
+
+    def __init__(self, catalog, row, score, reason, is_recommended=False):
+        self.catalog = catalog
+        self.row = row
+        self.score = score
+        self.reason = reason
+        self.is_recommended = is_recommended
+
+    @property
+    def product(self):
+        """The underlying (shared, read-only) product dictionary"""
+        return self.catalog[self.row]
+
+    @property
+    def id(self):
+        return self.catalog[self.row]['id']
+
+    def __getitem__(self, key):
+        """Dict-style access so callers can keep using result['id'] etc."""
+        if key == 'similarityScore':
+            return self.score
+        if key == 'recommendationReason' and self.reason is not None:
+            return self.reason
+        if key == 'isRecommended' and self.is_recommended:
+            return True
+        return self.catalog[self.row][key]
+
+    def __repr__(self):
+        return f"RecommendedProduct(id={self.id!r}, score={self.score!r}, reason={self.reason!r})"
+
+    def to_dict(self):
+        """Convert the result to the JSON shape the client expects"""
+        product = dict(self.catalog[self.row])
+        product['similarityScore'] = float(self.score)
+        if self.reason is not None:
+            product['recommendationReason'] = self.reason
+        if self.is_recommended:
+            product['isRecommended'] = True
+        return product
@@ -1,22 +1,40 @@
-from models.quiz import QuizResponse
-from models.interaction import Interaction
+from models.user_signals import UserSignals
+from services import product_service
 from services.product_service import get_all_products, get_product_by_id
+from services.als_service import get_als_scorer
+from services.item_similarity_service import get_item_similarity_index
+from services.recommendation_result import RecommendedProduct
+from services.quiz_recommendation_table import QuizRecommendationTable
+from services.quiz_scoring import QuizScoringEngine
 import random
 
+# Serve like-based recommendations from the ALS factors once `python -m services.als_service train` has run
+USE_ALS_RECOMMENDATIONS = False
+
+_quiz_table = None
+_quiz_table_version = None
+
+
+def _get_quiz_table(products):
+    """Get the precomputed quiz table, rebuilding it when the catalog is reloaded"""
+    global _quiz_table, _quiz_table_version
+    
+    if _quiz_table is None or _quiz_table_version != product_service.catalog_version:
+        # Every product stays a candidate; the jitter decides among unmatched ones
+        _quiz_table = QuizRecommendationTable(QuizScoringEngine(products), jitter=1.0, require_match=False)
+        _quiz_table_version = product_service.catalog_version
+    return _quiz_table
+
 class RecommendationService:
     @staticmethod
-    def get_recommendations_for_user(user_id, limit=8):
+    def get_recommendations_for_user(user_id, limit=8, signals=None):
         """Get personalized product recommendations for a user"""
-        # Get user's quiz responses
-        quiz_responses = QuizResponse.get_by_user_id(user_id)
-        quiz_data = {r.question_id: r.response for r in quiz_responses}
-        
-        # Get user's interactions
-        liked_product_ids = Interaction.get_liked_products(user_id)
-        
-        # Get viewed products
-        view_interactions = Interaction.get_user_interactions_by_type(user_id, 'view')
-        viewed_product_ids = [i.product_id for i in view_interactions]
+        # Get user's quiz responses and interactions in one query
+        if signals is None:
+            signals = UserSignals.load(user_id)
+        quiz_data = signals.quiz
+        liked_product_ids = signals.liked
+        viewed_product_ids = signals.viewed
         
         # First collect all products
         all_products = get_all_products(filters=None, sort=None, page=1, limit=1000)['products']
@@ -30,7 +48,7 @@ class RecommendationService:
         # If user has likes but no quiz, use collaborative filtering approach
         if liked_product_ids:
             return RecommendationService._get_collaborative_recommendations(
-                all_products, liked_product_ids, viewed_product_ids, limit
+                all_products, liked_product_ids, viewed_product_ids, limit, user_id
             )
         
         # If user has views but no likes or quiz, recommend similar to viewed
@@ -45,82 +63,54 @@ class RecommendationService:
     @staticmethod
     def _get_quiz_based_recommendations(products, quiz_data, liked_product_ids, viewed_product_ids, limit):
         """Get recommendations based on quiz responses"""
-        # Style preference mapping
-        style_preference = quiz_data.get('style_preference')
-        style_mapping = {
-            'minimalist': ['Minimalist', 'Clean', 'Simple'],
-            'casual': ['Casual', 'Everyday', 'Relaxed'],
-            'formal': ['Formal', 'Business', 'Elegant']
-        }
-        
-        # Color preference mapping
-        color_preference = quiz_data.get('color_preference')
-        color_mapping = {
-            'neutral': ['Black', 'White', 'Grey', 'Navy Blue', 'Beige', 'Brown'],
-            'vibrant': ['Red', 'Blue', 'Green', 'Yellow', 'Orange', 'Purple', 'Pink'],
-            'pastel': ['Pink', 'Light Blue', 'Mint', 'Lavender', 'Peach', 'Sky Blue']
-        }
-        
-        # Occasion mapping
-        occasion = quiz_data.get('occasion')
-        occasion_mapping = {
-            'everyday': ['Casual'],
-            'work': ['Formal'],
-            'special': ['Ethnic', 'Formal']
-        }
-        
-        # Score each product based on quiz matches
-        scored_products = []
-        for product in products:
-            # Skip products the user has already viewed or liked
-            if product['id'] in viewed_product_ids or product['id'] in liked_product_ids:
-                continue
-                
-            score = 0
-            
-            # Match style preference
-            if style_preference and style_preference in style_mapping:
-                for style_keyword in style_mapping[style_preference]:
-                    if style_keyword.lower() in product['usage'].lower() or style_keyword.lower() in product['productDisplayName'].lower():
-                        score += 3
-            
-            # Match color preference
-            if color_preference and color_preference in color_mapping:
-                if product['baseColour'] in color_mapping[color_preference]:
-                    score += 2
-            
-            # Match occasion
-            if occasion and occasion in occasion_mapping:
-                if product['usage'] in occasion_mapping[occasion]:
-                    score += 2
-            
-            # Add some randomness to recommendations
-            score += random.uniform(0, 1)
-            
-            scored_products.append((product, score))
-        
-        # Sort by score (descending) and take top products
-        scored_products.sort(key=lambda x: x[1], reverse=True)
-        top_products = [p[0] for p in scored_products[:limit]]
-        
-        # Add "isRecommended" flag
-        for product in top_products:
-            product['isRecommended'] = True
-        
-        return top_products
+        # Skip products the user has already viewed or liked
+        exclude_ids = set(liked_product_ids) | set(viewed_product_ids)
+        return _get_quiz_table(products).recommend(quiz_data, exclude_ids=exclude_ids, limit=limit)
     
     @staticmethod
-    def _get_collaborative_recommendations(products, liked_product_ids, viewed_product_ids, limit):
-        """Get recommendations based on liked products (simple collaborative filtering)"""
-        # For a real app, this would be a more sophisticated collaborative filtering algorithm
-        # Here we'll just recommend products with similar attributes to the liked ones
+    def _get_collaborative_recommendations(products, liked_product_ids, viewed_product_ids, limit, user_id=None):
+        """Get recommendations based on liked products (ALS or item-to-item collaborative filtering)"""
+        recommended = []
+        
+        # Score the user against the ALS item factors trained offline
+        scorer = get_als_scorer() if USE_ALS_RECOMMENDATIONS and user_id is not None else None
+        if scorer is not None:
+            picks = scorer.recommend(
+                user_id, top_k=limit, exclude_ids=set(liked_product_ids) | set(viewed_product_ids)
+            )
+            rows = {p['id']: i for i, p in enumerate(products)}
+            recommended = [
+                RecommendedProduct(products, rows[pid], score, "Picked for your likes and views", is_recommended=True)
+                for pid, score in picks if pid in rows
+            ]
+            if len(recommended) >= limit:
+                return recommended
+        
+        # Otherwise use the co-like/co-view neighbours built offline from all users' interactions
+        item_index = get_item_similarity_index() if not recommended else None
+        if item_index is not None:
+            neighbours = item_index.recommend(
+                liked_product_ids, exclude_ids=viewed_product_ids, top_k=limit
+            )
+            if neighbours:
+                rows = {p['id']: i for i, p in enumerate(products)}
+                recommended = [
+                    RecommendedProduct(products, rows[pid], score,
+                                       "Liked by shoppers with similar taste", is_recommended=True)
+                    for pid, score in neighbours if pid in rows
+                ]
+                if len(recommended) >= limit:
+                    return recommended
+        
+        # Not enough co-occurrence data yet: recommend products with similar
+        # attributes to the liked ones
         
         # Get the liked products details
         liked_products = [get_product_by_id(pid) for pid in liked_product_ids if get_product_by_id(pid)]
         
         # If no valid liked products, fall back to default recommendations
         if not liked_products:
-            return RecommendationService._get_default_recommendations(products, limit)
+            return recommended or RecommendationService._get_default_recommendations(products, limit)
         
         # Extract key attributes from liked products
         liked_categories = [p['articleType'] for p in liked_products]
@@ -128,12 +118,17 @@ class RecommendationService:
         liked_genders = [p['gender'] for p in liked_products]
         
         # Score each product based on matches with liked attributes
+        already_recommended = {r.id for r in recommended}
         scored_products = []
-        for product in products:
+        for row, product in enumerate(products):
             # Skip products the user has already viewed or liked
             if product['id'] in viewed_product_ids or product['id'] in liked_product_ids:
                 continue
             
+            # Skip products already recommended from neighbours
+            if product['id'] in already_recommended:
+                continue
+            
             score = 0
             
             # Match category
@@ -151,17 +146,16 @@ class RecommendationService:
             # Add some randomness to recommendations
             score += random.uniform(0, 1)
             
-            scored_products.append((product, score))
+            scored_products.append((row, score))
         
-        # Sort by score (descending) and take top products
+        # Sort by score (descending) and take top products, as results of the same type as the neighbours
         scored_products.sort(key=lambda x: x[1], reverse=True)
-        top_products = [p[0] for p in scored_products[:limit]]
+        top_products = [
+            RecommendedProduct(products, row, score, "Similar to products you liked", is_recommended=True)
+            for row, score in scored_products[:limit - len(recommended)]
+        ]
         
-        # Add "isRecommended" flag
-        for product in top_products:
-            product['isRecommended'] = True
-        
-        return top_products
+        return recommended + top_products
     
     @staticmethod
     def _get_view_based_recommendations(products, viewed_product_ids, limit):
@@ -0,0 +1,162 @@
+"""
+Per-user interaction state cache
+
+Product pages need to know which products the current user liked (and
+recommendation code which ones they disliked or viewed). Instead of a
+SQLite query per request, each user's liked/disliked/viewed product ids are
+loaded once into sets and kept in an LRU cache bounded by an estimated
+memory budget.
+
+The interaction write paths update cached sets in place after their commit
+(apply_reaction, apply_views), so a cached entry never goes stale while the
+user is active. Bulk writers that bypass those paths must call invalidate.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from utils.db import connection
+
+# Estimated bytes the cache may hold across all users
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class UserInteractionState:
+    """Product id sets for one user"""
+
+    __slots__ = ('liked', 'disliked', 'viewed', 'nbytes')
+
+    def __init__(self, liked=None, disliked=None, viewed=None):
+        self.liked = set(liked or ())
+        self.disliked = set(disliked or ())
+        self.viewed = set(viewed or ())
+        self.nbytes = sum(
+            sys.getsizeof(ids) + sum(sys.getsizeof(pid) for pid in ids)
+            for ids in (self.liked, self.disliked, self.viewed)
+        )
+
+
+class UserStateCache:
+    """LRU cache of UserInteractionState with a byte budget"""
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by writes for users that are not cached, so a load that raced
+        # with such a write is not stored
+        self._uncached_writes = 0
+
+    @staticmethod
+    def _load(user_id):
+        """Read a user's interactions from the database"""
+        with connection() as conn:
+            rows = conn.execute(
+                "SELECT product_id, interaction_type FROM interactions WHERE user_id = ?",
+                (user_id,)
+            ).fetchall()
+
+        ids = {'like': [], 'dislike': [], 'view': []}
+        for product_id, interaction_type in rows:
+            if interaction_type in ids:
+                ids[interaction_type].append(str(product_id))
+        return UserInteractionState(ids['like'], ids['dislike'], ids['view'])
+
+    def get(self, user_id):
+        """Get a user's interaction state, loading it on a miss"""
+        key = str(user_id)
+        with self._lock:
+            state = self._entries.get(key)
+            if state is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return state
+            self.misses += 1
+            writes_before = self._uncached_writes
+
+        state = self._load(user_id)
+
+        with self._lock:
+            if self._uncached_writes == writes_before and key not in self._entries:
+                self._entries[key] = state
+                self.current_bytes += state.nbytes
+                self._evict()
+        return state
+
+    def _evict(self):
+        # Never evict the entry that was just added
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            _, state = self._entries.popitem(last=False)
+            self.current_bytes -= state.nbytes
+
+    def apply_reaction(self, user_id, product_id, interaction_type):
+        """Record a committed like/dislike toggle"""
+        product_id = str(product_id)
+        with self._lock:
+            state = self._entries.get(str(user_id))
+            if state is None:
+                self._uncached_writes += 1
+                return
+            # A toggle moves the id between the sets; only a new id grows the entry
+            known = product_id in state.liked or product_id in state.disliked
+            state.liked.discard(product_id)
+            state.disliked.discard(product_id)
+            target = state.liked if interaction_type == 'like' else state.disliked
+            target.add(product_id)
+            if not known:
+                size = sys.getsizeof(product_id)
+                state.nbytes += size
+                self.current_bytes += size
+                self._evict()
+
+    def apply_views(self, user_id, product_ids):
+        """Record committed views"""
+        with self._lock:
+            state = self._entries.get(str(user_id))
+            if state is None:
+                self._uncached_writes += 1
+                return
+            for product_id in product_ids:
+                product_id = str(product_id)
+                if product_id not in state.viewed:
+                    state.viewed.add(product_id)
+                    size = sys.getsizeof(product_id)
+                    state.nbytes += size
+                    self.current_bytes += size
+            self._evict()
+
+    def invalidate(self, user_id):
+        """Drop a user's cached state"""
+        with self._lock:
+            state = self._entries.pop(str(user_id), None)
+            if state is not None:
+                self.current_bytes -= state.nbytes
+            else:
+                self._uncached_writes += 1
+
+    def get_stats(self):
+        """Entry count, estimated size and hit/miss counters"""
+        with self._lock:
+            return {
+                'users': len(self._entries),
+                'bytes': self.current_bytes,
+                'maxBytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+_cache = UserStateCache()
+
+
+def get_user_state_cache():
+    """Get the process-wide user state cache"""
+    return _cache
+
+
+def get_user_state(user_id):
+    """Get the cached interaction state for a user"""
+    return _cache.get(user_id)
@@ -0,0 +1,162 @@
+"""
+Write-behind queue for product view interactions
+
+Recording a view used to be a synchronous SQLite insert on the request
+thread, so every product page waited for the database commit. Views are now
+put on a bounded in-memory queue and a background thread writes them in
+batches, one multi-row insert per batch, whenever FLUSH_INTERVAL has passed
+or BATCH_SIZE views are waiting.
+
+When the queue is full, producers wait up to ENQUEUE_TIMEOUT for room and
+then drop the view. Views are analytics signals, so losing a few under
+overload is preferable to stalling page loads. Pending views are flushed
+at interpreter shutdown.
+"""
+
+import atexit
+import queue
+import threading
+import time
+from utils.db import transaction
+from utils.cache_invalidation import invalidate_user
+from services.user_state_cache import get_user_state_cache
+
+MAX_QUEUE_SIZE = 10000
+BATCH_SIZE = 500
+# Seconds between flushes when fewer than BATCH_SIZE views are waiting
+FLUSH_INTERVAL = 0.05
+# Seconds a producer may wait for room in a full queue before dropping
+ENQUEUE_TIMEOUT = 0.005
+
+
+class ViewWriteQueue:
+    """Bounded queue of (user_id, product_id) views with a background batch writer"""
+
+    def __init__(self, max_size=MAX_QUEUE_SIZE, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 enqueue_timeout=ENQUEUE_TIMEOUT):
+        self.queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.stats = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'failed': 0,
+            'batches': 0,
+            'last_batch_size': 0,
+            'max_batch_size': 0
+        }
+        self._stats_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='view-write-queue', daemon=True)
+        self._thread.start()
+
+    def record(self, user_id, product_id):
+        """Queue a view; returns False if it was dropped because the queue stayed full"""
+        try:
+            self.queue.put((user_id, product_id), timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self.stats['dropped'] += 1
+            return False
+        with self._stats_lock:
+            self.stats['enqueued'] += 1
+        return True
+
+    def get_stats(self):
+        """Counters plus the current queue depth and mean batch size"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['queue_depth'] = self.queue.qsize()
+        stats['mean_batch_size'] = stats['written'] / stats['batches'] if stats['batches'] else 0
+        return stats
+
+    def _take_batch(self):
+        """Block until a view arrives, then collect more until the batch is full or the interval ends"""
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        """Insert one batch of views; a failed batch is retried once, then counted as failed"""
+        for attempt in range(2):
+            try:
+                with transaction() as conn:
+                    conn.executemany(
+                        "INSERT INTO interactions (user_id, product_id, interaction_type) VALUES (?, ?, 'view')",
+                        batch
+                    )
+                break
+            except Exception as e:
+                if attempt:
+                    print(f"Error writing {len(batch)} views: {e}")
+                    with self._stats_lock:
+                        self.stats['failed'] += len(batch)
+                    return
+
+        with self._stats_lock:
+            self.stats['written'] += len(batch)
+            self.stats['batches'] += 1
+            self.stats['last_batch_size'] = len(batch)
+            self.stats['max_batch_size'] = max(self.stats['max_batch_size'], len(batch))
+
+        viewed = {}
+        for user_id, product_id in batch:
+            viewed.setdefault(user_id, []).append(product_id)
+        state_cache = get_user_state_cache()
+        for user_id, product_ids in viewed.items():
+            state_cache.apply_views(user_id, product_ids)
+            invalidate_user(user_id)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._take_batch()
+            if batch:
+                self._write(batch)
+
+    def flush(self):
+        """Write everything currently queued on the calling thread"""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write(batch)
+
+    def stop(self):
+        """Stop the writer thread and flush what is left"""
+        self._stopping.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+
+_view_queue = None
+_view_queue_lock = threading.Lock()
+
+
+def get_view_queue():
+    """Get the process-wide view queue, starting its writer on first use"""
+    global _view_queue
+    if _view_queue is None:
+        with _view_queue_lock:
+            if _view_queue is None:
+                _view_queue = ViewWriteQueue()
+                atexit.register(_view_queue.stop)
+    return _view_queue
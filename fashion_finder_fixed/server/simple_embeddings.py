@@ -11,12 +11,22 @@ import csv
 import random
 import math
 from collections import Counter
+from services.recommendation_result import RecommendedProduct
 
 # Store recommendations in memory
 _cached_recommendations = {}
 
+# Loaded catalog, reused until styles.csv changes. Results reference rows of
+# this list, so cached recommendations must be dropped when it is replaced.
+_catalog = {'mtime': None, 'products': []}
+
 def load_product_data():
     """Load product data from styles.csv"""
+    # Copies, so callers can change them without touching the cached catalog
+    return [dict(product) for product in _load_catalog()]
+
+def _load_catalog():
+    """The cached product list; shared and read-only, since results keep row indexes into it"""
     products = []
     try:
         # Find the styles CSV file
@@ -26,6 +36,10 @@ def load_product_data():
             print(f"Styles CSV file not found at: {styles_path}")
             return []
         
+        mtime = os.path.getmtime(styles_path)
+        if _catalog['mtime'] == mtime:
+            return _catalog['products']
+        
         # Read and parse the CSV file
         with open(styles_path, 'r') as f:
             reader = csv.DictReader(f)
@@ -47,6 +61,9 @@ def load_product_data():
                 products.append(product)
         
         print(f"Successfully loaded {len(products)} products from styles.csv")
+        _catalog['mtime'] = mtime
+        _catalog['products'] = products
+        _cached_recommendations.clear()
         return products
     except Exception as e:
         print(f"Error loading product data from CSV: {e}")
@@ -110,24 +127,20 @@ def get_similar_products(product_id, products, top_k=4, exclude_ids=None):
     
     # Calculate similarity scores
     similarities = []
-    for product in products:
+    for row, product in enumerate(products):
         pid = str(product["id"])
         if pid != product_id and pid not in exclude_ids:
             similarity = get_product_similarity(target_product, product)
-            similarities.append((product, similarity))
+            similarities.append((row, similarity))
     
     # Sort by similarity score (descending)
     similarities.sort(key=lambda x: x[1], reverse=True)
     
     # Get the top K similar products
-    result = []
-    for product, score in similarities[:top_k]:
-        product_copy = product.copy()
-        product_copy["similarityScore"] = score
-        product_copy["recommendationReason"] = "Similar style and category"
-        result.append(product_copy)
-    
-    return result
+    return [
+        RecommendedProduct(products, row, score, "Similar style and category")
+        for row, score in similarities[:top_k]
+    ]
 
 def get_user_preferences(liked_products, products):
     """Extract user preferences from liked products"""
@@ -252,7 +265,7 @@ def get_recommendations(liked_product_ids, disliked_product_ids=None, top_k=8):
     disliked_product_ids = [str(id) for id in disliked_product_ids]
     
     # Load all products
-    all_products = load_product_data()
+    all_products = _load_catalog()
     if not all_products:
         print("No products loaded, cannot generate recommendations")
         return []
@@ -261,11 +274,9 @@ def get_recommendations(liked_product_ids, disliked_product_ids=None, top_k=8):
     if not liked_product_ids:
         print("No liked products, returning random recommendations")
         # Return a few random products as recommendations
-        random_products = random.sample(all_products, min(top_k, len(all_products)))
-        for product in random_products:
-            product["recommendationReason"] = "Popular product"
-            product["similarityScore"] = 50  # Arbitrary score for random recommendations
-        return random_products
+        # (50 is an arbitrary score for random recommendations)
+        random_rows = random.sample(range(len(all_products)), min(top_k, len(all_products)))
+        return [RecommendedProduct(all_products, row, 50, "Popular product") for row in random_rows]
     
     # Cache key based on the sorted list of liked and disliked products
     cache_key = f"{','.join(sorted(liked_product_ids))}-{','.join(sorted(disliked_product_ids))}"
@@ -283,15 +294,15 @@ def get_recommendations(liked_product_ids, disliked_product_ids=None, top_k=8):
     top_categories = preferences.get("categories", [])
     
     # Check if user has a strong preference for footwear
-    footwear_count = sum(1 for pid in liked_product_ids 
-                       if any(p["id"] == pid and p["masterCategory"] == "Footwear" 
-                             for p in all_products))
+    product_map = {p["id"]: p for p in all_products}
+    footwear_count = sum(1 for pid in liked_product_ids
+                       if pid in product_map and product_map[pid]["masterCategory"] == "Footwear")
     print(f"User footwear preference: {footwear_count}/{len(liked_product_ids)} liked items are footwear. "
           f"Focus on footwear: {footwear_count > len(liked_product_ids) / 3}")
     
     # Score products based on user preferences
     product_scores = []
-    for product in all_products:
+    for row, product in enumerate(all_products):
         product_id = str(product["id"])
         
         # Skip already liked products
@@ -306,7 +317,7 @@ def get_recommendations(liked_product_ids, disliked_product_ids=None, top_k=8):
         
         # Score the product
         score = score_product_by_preferences(product, preferences)
-        product_scores.append((product, score))
+        product_scores.append((row, score))
     
     # Sort by score (descending)
     product_scores.sort(key=lambda x: x[1], reverse=True)
@@ -314,59 +325,56 @@ def get_recommendations(liked_product_ids, disliked_product_ids=None, top_k=8):
     # Get the top candidates
     top_candidates = product_scores[:min(top_k * 2, len(product_scores))]
     print(f"Top recommendation candidates:")
-    for i, (product, score) in enumerate(top_candidates[:3]):
+    for i, (row, score) in enumerate(top_candidates[:3]):
+        product = all_products[row]
         reasons = get_recommendation_reasons(product, preferences)
         print(f"{i+1}. {product['productDisplayName']} (Score: {score:.2f}) Reasons: {', '.join(reasons)}")
     
     # Select the final recommendations with consideration of variety
     # Try to include some products from different categories
     recommendations = []
+    selected_rows = set()
     selected_categories = set()
     
     # First, take the top recommendations
-    for product, score in top_candidates:
+    for row, score in top_candidates:
         # Skip if we already have enough recommendations
         if len(recommendations) >= top_k:
             break
         
         # Add variety by limiting too many items from the same category
+        product = all_products[row]
         category = product["masterCategory"]
         if category in selected_categories and len(selected_categories) >= 3:
             # Skip if we already have 3 different categories and this is a repeat
             continue
         
-        # Add this product to recommendations
-        product_copy = product.copy()
-        product_copy["similarityScore"] = score
-        
-        # Generate recommendation reasons
+        # Generate recommendation reasons (just the top 3)
         reasons = get_recommendation_reasons(product, preferences)
-        reason_str = ", ".join(reasons[:3])  # Take just the top 3 reasons
-        product_copy["recommendationReason"] = reason_str
+        reason_str = ", ".join(reasons[:3])
         
-        recommendations.append(product_copy)
+        # Add this product to recommendations
+        recommendations.append(RecommendedProduct(all_products, row, score, reason_str))
+        selected_rows.add(row)
         selected_categories.add(category)
     
     # If we still need more recommendations, include more without category diversity check
     if len(recommendations) < top_k:
-        for product, score in top_candidates:
+        for row, score in top_candidates:
             if len(recommendations) >= top_k:
                 break
                 
             # Skip already selected products
-            if any(r["id"] == product["id"] for r in recommendations):
+            if row in selected_rows:
                 continue
-                
-            # Add this product
-            product_copy = product.copy()
-            product_copy["similarityScore"] = score
             
             # Generate recommendation reasons
-            reasons = get_recommendation_reasons(product, preferences)
+            reasons = get_recommendation_reasons(all_products[row], preferences)
             reason_str = ", ".join(reasons[:3])
-            product_copy["recommendationReason"] = reason_str
             
-            recommendations.append(product_copy)
+            # Add this product
+            recommendations.append(RecommendedProduct(all_products, row, score, reason_str))
+            selected_rows.add(row)
     
     # Cache the recommendations
     _cached_recommendations[cache_key] = recommendations
@@ -380,5 +388,5 @@ def get_visual_recommendations(liked_product_ids, disliked_product_ids=None, top
 
 def get_similar_items(product_id, exclude_ids=None, top_k=4):
     """Get similar products based on visual similarity"""
-    products = load_product_data()
+    products = _load_catalog()
     return get_similar_products(product_id, products, top_k, exclude_ids)
\ No newline at end of file
@@ -0,0 +1,62 @@
+from services.chat_product_search import ChatProductSearch
+from services.chat_sessions import ChatSession
+from services.chatbot_service import FashionChatbot
+from services.product_service import simulated_price
+
+SEARCH = 'recommend black sports shoes for men'
+
+
+def product(product_id, article_type, colour, gender, master='Footwear', sub='Shoes'):
+    return {
+        'id': str(product_id), 'gender': gender, 'masterCategory': master, 'subCategory': sub,
+        'articleType': article_type, 'baseColour': colour, 'season': 'Summer', 'usage': 'Sports',
+        'productDisplayName': f'{colour} {article_type} {product_id}'
+    }
+
+
+# Prices are simulated as id % 100 + 30: the first four shoes are shown (80-110),
+# 110 and 120 are cheaper shoes and 190 a pricier one. The shirts, the cap and the
+# white shoe only partly match the search but are among its candidates.
+CATALOG = [
+    product(150, 'Sports Shoes', 'Black', 'Men'),
+    product(160, 'Sports Shoes', 'Black', 'Men'),
+    product(170, 'Sports Shoes', 'Black', 'Men'),
+    product(180, 'Sports Shoes', 'Black', 'Men'),
+    product(110, 'Sports Shoes', 'Black', 'Men'),
+    product(120, 'Sports Shoes', 'Black', 'Men'),
+    product(190, 'Sports Shoes', 'Black', 'Men'),
+    product(101, 'Tshirts', 'Black', 'Men', 'Apparel', 'Topwear'),
+    product(102, 'Tshirts', 'Black', 'Men', 'Apparel', 'Topwear'),
+    product(103, 'Caps', 'Black', 'Unisex', 'Accessories', 'Headwear'),
+    product(104, 'Sports Shoes', 'White', 'Men'),
+    product(199, 'Tshirts', 'Black', 'Men', 'Apparel', 'Topwear'),
+]
+
+
+def follow_up(message):
+    search = ChatProductSearch(CATALOG)
+    chatbot = FashionChatbot(product_search=lambda: search)
+    session = ChatSession()
+    shown = chatbot.get_reply(SEARCH, session)['products']
+    return shown, chatbot.get_reply(message, session)
+
+
+def assert_black_sports_shoes_for_men(products):
+    assert products
+    for p in products:
+        assert (p['articleType'], p['baseColour'], p['gender']) == ('Sports Shoes', 'Black', 'Men')
+
+
+def test_cheaper_follow_up_keeps_the_searched_product_type():
+    shown, reply = follow_up('show me cheaper ones')
+    assert_black_sports_shoes_for_men(reply['products'])
+    cheapest = min(simulated_price(p) for p in shown)
+    assert all(simulated_price(p) < cheapest for p in reply['products'])
+    assert 'cheaper black sports shoes for men' in reply['response']
+
+
+def test_pricier_follow_up_keeps_the_searched_product_type():
+    shown, reply = follow_up('show me pricier ones')
+    assert_black_sports_shoes_for_men(reply['products'])
+    dearest = max(simulated_price(p) for p in shown)
+    assert all(simulated_price(p) > dearest for p in reply['products'])
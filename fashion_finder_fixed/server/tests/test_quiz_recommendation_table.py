@@ -0,0 +1,33 @@
+from services.quiz_recommendation_table import QuizRecommendationTable
+from services.quiz_scoring import QuizScoringEngine
+
+ANSWERS = {'style_preference': 'casual', 'color_preference': 'neutral'}
+
+
+def make_products(count):
+    """Identical casual black t-shirts, so every product ties on the quiz score"""
+    return [
+        {'id': str(i), 'articleType': 'Tshirts', 'usage': 'Casual', 'baseColour': 'Black',
+         'subCategory': 'Topwear', 'productDisplayName': f'Basic Tshirt {i}'}
+        for i in range(count)
+    ]
+
+
+def picks(table, calls, **kwargs):
+    return [tuple(r.id for r in table.recommend(ANSWERS, **kwargs)) for _ in range(calls)]
+
+
+def test_same_answers_return_different_products_across_calls():
+    table = QuizRecommendationTable(QuizScoringEngine(make_products(300)), jitter=1.0, require_match=False)
+    results = picks(table, 20, limit=8)
+    assert len(set(results)) > 1
+    # The whole tie group takes part, not only the first candidates in catalog order
+    assert any(int(pid) >= table.candidates for result in results for pid in result)
+
+
+def test_exclusions_still_fill_the_limit():
+    table = QuizRecommendationTable(QuizScoringEngine(make_products(300)), jitter=1.0)
+    exclude = [str(i) for i in range(290)]
+    for result in picks(table, 5, exclude_ids=exclude, limit=8):
+        assert len(result) == 8
+        assert not set(result) & set(exclude)
@@ -0,0 +1,153 @@
+"""
+ASGI adapter that runs a WSGI app on bounded executors
+
+Like asgiref's WsgiToAsgi, but every request is routed by path prefix to a
+BoundedExecutor (utils.executors), and a full executor gets an immediate
+503 instead of a queued thread. The event loop only holds connections and
+moves bytes.
+
+Response bodies are pulled from the WSGI iterable one chunk at a time and
+sent as they come, so streamed responses (chat SSE) still stream. All calls
+for one request run in the same contextvars context, which keeps Flask's
+request context valid across the chunks even when they run on different
+pool threads.
+"""
+
+import contextvars
+import io
+import json
+import sys
+
+BUSY_BODY = json.dumps({'message': 'Server busy, try again shortly'}).encode()
+
+
+class AsgiAdapter:
+    """ASGI callable wrapping a WSGI app"""
+
+    def __init__(self, wsgi_app, default_executor, routes=()):
+        """`routes` is a sequence of (path prefix, executor); the first matching prefix wins"""
+        self.wsgi_app = wsgi_app
+        self.default_executor = default_executor
+        self.routes = list(routes)
+
+    def executors(self):
+        return list(dict.fromkeys([self.default_executor] + [executor for _, executor in self.routes]))
+
+    def executor_for(self, path):
+        for prefix, executor in self.routes:
+            if path.startswith(prefix):
+                return executor
+        return self.default_executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for executor in self.executors():
+                    executor.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        executor = self.executor_for(scope['path'])
+        if not executor.admit():
+            await send({
+                'type': 'http.response.start',
+                'status': 503,
+                'headers': [(b'content-type', b'application/json'), (b'retry-after', b'1'),
+                            (b'content-length', str(len(BUSY_BODY)).encode())]
+            })
+            await send({'type': 'http.response.body', 'body': BUSY_BODY})
+            return
+
+        try:
+            # Read the whole request body first; the app's bodies are small JSON documents
+            body = bytearray()
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                body += message.get('body', b'')
+                if not message.get('more_body'):
+                    break
+            await self._respond(executor, self._environ(scope, bytes(body)), send)
+        finally:
+            executor.release()
+
+    async def _respond(self, executor, environ, send):
+        context = contextvars.copy_context()
+        response = {}
+        written = []
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get('started'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+            return written.append
+
+        result = await executor.run(context, self.wsgi_app, environ, start_response)
+        try:
+            chunks = iter(result)
+            while True:
+                chunk = await executor.run(context, next, chunks, None)
+                if written:
+                    chunk = b''.join(written) + (chunk or b'')
+                    written.clear()
+                if not response.get('started'):
+                    response['started'] = True
+                    await send({'type': 'http.response.start', 'status': response['status'],
+                                'headers': response['headers']})
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                await executor.run(context, result.close)
+
+    @staticmethod
+    def _environ(scope, body):
+        """WSGI environ for an ASGI http scope"""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            'CONTENT_LENGTH': str(len(body))
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name != 'CONTENT_LENGTH':
+                key = f'HTTP_{name}'
+                environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
@@ -0,0 +1,40 @@
+"""
+User cache invalidation events
+
+Services that cache per-user state (preference models, recommendation
+lists) subscribe a callback here. Write paths call invalidate_user after a
+user's likes, dislikes or views change, so the next read rebuilds from the
+database instead of comparing the whole interaction history to the cache.
+"""
+
+import threading
+
+_subscribers = []
+_lock = threading.Lock()
+
+
+def subscribe(callback):
+    """Register callback(user_id), called whenever a user's interactions change"""
+    with _lock:
+        if callback not in _subscribers:
+            _subscribers.append(callback)
+    return callback
+
+
+def unsubscribe(callback):
+    """Stop calling a previously registered callback"""
+    with _lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+
+def invalidate_user(user_id):
+    """Tell every subscriber that a user's cached state is stale"""
+    with _lock:
+        callbacks = list(_subscribers)
+    for callback in callbacks:
+        try:
+            callback(user_id)
+        except Exception as e:
+            # A broken cache must not fail the write that triggered it
+            print(f"Error invalidating caches for user {user_id}: {e}")
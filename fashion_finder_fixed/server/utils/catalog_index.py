@@ -0,0 +1,105 @@
+"""
+In-memory indexes over the product catalog
+
+Categorical fields (articleType, usage, baseColour, ...) are encoded once as
+integer codes per product, so anything that scores products by attribute can
+do it with array gathers instead of string comparisons. Product names are
+tokenized into an inverted index from lowercase token to product rows.
+"""
+
+import re
+import numpy as np
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Lowercase alphanumeric tokens of a piece of text"""
+    if not isinstance(text, str):
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+class TokenIndex:
+    """Inverted index from name tokens to product rows"""
+
+    def __init__(self, products, field='productDisplayName'):
+        postings = {}
+        for row, product in enumerate(products):
+            for token in set(tokenize(product.get(field))):
+                postings.setdefault(token, []).append(row)
+        self.postings = {token: np.asarray(rows, dtype=np.int32) for token, rows in postings.items()}
+        self.size = len(products)
+
+    def rows(self, token):
+        """Rows whose name contains the token"""
+        return self.postings.get(token.lower(), np.zeros(0, dtype=np.int32))
+
+    def rows_matching_any(self, tokens):
+        """Rows whose name contains at least one of the tokens"""
+        found = [self.rows(token) for token in tokens]
+        found = [rows for rows in found if len(rows)]
+        if not found:
+            return np.zeros(0, dtype=np.int32)
+        return np.unique(np.concatenate(found))
+
+    def rows_matching_all(self, tokens):
+        """Rows whose name contains every one of the tokens"""
+        result = None
+        for token in tokens:
+            rows = self.rows(token)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if not len(result):
+                break
+        return result if result is not None else np.zeros(0, dtype=np.int32)
+
+
+class CatalogIndex:
+    """Categorical codes and a name token index for one list of products
+
+    Code 0 is reserved for missing values, so a weight vector over a field's
+    codes can always be indexed with the codes array directly.
+    """
+
+    def __init__(self, products):
+        self.products = products
+        self._fields = {}
+        self._tokens = None
+
+    def _encode(self, field):
+        vocab = {}
+        codes = np.zeros(len(self.products), dtype=np.int32)
+        for row, product in enumerate(self.products):
+            value = product.get(field)
+            if isinstance(value, str) and value:
+                codes[row] = vocab.setdefault(value, len(vocab) + 1)
+        self._fields[field] = (codes, vocab)
+
+    def codes(self, field):
+        """Integer code of the field value for every product"""
+        if field not in self._fields:
+            self._encode(field)
+        return self._fields[field][0]
+
+    def vocabulary(self, field):
+        """Mapping of field value to code"""
+        if field not in self._fields:
+            self._encode(field)
+        return self._fields[field][1]
+
+    def weight_vector(self, field, values, weight=1.0):
+        """Vector over the field's codes with `weight` at each of the given values"""
+        vocab = self.vocabulary(field)
+        vector = np.zeros(len(vocab) + 1, dtype=np.float32)
+        for value in values:
+            code = vocab.get(value)
+            if code is not None:
+                vector[code] = weight
+        return vector
+
+    @property
+    def tokens(self):
+        """Token index over product names, built on first use"""
+        if self._tokens is None:
+            self._tokens = TokenIndex(self.products)
+        return self._tokens
@@ -0,0 +1,261 @@
+"""
+Shared SQLite access for the FashionFinder models
+
+Models used to open a new connection for every query. Connections are now
+kept in a small pool: a thread checks one out for the duration of a query or
+transaction and hands it back afterwards, so prepared statements (sqlite3's
+per-connection statement cache) and the page cache survive between calls.
+
+Every connection runs in WAL mode, so readers never block the writer and
+concurrent like/view writes only queue on the write lock instead of the
+rollback journal.
+
+Run from the server directory to compare against one connection per query:
+    python -m utils.db --threads 16 --seconds 5
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_PATH = os.path.join(os.path.dirname(__file__), '../../data/fashionfinder.db')
+
+# Applied to every pooled connection
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    # With WAL, NORMAL only syncs at checkpoints and is still crash-safe
+    'synchronous': 'NORMAL',
+    # Negative values are in KiB: 16 MB page cache per connection
+    'cache_size': -16000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000
+}
+
+MAX_CONNECTIONS = 16
+CACHED_STATEMENTS = 256
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections to one database file"""
+
+    def __init__(self, db_path=DB_PATH, max_connections=MAX_CONNECTIONS, pragmas=PRAGMAS,
+                 cached_statements=CACHED_STATEMENTS):
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.pragmas = pragmas
+        self.cached_statements = cached_statements
+        # LIFO so the most recently used (warmest) connection is reused first
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.pragmas.get('busy_timeout', 5000) / 1000,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def acquire(self, timeout=None):
+        """Check a connection out of the pool, opening a new one if allowed"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.max_connections
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection available after {timeout}s")
+
+    def release(self, conn):
+        """Return a connection to the pool"""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Use a pooled connection for one or more read queries"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Use a pooled connection for a transaction, committed if the block succeeds"""
+        conn = self.acquire()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=DB_PATH):
+    """Get the shared pool for a database file"""
+    db_path = os.path.abspath(db_path)
+    pool = _pools.get(db_path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(db_path)
+            if pool is None:
+                pool = _pools[db_path] = ConnectionPool(db_path)
+    return pool
+
+
+def connection(db_path=DB_PATH):
+    """Pooled connection to the application database"""
+    return get_pool(db_path).connection()
+
+
+def transaction(db_path=DB_PATH):
+    """Pooled transaction on the application database"""
+    return get_pool(db_path).transaction()
+
+
+def benchmark(db_path, threads=16, seconds=5.0, pooled=True):
+    """Measure interaction writes/sec and reads/sec from concurrent threads
+
+    Half of the threads insert views and likes, the other half read a user's
+    liked products, which is what the products and recommendation pages do.
+    """
+    import random
+    import time
+
+    setup = sqlite3.connect(db_path)
+    setup.execute(
+        "CREATE TABLE IF NOT EXISTS interactions ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, product_id TEXT NOT NULL, "
+        "interaction_type TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    )
+    setup.commit()
+    setup.close()
+
+    pool = ConnectionPool(db_path, max_connections=threads) if pooled else None
+
+    def open_unpooled():
+        # What the models did before: a fresh default connection per query
+        return sqlite3.connect(db_path, timeout=30)
+
+    counts = {'writes': 0, 'reads': 0, 'errors': 0}
+    counts_lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def writer():
+        done = errors = 0
+        while time.perf_counter() < deadline:
+            params = (random.randint(1, 1000), str(random.randint(1, 40000)), random.choice(['view', 'like']))
+            try:
+                if pool:
+                    with pool.transaction() as conn:
+                        conn.execute(
+                            "INSERT INTO interactions (user_id, product_id, interaction_type) VALUES (?, ?, ?)",
+                            params
+                        )
+                else:
+                    conn = open_unpooled()
+                    try:
+                        conn.execute(
+                            "INSERT INTO interactions (user_id, product_id, interaction_type) VALUES (?, ?, ?)",
+                            params
+                        )
+                        conn.commit()
+                    finally:
+                        conn.close()
+                done += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        with counts_lock:
+            counts['writes'] += done
+            counts['errors'] += errors
+
+    def reader():
+        done = 0
+        while time.perf_counter() < deadline:
+            params = (random.randint(1, 1000),)
+            if pool:
+                with pool.connection() as conn:
+                    conn.execute(
+                        "SELECT product_id FROM interactions WHERE user_id = ? AND interaction_type = 'like'",
+                        params
+                    ).fetchall()
+            else:
+                conn = open_unpooled()
+                try:
+                    conn.execute(
+                        "SELECT product_id FROM interactions WHERE user_id = ? AND interaction_type = 'like'",
+                        params
+                    ).fetchall()
+                finally:
+                    conn.close()
+            done += 1
+        with counts_lock:
+            counts['reads'] += done
+
+    workers = [threading.Thread(target=writer if i % 2 == 0 else reader) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if pool:
+        pool.close_all()
+
+    label = 'pooled WAL' if pooled else 'connect per query'
+    print(f"{label:>17}: {counts['writes'] / seconds:9.0f} writes/s  "
+          f"{counts['reads'] / seconds:9.0f} reads/s  ({counts['errors']} failed writes)")
+    return counts
+
+
+if __name__ == '__main__':
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(description='Benchmark concurrent interaction reads and writes')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Separate files: WAL mode persists in the file once enabled
+        benchmark(os.path.join(tmp, 'unpooled.db'), args.threads, args.seconds, pooled=False)
+        benchmark(os.path.join(tmp, 'pooled.db'), args.threads, args.seconds, pooled=True)
@@ -0,0 +1,30 @@
+"""
+On-disk store for embedding matrices
+
+A store is a single .npz file holding the ids and one float32 matrix whose
+row i belongs to ids[i], so it loads straight back as a matrix for scoring.
+The ALS user and item factors (services/als_service.py) are kept this way.
+"""
+
+import os
+import numpy as np
+
+
+def save_embedding_matrix(path, ids, matrix):
+    """Save ids and their embedding rows (row i belongs to ids[i])"""
+    ids = [str(i) for i in ids]
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.shape[0] != len(ids):
+        raise ValueError(f"Got {len(ids)} ids for {matrix.shape[0]} embedding rows")
+
+    # np.savez appends .npz to names without it, so keep the suffix explicit
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, ids=np.asarray(ids, dtype=str), vectors=matrix)
+    os.replace(tmp_path, path)
+
+
+def load_embedding_matrix(path):
+    """Load a store as (ids, matrix)"""
+    with np.load(path, allow_pickle=False) as data:
+        return data['ids'].tolist(), data['vectors']
+
@@ -0,0 +1,76 @@
+"""
+Bounded thread pools for request work in the ASGI mode
+
+Connections are held by the event loop; each request's handler runs on one
+of these pools instead. The database pool has as many threads as the SQLite
+connection pool has connections, so a handler never waits for a connection
+once it is running. The CPU pool (recommendation scoring, chat search) has
+one thread per core, which keeps numpy work from oversubscribing the
+machine.
+
+Each pool admits at most max_workers + max_pending requests. Beyond that
+admit() refuses and the caller answers 503 straight away, so a burst cannot
+queue up unbounded work or memory.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.db import MAX_CONNECTIONS
+
+CPU_WORKERS = os.cpu_count() or 1
+# Requests allowed to wait for a thread, per pool
+DB_MAX_PENDING = 512
+CPU_MAX_PENDING = CPU_WORKERS * 256
+
+
+class BoundedExecutor:
+    """Thread pool that admits a bounded number of requests"""
+
+    def __init__(self, name, max_workers, max_pending):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.admitted = 0
+        self.rejected = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    def admit(self):
+        """Reserve room for one request; False if the pool is full"""
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_pending:
+                self.rejected += 1
+                return False
+            self._in_flight += 1
+            self.admitted += 1
+            return True
+
+    def release(self):
+        """Give back the room reserved by admit()"""
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, context, fn, *args):
+        """Run fn(*args) on the pool inside a contextvars context; calls for one request share it"""
+        return await asyncio.get_running_loop().run_in_executor(self._pool, context.run, fn, *args)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self):
+        """Capacity, current load and admit/reject counters"""
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'maxPending': self.max_pending,
+                'inFlight': self._in_flight,
+                'admitted': self.admitted,
+                'rejected': self.rejected
+            }
+
+
+db_executor = BoundedExecutor('db', MAX_CONNECTIONS, DB_MAX_PENDING)
+cpu_executor = BoundedExecutor('cpu', CPU_WORKERS, CPU_MAX_PENDING)
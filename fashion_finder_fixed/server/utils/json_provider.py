@@ -0,0 +1,14 @@
+from flask.json.provider import DefaultJSONProvider
+
+
+def _default(o):
+    """Serialize objects exposing to_dict() (e.g. RecommendedProduct)"""
+    to_dict = getattr(o, 'to_dict', None)
+    if to_dict is not None:
+        return to_dict()
+    return DefaultJSONProvider.default(o)
+
+
+class FashionJSONProvider(DefaultJSONProvider):
+    """JSON provider that lets handlers jsonify recommendation results directly"""
+    default = staticmethod(_default)